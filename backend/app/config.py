@@ -8,9 +8,19 @@ def _get_allowed_origins() -> tuple[str, ...]:
     return tuple(parts) if parts else ("http://localhost:3000",)
 
 
+def _get_db_path() -> str:
+    # Relative paths resolve against the working directory; tests point DB_PATH at a temp dir.
+    return os.environ.get("DB_PATH", "").strip() or "stocks.db"
+
+
+def _get_warmup_on_startup() -> bool:
+    # WARMUP_ON_STARTUP=0 keeps test clients and one-off scripts off the network.
+    return os.environ.get("WARMUP_ON_STARTUP", "1").strip().lower() not in ("0", "false", "no")
+
+
 @dataclass(frozen=True)
 class Settings:
-    db_path: str = "stocks.db"
+    db_path: str = field(default_factory=_get_db_path)
     allowed_origins: tuple[str, ...] = field(default_factory=_get_allowed_origins)
     recent_decision_hours: int = 48
     paper_portfolio_usd: float = 100_000.0
@@ -30,8 +40,86 @@ class Settings:
     broad_job_hours: int = 6
     reserve_max_queries: int = 10
     broad_max_queries: int = 50
+    leader_lease_seconds: int = 30
+    leader_heartbeat_seconds: int = 10
     watchlist: tuple[str, ...] = ("AAPL", "MSFT", "NVDA", "TSLA", "AMZN")
     metrics_lookback_days: int = 90
+    metrics_max_points: int = 500
+    risk_benchmark_ticker: str = "SPY"
+    # Cached API responses are also keyed by market data as-of, floored to this bucket.
+    market_data_asof_seconds: int = 60
+    market_data_ttl_seconds: int = 300
+    fundamentals_ttl_seconds: int = 6 * 60 * 60
+    market_data_breaker_failures: int = 5
+    market_data_breaker_reset_seconds: float = 30.0
+    market_data_retry_attempts: int = 3
+    market_data_retry_base_seconds: float = 0.2
+    # Retries may add at most this fraction of first attempts, with a burst allowance of max.
+    market_data_retry_budget_ratio: float = 0.2
+    market_data_retry_budget_max: float = 10.0
+    analyze_batch_max_tickers: int = 25
+    analyze_batch_workers: int = 8
+    portfolio_orders_max: int = 50
+    sector_cap_pct: float = 0.25
+    industry_cap_pct: float = 0.15
+    # How often the exposure index checks SQLite for trades/fundamentals written by other workers.
+    exposure_version_check_seconds: float = 1.0
+    optimizer_max_gross: float = 1.0
+    optimizer_risk_aversion: float = 3.0
+    optimizer_cov_shrinkage: float = 0.3
+    walk_forward_history_days: int = 730
+    walk_forward_train_days: int = 252
+    walk_forward_test_days: int = 21
+    walk_forward_horizon_days: int = 20
+    walk_forward_min_trades: int = 5
+    walk_forward_min_hit_rate: float = 0.5
+    walk_forward_ttl_hours: int = 24
+    # 0 means one worker per CPU.
+    walk_forward_workers: int = 0
+    response_cache_entries: int = 256
+    response_compress_min_bytes: int = 512
+    stream_tick_seconds: float = 15.0
+    stream_keepalive_seconds: float = 20.0
+    stream_history_events: int = 256
+    stream_queue_size: int = 512
+    # How often a worker with open streams polls SQLite for rows other workers committed.
+    stream_fanout_poll_seconds: float = 1.0
+    # Per-stage timing histograms served at /metrics/prom; off makes every span a no-op.
+    timing_spans_enabled: bool = True
+    profile_max_seconds: float = 30.0
+    warmup_on_startup: bool = field(default_factory=_get_warmup_on_startup)
+    warmup_startup_delay_seconds: float = 2.0
+    # Pre-market run, America/New_York, Monday to Friday: half an hour before the open.
+    warmup_cron_hour: int = 9
+    warmup_cron_minute: int = 0
+    warmup_chunk_size: int = 5
+    # Warm-up waits for in-flight live requests to finish, but never longer than this per chunk.
+    warmup_max_yield_seconds: float = 30.0
+    warmup_thread_nice: int = 10
+    # A run that fails outright is retried after base * 2**n seconds; once the retries are
+    # spent the worker reports ready in a "degraded" state rather than waiting for the cron.
+    warmup_retry_attempts: int = 3
+    warmup_retry_base_seconds: float = 30.0
+    intraday_interval: str = "5m"
+    intraday_poll_seconds: int = 300
+    # Two regular sessions of 5-minute bars per holding.
+    intraday_buffer_bars: int = 156
+    # "sync" writes each hysteresis update through immediately; "batched" coalesces them and is
+    # only safe with a single worker, since unflushed rows are invisible to the others.
+    hysteresis_write_mode: str = "sync"
+    hysteresis_flush_seconds: float = 2.0
+    # Seconds before a slow news provider is raced by the next one; None disables hedging.
+    news_hedge_after_seconds: float | None = None
+    news_daily_quota_per_provider: int = 100
+    news_cache_max_age_seconds: int = 24 * 60 * 60
+    news_quota_keep_days: int = 7
+    news_retention_days: int = 14
+    news_cluster_window_hours: int = 72
+    news_near_dup_jaccard: float = 0.75
+    news_baseline_floor: float = 3.0
+    news_macro_relevance_default: float = 0.4
+    # How often counter reads pick up hourly hits recorded by other workers.
+    news_counter_sync_seconds: float = 5.0
 
 
 settings = Settings()
@@ -44,3 +132,5 @@ RESERVE_JOB_MINUTES = settings.reserve_job_minutes
 BROAD_JOB_HOURS = settings.broad_job_hours
 RESERVE_MAX_QUERIES = settings.reserve_max_queries
 BROAD_MAX_QUERIES = settings.broad_max_queries
+LEADER_LEASE_SECONDS = settings.leader_lease_seconds
+LEADER_HEARTBEAT_SECONDS = settings.leader_heartbeat_seconds
@@ -1,16 +1,45 @@
 import json
 import sqlite3
-from datetime import datetime, timezone
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
 
 from app.config import settings
+from app.timing import timed
 
 
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+# Called after commit with ("trade" | "audit" | "fundamentals", row); used to push live
+# updates and keep in-process indexes in step with the ledger.
+WriteListener = Callable[[str, dict[str, Any]], None]
+_write_listeners: list[WriteListener] = []
+
+
+def add_write_listener(listener: WriteListener) -> None:
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+
+def remove_write_listener(listener: WriteListener) -> None:
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+def _notify_write(kind: str, row: dict[str, Any]) -> None:
+    for listener in list(_write_listeners):
+        try:
+            listener(kind, row)
+        except Exception:
+            # A broken subscriber must never fail the write that already committed.
+            pass
+
+
 def get_conn() -> sqlite3.Connection:
     db_file = Path(settings.db_path)
     db_file.parent.mkdir(parents=True, exist_ok=True)
@@ -19,9 +48,44 @@ def get_conn() -> sqlite3.Connection:
     return conn
 
 
+# Write notifications raised inside transaction() are held until it commits.
+_deferred_writes: dict[int, list[tuple[str, dict[str, Any]]]] = {}
+
+
+def _after_write(conn: sqlite3.Connection | None, kind: str, row: dict[str, Any]) -> None:
+    pending = _deferred_writes.get(id(conn)) if conn is not None else None
+    if pending is not None:
+        pending.append((kind, row))
+    else:
+        _notify_write(kind, row)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """One connection and one commit for a group of ledger writes; rolls back on error."""
+    conn = get_conn()
+    pending: list[tuple[str, dict[str, Any]]] = []
+    _deferred_writes[id(conn)] = pending
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        pending.clear()
+        raise
+    finally:
+        _deferred_writes.pop(id(conn), None)
+        conn.close()
+    for kind, row in pending:
+        _notify_write(kind, row)
+
+
 def init_db() -> None:
     conn = get_conn()
     try:
+        # WAL lets several uvicorn workers read while one writes the shared ledgers.
+        conn.execute("PRAGMA journal_mode=WAL")
         cur = conn.cursor()
         cur.execute(
             """
@@ -65,34 +129,166 @@ def init_db() -> None:
             )
             """
         )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS provider_quota(
+              provider TEXT NOT NULL,
+              window_start TEXT NOT NULL,
+              used INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY(provider, window_start)
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS news_cache(
+              cache_key TEXT PRIMARY KEY,
+              stored_at REAL NOT NULL,
+              payload_json TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases(
+              name TEXT PRIMARY KEY,
+              holder TEXT NOT NULL,
+              expires_at REAL NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS news_articles(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              ticker TEXT NOT NULL,
+              headline_hash TEXT NOT NULL,
+              minhash BLOB NOT NULL,
+              cluster_id INTEGER NOT NULL,
+              source TEXT,
+              headline TEXT NOT NULL,
+              summary TEXT,
+              published_utc TEXT NOT NULL,
+              bucket_hour INTEGER NOT NULL,
+              UNIQUE(ticker, headline_hash)
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS news_hourly_counts(
+              ticker TEXT NOT NULL,
+              bucket_hour INTEGER NOT NULL,
+              hits INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY(ticker, bucket_hour)
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS positions(
+              ticker TEXT PRIMARY KEY,
+              net_qty REAL NOT NULL DEFAULT 0.0,
+              gross_buy_cost REAL NOT NULL DEFAULT 0.0,
+              gross_buy_qty REAL NOT NULL DEFAULT 0.0
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lots(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              ticker TEXT NOT NULL,
+              buy_trade_id INTEGER NOT NULL,
+              qty_open REAL NOT NULL,
+              price REAL NOT NULL,
+              fees_open REAL NOT NULL DEFAULT 0.0
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS realizations(
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              sell_trade_id INTEGER NOT NULL,
+              ts_utc TEXT NOT NULL,
+              ticker TEXT NOT NULL,
+              qty REAL NOT NULL,
+              proceeds REAL NOT NULL,
+              cost_basis REAL NOT NULL,
+              fees REAL NOT NULL,
+              pnl REAL NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fundamentals(
+              ticker TEXT PRIMARY KEY,
+              sector TEXT,
+              industry TEXT,
+              market_cap REAL,
+              fetched_at REAL NOT NULL
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS walk_forward(
+              ticker TEXT PRIMARY KEY,
+              passed INTEGER NOT NULL,
+              computed_at REAL NOT NULL,
+              expires_at REAL NOT NULL,
+              stats_json TEXT NOT NULL
+            )
+            """
+        )
         cur.execute("CREATE INDEX IF NOT EXISTS idx_trades_ticker_ts ON trades(ticker, ts_utc)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_lots_open ON lots(ticker, id) WHERE qty_open > 0")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_news_ticker_bucket ON news_articles(ticker, bucket_hour)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_news_cluster ON news_articles(cluster_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_news_counts_hour ON news_hourly_counts(bucket_hour)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_ticker_event_ts ON audit_log(ticker, event_type, ts_utc)")
         conn.commit()
     finally:
         conn.close()
 
 
+@timed("db.insert_audit_log")
 def insert_audit_log(
     event_type: str,
     payload: dict[str, Any],
     ticker: str | None = None,
     evidence_hash: str | None = None,
     decision_hash: str | None = None,
+    conn: sqlite3.Connection | None = None,
 ) -> None:
-    conn = get_conn()
+    # With conn, the caller owns the transaction (see transaction()) and commits it.
+    ts_utc = _utc_now_iso()
+    own_conn = conn is None
+    db = conn if conn is not None else get_conn()
     try:
-        conn.execute(
+        cur = db.execute(
             """
             INSERT INTO audit_log(ts_utc, event_type, ticker, evidence_hash, decision_hash, payload_json)
             VALUES (?, ?, ?, ?, ?, ?)
             """,
-            (_utc_now_iso(), event_type, ticker, evidence_hash, decision_hash, json.dumps(payload)),
+            (ts_utc, event_type, ticker, evidence_hash, decision_hash, json.dumps(payload)),
         )
-        conn.commit()
+        audit_id = int(cur.lastrowid)
+        if own_conn:
+            db.commit()
     finally:
-        conn.close()
+        if own_conn:
+            db.close()
+    _after_write(
+        conn,
+        "audit",
+        {"id": audit_id, "ts_utc": ts_utc, "event_type": event_type, "ticker": ticker, "payload": payload},
+    )
 
 
+@timed("db.insert_trade")
 def insert_trade(
     ticker: str,
     side: str,
@@ -104,17 +300,20 @@ def insert_trade(
     strategy_id: str | None = None,
     model_version: str | None = None,
     note: str | None = None,
-) -> None:
-    conn = get_conn()
+    conn: sqlite3.Connection | None = None,
+) -> int:
+    ts_utc = _utc_now_iso()
+    own_conn = conn is None
+    db = conn if conn is not None else get_conn()
     try:
-        conn.execute(
+        cur = db.execute(
             """
             INSERT INTO trades(
               ts_utc, ticker, side, qty, price, fees, strategy_id, model_version, note, evidence_hash, decision_hash
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
-                _utc_now_iso(),
+                ts_utc,
                 ticker.upper(),
                 side,
                 qty,
@@ -127,73 +326,405 @@ def insert_trade(
                 decision_hash,
             ),
         )
+        trade_id = int(cur.lastrowid)
+        _apply_trade_to_positions(db, ticker.upper(), side, qty, price, fees)
+        _apply_trade_to_lots(db, trade_id, ts_utc, ticker.upper(), side, qty, price, fees)
+        if own_conn:
+            db.commit()
+    finally:
+        if own_conn:
+            db.close()
+    _after_write(
+        conn,
+        "trade",
+        {"id": trade_id, "ts_utc": ts_utc, "ticker": ticker.upper(), "side": side, "qty": qty, "price": price, "fees": fees},
+    )
+    return trade_id
+
+
+def _apply_trade_to_positions(
+    conn: sqlite3.Connection, ticker: str, side: str, qty: float, price: float, fees: float
+) -> None:
+    if side == "BUY":
+        deltas = (qty, qty * price + fees, qty)
+    else:
+        deltas = (-qty, 0.0, 0.0)
+    conn.execute(
+        """
+        INSERT INTO positions(ticker, net_qty, gross_buy_cost, gross_buy_qty) VALUES (?, ?, ?, ?)
+        ON CONFLICT(ticker) DO UPDATE SET
+          net_qty=net_qty + excluded.net_qty,
+          gross_buy_cost=gross_buy_cost + excluded.gross_buy_cost,
+          gross_buy_qty=gross_buy_qty + excluded.gross_buy_qty
+        """,
+        (ticker, *deltas),
+    )
+
+
+_LEDGER_POSITIONS_SQL = """
+    SELECT ticker,
+           SUM(CASE WHEN side='BUY' THEN qty ELSE -qty END) AS net_qty,
+           SUM(CASE WHEN side='BUY' THEN qty*price+fees ELSE 0 END) AS gross_buy_cost,
+           SUM(CASE WHEN side='BUY' THEN qty ELSE 0 END) AS gross_buy_qty
+    FROM trades
+    GROUP BY ticker
+"""
+
+
+def _apply_trade_to_lots(
+    conn: sqlite3.Connection,
+    trade_id: int,
+    ts_utc: str,
+    ticker: str,
+    side: str,
+    qty: float,
+    price: float,
+    fees: float,
+) -> None:
+    if side == "BUY":
+        conn.execute(
+            "INSERT INTO lots(ticker, buy_trade_id, qty_open, price, fees_open) VALUES (?, ?, ?, ?, ?)",
+            (ticker, trade_id, qty, price, fees),
+        )
+        return
+    # Sells consume the oldest open lots first; buy fees are carried pro rata with the quantity.
+    remaining = qty
+    cost_basis = 0.0
+    buy_fees = 0.0
+    open_lots = conn.execute(
+        "SELECT id, qty_open, price, fees_open FROM lots WHERE ticker=? AND qty_open > 0 ORDER BY id",
+        (ticker,),
+    ).fetchall()
+    for lot in open_lots:
+        if remaining <= 0:
+            break
+        lot_qty = float(lot["qty_open"])
+        take = min(remaining, lot_qty)
+        cost_basis += take * float(lot["price"])
+        buy_fees += float(lot["fees_open"]) * (take / lot_qty)
+        remaining -= take
+        if lot_qty <= take:
+            conn.execute("UPDATE lots SET qty_open=0, fees_open=0 WHERE id=?", (lot["id"],))
+        else:
+            conn.execute(
+                "UPDATE lots SET qty_open=?, fees_open=? WHERE id=?",
+                (lot_qty - take, float(lot["fees_open"]) * (1 - take / lot_qty), lot["id"]),
+            )
+    realized_qty = qty - remaining
+    if realized_qty <= 0:
+        return
+    proceeds = realized_qty * price
+    total_fees = fees + buy_fees
+    conn.execute(
+        """
+        INSERT INTO realizations(sell_trade_id, ts_utc, ticker, qty, proceeds, cost_basis, fees, pnl)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (trade_id, ts_utc, ticker, realized_qty, proceeds, cost_basis, total_fees, proceeds - cost_basis - total_fees),
+    )
+
+
+def _rebuild_positions(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM positions")
+    conn.execute(
+        f"INSERT INTO positions(ticker, net_qty, gross_buy_cost, gross_buy_qty) {_LEDGER_POSITIONS_SQL}"
+    )
+    conn.execute("DELETE FROM lots")
+    conn.execute("DELETE FROM realizations")
+    for t in conn.execute("SELECT * FROM trades ORDER BY id").fetchall():
+        _apply_trade_to_lots(conn, t["id"], t["ts_utc"], t["ticker"], t["side"], t["qty"], t["price"], t["fees"])
+
+
+def rebuild_positions() -> None:
+    conn = get_conn()
+    try:
+        _rebuild_positions(conn)
         conn.commit()
     finally:
         conn.close()
 
 
-def get_hysteresis_state(ticker: str) -> dict[str, Any]:
+def check_positions_consistency(tolerance: float = 1e-6) -> list[dict[str, Any]]:
     conn = get_conn()
     try:
-        row = conn.execute(
-            "SELECT ticker, consecutive_ok, last_ts_utc, peak_price, downgrade_streak FROM hysteresis_state WHERE ticker=?",
-            (ticker.upper(),),
-        ).fetchone()
-        if row:
-            return dict(row)
-        return {
-            "ticker": ticker.upper(),
-            "consecutive_ok": 0,
-            "last_ts_utc": _utc_now_iso(),
-            "peak_price": None,
-            "downgrade_streak": 0,
+        ledger = {r["ticker"]: dict(r) for r in conn.execute(_LEDGER_POSITIONS_SQL).fetchall()}
+        book = {r["ticker"]: dict(r) for r in conn.execute("SELECT * FROM positions").fetchall()}
+        lots = {
+            r["ticker"]: float(r["qty_open"])
+            for r in conn.execute("SELECT ticker, SUM(qty_open) AS qty_open FROM lots GROUP BY ticker").fetchall()
         }
     finally:
         conn.close()
+    mismatches: list[dict[str, Any]] = []
+    for ticker in sorted(set(ledger) | set(book)):
+        expected = ledger.get(ticker, {})
+        actual = book.get(ticker, {})
+        for column in ("net_qty", "gross_buy_cost", "gross_buy_qty"):
+            if abs(float(expected.get(column) or 0.0) - float(actual.get(column) or 0.0)) > tolerance:
+                mismatches.append({"ticker": ticker, "ledger": expected, "book": actual})
+                break
+        else:
+            if abs(max(0.0, float(expected.get("net_qty") or 0.0)) - lots.get(ticker, 0.0)) > tolerance:
+                mismatches.append({"ticker": ticker, "ledger": expected, "open_lot_qty": lots.get(ticker, 0.0)})
+    return mismatches
 
 
-def upsert_hysteresis_state(
-    ticker: str,
-    consecutive_ok: int | None = None,
-    peak_price: float | None = None,
-    downgrade_streak: int | None = None,
-) -> None:
-    current = get_hysteresis_state(ticker)
-    new_consecutive = current["consecutive_ok"] if consecutive_ok is None else consecutive_ok
-    new_peak = current["peak_price"] if peak_price is None else peak_price
-    new_downgrade = current["downgrade_streak"] if downgrade_streak is None else downgrade_streak
+def realization_for_trade(sell_trade_id: int) -> dict[str, Any] | None:
     conn = get_conn()
     try:
-        conn.execute(
-            """
-            INSERT INTO hysteresis_state(ticker, consecutive_ok, last_ts_utc, peak_price, downgrade_streak)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(ticker) DO UPDATE SET
-              consecutive_ok=excluded.consecutive_ok,
-              last_ts_utc=excluded.last_ts_utc,
-              peak_price=excluded.peak_price,
-              downgrade_streak=excluded.downgrade_streak
+        row = conn.execute("SELECT * FROM realizations WHERE sell_trade_id=?", (sell_trade_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+@timed("db.realization_stats")
+def realization_stats(start_date_iso: str | None = None, end_date_iso: str | None = None) -> dict[str, Any]:
+    """Win/loss aggregates over realizations whose sell falls within [start_date, end_date] (inclusive dates)."""
+    where = ""
+    params: list[Any] = []
+    if start_date_iso is not None:
+        where += " AND ts_utc >= ?"
+        params.append(start_date_iso)
+    if end_date_iso is not None:
+        # ts_utc is a full ISO timestamp; everything on end_date sorts before the next day.
+        where += " AND ts_utc < ?"
+        params.append((date.fromisoformat(end_date_iso) + timedelta(days=1)).isoformat())
+    conn = get_conn()
+    try:
+        totals = conn.execute(
+            f"""
+            SELECT COUNT(*) AS closed,
+                   SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) AS wins,
+                   AVG(CASE WHEN pnl > 0 THEN pnl END) AS avg_win,
+                   AVG(CASE WHEN pnl <= 0 THEN pnl END) AS avg_loss
+            FROM realizations WHERE 1=1{where}
             """,
-            (ticker.upper(), new_consecutive, _utc_now_iso(), new_peak, new_downgrade),
-        )
+            params,
+        ).fetchone()
+        by_ticker = conn.execute(
+            f"SELECT ticker, SUM(pnl) AS pnl FROM realizations WHERE 1=1{where} GROUP BY ticker ORDER BY ticker",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+    closed = int(totals["closed"] or 0)
+    return {
+        "closed": closed,
+        "wins": int(totals["wins"] or 0),
+        "avg_win": float(totals["avg_win"] or 0.0),
+        "avg_loss": float(totals["avg_loss"] or 0.0),
+        "realized_pnl_by_ticker": {r["ticker"]: float(r["pnl"]) for r in by_ticker},
+    }
+
+
+# Process-wide hysteresis cache: the table holds at most a few hundred rows, so it is loaded
+# once and every read-modify-write runs under a per-ticker lock, writing through to SQLite.
+_hysteresis_cache: dict[str, dict[str, Any]] | None = None
+_hysteresis_pending: dict[str, dict[str, Any]] = {}
+_hysteresis_ticker_locks: dict[str, threading.Lock] = {}
+_hysteresis_lock = threading.Lock()
+_hysteresis_flush_timer: threading.Timer | None = None
+
+
+def _default_hysteresis_state(ticker: str) -> dict[str, Any]:
+    return {
+        "ticker": ticker,
+        "consecutive_ok": 0,
+        "last_ts_utc": _utc_now_iso(),
+        "peak_price": None,
+        "downgrade_streak": 0,
+    }
+
+
+def reset_hysteresis_cache() -> dict[str, dict[str, Any]]:
+    global _hysteresis_cache
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT ticker, consecutive_ok, last_ts_utc, peak_price, downgrade_streak FROM hysteresis_state"
+        ).fetchall()
+    finally:
+        conn.close()
+    with _hysteresis_lock:
+        _hysteresis_cache = {row["ticker"]: dict(row) for row in rows}
+        _hysteresis_pending.clear()
+        return _hysteresis_cache
+
+
+def _hysteresis_rows() -> dict[str, dict[str, Any]]:
+    return _hysteresis_cache if _hysteresis_cache is not None else reset_hysteresis_cache()
+
+
+def _ticker_lock(ticker: str) -> threading.Lock:
+    with _hysteresis_lock:
+        lock = _hysteresis_ticker_locks.get(ticker)
+        if lock is None:
+            lock = _hysteresis_ticker_locks[ticker] = threading.Lock()
+        return lock
+
+
+def _write_hysteresis_rows(conn: sqlite3.Connection, states: list[dict[str, Any]]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO hysteresis_state(ticker, consecutive_ok, last_ts_utc, peak_price, downgrade_streak)
+        VALUES (:ticker, :consecutive_ok, :last_ts_utc, :peak_price, :downgrade_streak)
+        ON CONFLICT(ticker) DO UPDATE SET
+          consecutive_ok=excluded.consecutive_ok,
+          last_ts_utc=excluded.last_ts_utc,
+          peak_price=excluded.peak_price,
+          downgrade_streak=excluded.downgrade_streak
+        """,
+        states,
+    )
+
+
+def flush_hysteresis_state() -> None:
+    global _hysteresis_flush_timer
+    with _hysteresis_lock:
+        pending = list(_hysteresis_pending.values())
+        _hysteresis_pending.clear()
+        _hysteresis_flush_timer = None
+    if not pending:
+        return
+    conn = get_conn()
+    try:
+        _write_hysteresis_rows(conn, pending)
         conn.commit()
     finally:
         conn.close()
 
 
+def _load_hysteresis_rows(conn: sqlite3.Connection, tickers: list[str]) -> dict[str, dict[str, Any]]:
+    rows = conn.execute(
+        "SELECT ticker, consecutive_ok, last_ts_utc, peak_price, downgrade_streak FROM hysteresis_state "
+        f"WHERE ticker IN ({','.join('?' * len(tickers))})",
+        tickers,
+    ).fetchall()
+    found = {row["ticker"]: dict(row) for row in rows}
+    return {t: found.get(t) or _default_hysteresis_state(t) for t in tickers}
+
+
+def _apply_hysteresis_update(
+    tickers: list[str], compute: Callable[[dict[str, dict[str, Any]]], dict[str, dict[str, Any]]]
+) -> dict[str, dict[str, Any]]:
+    """Read-modify-write for tickers whose locks the caller holds; refreshes the cache after.
+
+    The current state is re-read from SQLite rather than taken from this process's cache, which
+    other workers' writes never reach. In "sync" mode the read and the write share one
+    BEGIN IMMEDIATE transaction, so concurrent workers serialise instead of overwriting each
+    other. "batched" mode prefers this process's unflushed rows and only holds up with one worker.
+    """
+    conn = get_conn()
+    try:
+        if settings.hysteresis_write_mode == "batched":
+            current = _load_hysteresis_rows(conn, tickers)
+            with _hysteresis_lock:
+                current.update({t: dict(_hysteresis_pending[t]) for t in tickers if t in _hysteresis_pending})
+            new_states = compute(current)
+            _persist_hysteresis_states(list(new_states.values()))
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                new_states = compute(_load_hysteresis_rows(conn, tickers))
+                _write_hysteresis_rows(conn, list(new_states.values()))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()
+    rows = _hysteresis_rows()
+    with _hysteresis_lock:
+        rows.update(new_states)
+    return new_states
+
+
+def _persist_hysteresis_states(states: list[dict[str, Any]]) -> None:
+    global _hysteresis_flush_timer
+    if not states:
+        return
+    with _hysteresis_lock:
+        for state in states:
+            _hysteresis_pending[state["ticker"]] = state
+        if _hysteresis_flush_timer is None:
+            _hysteresis_flush_timer = threading.Timer(settings.hysteresis_flush_seconds, flush_hysteresis_state)
+            _hysteresis_flush_timer.daemon = True
+            _hysteresis_flush_timer.start()
+
+
+def get_hysteresis_state(ticker: str) -> dict[str, Any]:
+    ticker = ticker.upper()
+    state = _hysteresis_rows().get(ticker)
+    return dict(state) if state is not None else _default_hysteresis_state(ticker)
+
+
+def update_hysteresis_state(ticker: str, update: Callable[[dict[str, Any]], dict[str, Any]]) -> dict[str, Any]:
+    ticker = ticker.upper()
+
+    def compute(current: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        state = current[ticker]
+        changes = {k: v for k, v in update(dict(state)).items() if v is not None}
+        return {ticker: {**state, **changes, "ticker": ticker, "last_ts_utc": _utc_now_iso()}}
+
+    with _ticker_lock(ticker):
+        return dict(_apply_hysteresis_update([ticker], compute)[ticker])
+
+
+def update_hysteresis_states(
+    tickers: list[str], update: Callable[[dict[str, dict[str, Any]]], dict[str, dict[str, Any]]]
+) -> dict[str, dict[str, Any]]:
+    """Bulk update_hysteresis_state: every ticker's lock is held across one update call and one write.
+
+    update receives {ticker: current_state} and returns {ticker: changes}.
+    """
+    tickers = sorted({t.upper() for t in tickers})
+
+    def compute(current: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        changes = update({t: dict(state) for t, state in current.items()})
+        now_iso = _utc_now_iso()
+        return {
+            t: {
+                **current[t],
+                **{k: v for k, v in changes.get(t, {}).items() if v is not None},
+                "ticker": t,
+                "last_ts_utc": now_iso,
+            }
+            for t in tickers
+        }
+
+    with ExitStack() as stack:
+        # Sorted acquisition order, so concurrent bulk updates cannot deadlock each other.
+        for ticker in tickers:
+            stack.enter_context(_ticker_lock(ticker))
+        if not tickers:
+            return {}
+        new_states = _apply_hysteresis_update(tickers, compute)
+        return {t: dict(state) for t, state in new_states.items()}
+
+
+def upsert_hysteresis_state(
+    ticker: str,
+    consecutive_ok: int | None = None,
+    peak_price: float | None = None,
+    downgrade_streak: int | None = None,
+) -> None:
+    update_hysteresis_state(
+        ticker,
+        lambda _state: {
+            "consecutive_ok": consecutive_ok,
+            "peak_price": peak_price,
+            "downgrade_streak": downgrade_streak,
+        },
+    )
+
+
+@timed("db.derive_active_positions")
 def derive_active_positions() -> list[dict[str, Any]]:
     conn = get_conn()
     try:
         rows = conn.execute(
-            """
-            SELECT ticker,
-                   SUM(CASE WHEN side='BUY' THEN qty ELSE -qty END) AS net_qty,
-                   SUM(CASE WHEN side='BUY' THEN qty*price+fees ELSE 0 END) AS gross_buy_cost,
-                   SUM(CASE WHEN side='BUY' THEN qty ELSE 0 END) AS gross_buy_qty
-            FROM trades
-            GROUP BY ticker
-            HAVING net_qty > 0
-            """
+            "SELECT ticker, net_qty, gross_buy_cost, gross_buy_qty FROM positions WHERE net_qty > 0 ORDER BY ticker"
         ).fetchall()
         positions: list[dict[str, Any]] = []
         for row in rows:
@@ -250,6 +781,92 @@ def most_recent_decision_payload(ticker: str, since_iso: str) -> dict[str, Any]
         conn.close()
 
 
+@timed("db.most_recent_decision_payloads")
+def most_recent_decision_payloads(tickers: list[str], since_iso: str) -> dict[str, dict[str, Any]]:
+    """most_recent_decision_payload for many tickers in one query; tickers without one are absent."""
+    tickers = sorted({t.upper() for t in tickers})
+    if not tickers:
+        return {}
+    placeholders = ",".join("?" for _ in tickers)
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT a.ticker, a.payload_json
+            FROM audit_log a
+            JOIN (
+              SELECT MAX(id) AS id
+              FROM audit_log
+              WHERE ticker IN ({placeholders}) AND event_type='DECISION' AND ts_utc >= ?
+              GROUP BY ticker
+            ) latest ON latest.id = a.id
+            """,
+            (*tickers, since_iso),
+        ).fetchall()
+        return {row["ticker"]: json.loads(row["payload_json"]) for row in rows}
+    finally:
+        conn.close()
+
+
+def paper_cash_balance() -> float:
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            """
+            SELECT COALESCE(SUM(CASE WHEN side='BUY' THEN -(qty * price + fees) ELSE qty * price - fees END), 0.0) AS flow
+            FROM trades
+            """
+        ).fetchone()
+        return settings.paper_portfolio_usd + float(row["flow"])
+    finally:
+        conn.close()
+
+
+def data_versions() -> tuple[int, int]:
+    # AUTOINCREMENT high-water marks: they only ever grow, even if rows are deleted,
+    # so (trades, audit) changes whenever anything has been appended to either table.
+    conn = get_conn()
+    try:
+        rows = conn.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('trades', 'audit_log')").fetchall()
+        seq = {r["name"]: int(r["seq"]) for r in rows}
+        return seq.get("trades", 0), seq.get("audit_log", 0)
+    finally:
+        conn.close()
+
+
+def ledger_rows_between(
+    trades_after: int, trades_upto: int, audit_after: int, audit_upto: int, event_types: tuple[str, ...]
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Trades and audit rows (of event_types) in the given id ranges, shaped like the write-listener rows."""
+    conn = get_conn()
+    try:
+        trades = conn.execute(
+            "SELECT id, ts_utc, ticker, side, qty, price, fees FROM trades WHERE id > ? AND id <= ? ORDER BY id",
+            (trades_after, trades_upto),
+        ).fetchall()
+        audits = conn.execute(
+            "SELECT id, ts_utc, event_type, ticker, payload_json FROM audit_log WHERE id > ? AND id <= ? "
+            f"AND event_type IN ({','.join('?' * len(event_types))}) ORDER BY id",
+            (audit_after, audit_upto, *event_types),
+        ).fetchall()
+    finally:
+        conn.close()
+    return (
+        [dict(r) for r in trades],
+        [
+            {
+                "id": r["id"],
+                "ts_utc": r["ts_utc"],
+                "event_type": r["event_type"],
+                "ticker": r["ticker"],
+                "payload": json.loads(r["payload_json"]),
+            }
+            for r in audits
+        ],
+    )
+
+
+@timed("db.list_trades")
 def list_trades() -> list[dict[str, Any]]:
     conn = get_conn()
     try:
@@ -257,3 +874,249 @@ def list_trades() -> list[dict[str, Any]]:
         return [dict(r) for r in rows]
     finally:
         conn.close()
+
+
+def quota_window_start(now: datetime | None = None) -> str:
+    return (now or datetime.now(timezone.utc)).date().isoformat()
+
+
+def consume_provider_quota(provider: str, daily_limit: int, window_start: str | None = None) -> bool:
+    if daily_limit <= 0:
+        return False
+    window = window_start or quota_window_start()
+    conn = get_conn()
+    try:
+        # Single statement so concurrent routers and workers cannot overshoot the limit.
+        cur = conn.execute(
+            """
+            INSERT INTO provider_quota(provider, window_start, used) VALUES (?, ?, 1)
+            ON CONFLICT(provider, window_start) DO UPDATE SET used=used + 1 WHERE used < ?
+            """,
+            (provider, window, daily_limit),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def provider_quota_used(provider: str, window_start: str | None = None) -> int:
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            "SELECT used FROM provider_quota WHERE provider=? AND window_start=?",
+            (provider, window_start or quota_window_start()),
+        ).fetchone()
+        return int(row["used"]) if row else 0
+    finally:
+        conn.close()
+
+
+@timed("db.get_cached_news")
+def get_cached_news(cache_key: str, max_age_seconds: float, now: float | None = None) -> tuple[float, Any] | None:
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            "SELECT stored_at, payload_json FROM news_cache WHERE cache_key=?",
+            (cache_key,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    if (now if now is not None else time.time()) - row["stored_at"] > max_age_seconds:
+        return None
+    return float(row["stored_at"]), json.loads(row["payload_json"])
+
+
+@timed("db.put_cached_news")
+def put_cached_news(cache_key: str, value: Any, stored_at: float | None = None) -> None:
+    conn = get_conn()
+    try:
+        conn.execute(
+            """
+            INSERT INTO news_cache(cache_key, stored_at, payload_json) VALUES (?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET stored_at=excluded.stored_at, payload_json=excluded.payload_json
+            """,
+            (cache_key, stored_at if stored_at is not None else time.time(), json.dumps(value)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@timed("db.get_fundamentals")
+def get_fundamentals(tickers: list[str], max_age_seconds: float | None = None) -> dict[str, dict[str, Any]]:
+    """Stored fundamentals in yfinance info shape (marketCap/sector/industry)."""
+    if not tickers:
+        return {}
+    min_fetched = time.time() - max_age_seconds if max_age_seconds is not None else float("-inf")
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            f"SELECT * FROM fundamentals WHERE ticker IN ({','.join('?' * len(tickers))}) AND fetched_at >= ?",
+            (*tickers, min_fetched),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        r["ticker"]: {"marketCap": r["market_cap"], "sector": r["sector"], "industry": r["industry"]} for r in rows
+    }
+
+
+@timed("db.put_fundamentals")
+def put_fundamentals(infos: dict[str, dict[str, Any]], fetched_at: float | None = None) -> None:
+    if not infos:
+        return
+    fetched_at = fetched_at if fetched_at is not None else time.time()
+    conn = get_conn()
+    try:
+        conn.executemany(
+            """
+            INSERT INTO fundamentals(ticker, sector, industry, market_cap, fetched_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET sector=excluded.sector, industry=excluded.industry,
+              market_cap=excluded.market_cap, fetched_at=excluded.fetched_at
+            """,
+            [
+                (t, info.get("sector"), info.get("industry"), info.get("marketCap"), fetched_at)
+                for t, info in infos.items()
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    _notify_write("fundamentals", {"tickers": sorted(infos)})
+
+
+def put_walk_forward_results(results: list[dict[str, Any]], ttl_seconds: float, now: float | None = None) -> None:
+    now = now if now is not None else time.time()
+    conn = get_conn()
+    try:
+        conn.executemany(
+            """
+            INSERT INTO walk_forward(ticker, passed, computed_at, expires_at, stats_json) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET passed=excluded.passed, computed_at=excluded.computed_at,
+              expires_at=excluded.expires_at, stats_json=excluded.stats_json
+            """,
+            [(r["ticker"], int(bool(r["passed"])), now, now + ttl_seconds, json.dumps(r)) for r in results],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_walk_forward(ticker: str, now: float | None = None) -> dict[str, Any] | None:
+    now = now if now is not None else time.time()
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            "SELECT passed, stats_json FROM walk_forward WHERE ticker=? AND expires_at > ?", (ticker.upper(), now)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {**json.loads(row["stats_json"]), "passed": bool(row["passed"])}
+
+
+def stale_walk_forward_tickers(tickers: list[str], now: float | None = None) -> list[str]:
+    if not tickers:
+        return []
+    now = now if now is not None else time.time()
+    conn = get_conn()
+    try:
+        fresh = {
+            r["ticker"]
+            for r in conn.execute(
+                f"SELECT ticker FROM walk_forward WHERE ticker IN ({','.join('?' * len(tickers))}) AND expires_at > ?",
+                (*tickers, now),
+            ).fetchall()
+        }
+    finally:
+        conn.close()
+    return [t for t in tickers if t not in fresh]
+
+
+def exposure_version() -> tuple[int, float]:
+    """(trades high-water mark, newest fundamentals fetch): changes whenever any worker books a
+    trade or stores sector/industry data, which is everything position_exposures depends on."""
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            """
+            SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'trades') AS trades,
+                   (SELECT MAX(fetched_at) FROM fundamentals) AS fundamentals
+            """
+        ).fetchone()
+        return int(row["trades"] or 0), float(row["fundamentals"] or 0.0)
+    finally:
+        conn.close()
+
+
+def position_exposures(ticker: str | None = None) -> list[dict[str, Any]]:
+    """Open positions at cost with their stored sector/industry (all of them, or one ticker)."""
+    sql = """
+        SELECT p.ticker, p.net_qty, p.gross_buy_cost, p.gross_buy_qty, f.sector, f.industry
+        FROM positions p LEFT JOIN fundamentals f ON f.ticker = p.ticker
+        WHERE p.net_qty > 0
+    """
+    params: tuple[Any, ...] = ()
+    if ticker is not None:
+        sql += " AND p.ticker = ?"
+        params = (ticker.upper(),)
+    conn = get_conn()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    out: list[dict[str, Any]] = []
+    for r in rows:
+        avg_cost = (r["gross_buy_cost"] / r["gross_buy_qty"]) if r["gross_buy_qty"] else 0.0
+        out.append(
+            {
+                "ticker": r["ticker"],
+                "cost_value": float(r["net_qty"]) * float(avg_cost),
+                "sector": r["sector"] or "Unknown",
+                "industry": r["industry"] or "Unknown",
+            }
+        )
+    return out
+
+
+def prune_provider_state(cache_max_age_seconds: float, quota_keep_days: int) -> None:
+    oldest_window = (datetime.now(timezone.utc) - timedelta(days=quota_keep_days)).date().isoformat()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM news_cache WHERE stored_at < ?", (time.time() - cache_max_age_seconds,))
+        conn.execute("DELETE FROM provider_quota WHERE window_start < ?", (oldest_window,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def acquire_lease(name: str, holder: str, ttl_seconds: float, now: float | None = None) -> bool:
+    ts = now if now is not None else time.time()
+    conn = get_conn()
+    try:
+        # Renews our own lease, or takes over one whose holder stopped heart-beating.
+        cur = conn.execute(
+            """
+            INSERT INTO leases(name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, expires_at=excluded.expires_at
+            WHERE leases.holder=excluded.holder OR leases.expires_at < ?
+            """,
+            (name, holder, ts + ttl_seconds, ts),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def release_lease(name: str, holder: str) -> None:
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM leases WHERE name=? AND holder=?", (name, holder))
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,53 @@
+from typing import Any
+
+import numpy as np
+
+
+def lttb(points: list[dict[str, Any]], threshold: int) -> list[dict[str, Any]]:
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, per bucket, the point
+    # forming the largest triangle with the previous pick and the next bucket's average.
+    n = len(points)
+    if threshold >= n:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]][: max(threshold, 0)]
+    y = np.array([float(p["value"]) for p in points])
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = [0]
+    prev = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_lo, next_hi = edges[b + 1], edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean() if next_hi > next_lo else x[-1]
+        avg_y = y[next_lo:next_hi].mean() if next_hi > next_lo else y[-1]
+        areas = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(areas.argmax())
+        picked.append(prev)
+    picked.append(n - 1)
+    return [points[i] for i in picked]
+
+
+def ohlc_buckets(points: list[dict[str, Any]], n_buckets: int) -> list[dict[str, Any]]:
+    n = len(points)
+    if n == 0 or n_buckets <= 0:
+        return []
+    edges = np.linspace(0, n, min(n, n_buckets) + 1).astype(int)
+    values = np.array([float(p["value"]) for p in points])
+    out: list[dict[str, Any]] = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi <= lo:
+            continue
+        chunk = values[lo:hi]
+        out.append(
+            {
+                "date": points[lo]["date"],
+                "end_date": points[hi - 1]["date"],
+                "open": float(chunk[0]),
+                "high": float(chunk.max()),
+                "low": float(chunk.min()),
+                "close": float(chunk[-1]),
+                "value": float(chunk[-1]),
+            }
+        )
+    return out
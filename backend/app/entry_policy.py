@@ -1,6 +1,6 @@
 from app.config import settings
-from app.db import get_hysteresis_state, upsert_hysteresis_state
-from app.models import EntryDecision
+from app.db import update_hysteresis_state
+from app.models import DEFAULT_POLICY, EntryDecision, PolicyParams
 
 
 def liquidity_guard(avg_vol_20d: float, avg_close_20d: float, market_cap: float | None) -> bool:
@@ -14,53 +14,95 @@ def _has_hard_veto(key_risks: list[str]) -> bool:
     return any(keyword.lower() in lower for keyword in settings.hard_veto_keywords)
 
 
-def entry_gate(
-    ticker: str,
+def evaluate_entry(
     decision: dict,
     avg_vol_20d: float,
     avg_close_20d: float,
     market_cap: float | None,
     shock_score: float,
+    consecutive_ok: int,
     sector_cap_ok: bool = True,
     corr_penalty_ok: bool = True,
     walk_forward_ok: bool = True,
-) -> EntryDecision:
+    params: PolicyParams = DEFAULT_POLICY,
+) -> tuple[EntryDecision, bool]:
+    """Pure entry decision for a ticker whose stored hysteresis count is consecutive_ok.
+
+    Returns the decision and whether the signal gate passed; the caller owns the hysteresis
+    step (count + 1 on a pass, reset to 0 otherwise) and when it is written.
+    """
     liq_ok = liquidity_guard(avg_vol_20d=avg_vol_20d, avg_close_20d=avg_close_20d, market_cap=market_cap)
     if not liq_ok:
-        upsert_hysteresis_state(ticker, consecutive_ok=0)
-        return EntryDecision(action="NO_TRADE", reason="liquidity_guard_failed")
+        return EntryDecision(action="NO_TRADE", reason="liquidity_guard_failed"), False
     if not sector_cap_ok:
-        upsert_hysteresis_state(ticker, consecutive_ok=0)
-        return EntryDecision(action="NO_TRADE", reason="sector_cap_failed")
+        return EntryDecision(action="NO_TRADE", reason="sector_cap_failed"), False
     if not corr_penalty_ok:
-        upsert_hysteresis_state(ticker, consecutive_ok=0)
-        return EntryDecision(action="NO_TRADE", reason="corr_penalty_failed")
+        return EntryDecision(action="NO_TRADE", reason="corr_penalty_failed"), False
+    if not walk_forward_ok:
+        return EntryDecision(action="NO_TRADE", reason="walk_forward_failed"), False
 
     key_risks = decision.get("key_risks", [])
     if _has_hard_veto(key_risks):
-        upsert_hysteresis_state(ticker, consecutive_ok=0)
-        return EntryDecision(action="NO_TRADE", reason="hard_veto")
+        return EntryDecision(action="NO_TRADE", reason="hard_veto"), False
 
     score = float(decision.get("signal_score", 0.0))
     prob = float(decision.get("prob_outperform_90d", 0.0))
     rec = decision.get("rec")
 
     strong_buy_ok = (
-        rec == "STRONG_BUY" and score >= 0.80 and prob >= 0.60 and bool(walk_forward_ok)
+        rec == "STRONG_BUY"
+        and score >= params.strong_buy_signal
+        and prob >= params.strong_buy_prob
+    )
+    buy_ok = score >= params.buy_signal and prob >= params.buy_prob
+    if not (strong_buy_ok or buy_ok):
+        return EntryDecision(action="NO_TRADE", reason="signal_threshold_failed"), False
+
+    if shock_score > params.shock_override:
+        return EntryDecision(action="BUY", reason="shock_override"), True
+
+    if consecutive_ok + 1 >= params.entry_confirmations:
+        return EntryDecision(action="BUY", reason="hysteresis_pass"), True
+    return EntryDecision(action="NO_TRADE", reason="hysteresis_wait"), True
+
+
+def apply_entry_step(ticker: str, passed: bool) -> dict:
+    """Write the hysteresis step evaluate_entry asked for."""
+    return update_hysteresis_state(
+        ticker, lambda current: {"consecutive_ok": current["consecutive_ok"] + 1 if passed else 0}
     )
-    buy_ok = score >= 0.70 and prob >= 0.55
-    pass_gate = strong_buy_ok or buy_ok
 
-    state = get_hysteresis_state(ticker)
-    consecutive_ok = state["consecutive_ok"] + 1 if pass_gate else 0
-    upsert_hysteresis_state(ticker, consecutive_ok=consecutive_ok)
 
-    if not pass_gate:
-        return EntryDecision(action="NO_TRADE", reason="signal_threshold_failed")
+def entry_gate(
+    ticker: str,
+    decision: dict,
+    avg_vol_20d: float,
+    avg_close_20d: float,
+    market_cap: float | None,
+    shock_score: float,
+    sector_cap_ok: bool = True,
+    corr_penalty_ok: bool = True,
+    walk_forward_ok: bool = True,
+    params: PolicyParams = DEFAULT_POLICY,
+) -> EntryDecision:
+    """evaluate_entry with the hysteresis step applied atomically under the ticker lock."""
+    result: dict[str, EntryDecision] = {}
 
-    if shock_score > 0.7:
-        return EntryDecision(action="BUY", reason="shock_override")
+    def step(current: dict) -> dict:
+        entry, passed = evaluate_entry(
+            decision=decision,
+            avg_vol_20d=avg_vol_20d,
+            avg_close_20d=avg_close_20d,
+            market_cap=market_cap,
+            shock_score=shock_score,
+            consecutive_ok=current["consecutive_ok"],
+            sector_cap_ok=sector_cap_ok,
+            corr_penalty_ok=corr_penalty_ok,
+            walk_forward_ok=walk_forward_ok,
+            params=params,
+        )
+        result["entry"] = entry
+        return {"consecutive_ok": current["consecutive_ok"] + 1 if passed else 0}
 
-    if consecutive_ok >= 2:
-        return EntryDecision(action="BUY", reason="hysteresis_pass")
-    return EntryDecision(action="NO_TRADE", reason="hysteresis_wait")
+    update_hysteresis_state(ticker, step)
+    return result["entry"]
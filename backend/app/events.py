@@ -0,0 +1,249 @@
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from app.config import settings
+from app.db import add_write_listener, data_versions, ledger_rows_between
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    event: str
+    data: Any
+    # The publishing bus's boot token: ids are only comparable within one worker process.
+    epoch: str = ""
+
+    @property
+    def sse_id(self) -> str:
+        return f"{self.epoch}-{self.id}" if self.epoch else str(self.id)
+
+
+@dataclass(eq=False)
+class Subscription:
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Event | None]"
+    backlog: list[Event] = field(default_factory=list)
+    lagged: bool = False
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.sse_id}\nevent: {event.event}\ndata: {json.dumps(event.data, separators=(',', ':'), default=str)}\n\n"
+
+
+class EventBus:
+    """Fan-out from worker threads (jobs, request handlers) to asyncio SSE subscribers."""
+
+    def __init__(self, history: int, queue_size: int, epoch: str | None = None) -> None:
+        self._lock = threading.Lock()
+        # Stream ids are "<epoch>-<seq>". The sequence is per process, so a Last-Event-ID from
+        # another worker, or from before a restart, carries a different epoch and is ignored.
+        self.epoch = secrets.token_hex(4) if epoch is None else epoch
+        self._seq = 0
+        self._history: deque[Event] = deque(maxlen=history)
+        self._queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: Any) -> Event:
+        with self._lock:
+            self._seq += 1
+            ev = Event(id=self._seq, event=event, data=data, epoch=self.epoch)
+            self._history.append(ev)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(self._deliver, sub, ev)
+            except RuntimeError:
+                # The subscriber's event loop is gone (client disconnected during shutdown).
+                self.unsubscribe(sub)
+        return ev
+
+    def _deliver(self, sub: Subscription, ev: Event) -> None:
+        if sub.lagged:
+            return
+        try:
+            sub.queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            # Close slow consumers instead of buffering without bound; EventSource reconnects
+            # with Last-Event-ID and catches up from history.
+            sub.lagged = True
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(None)
+
+    def _resume_after(self, last_event_id: str | None) -> int | None:
+        if not last_event_id:
+            return None
+        epoch, _, seq = last_event_id.rpartition("-")
+        return int(seq) if epoch == self.epoch and seq.isdigit() else None
+
+    def subscribe(self, last_event_id: str | None = None) -> Subscription:
+        """Register a subscriber; a Last-Event-ID issued by this bus replays the history after it."""
+        sub = Subscription(loop=asyncio.get_running_loop(), queue=asyncio.Queue(maxsize=self._queue_size))
+        since = self._resume_after(last_event_id)
+        with self._lock:
+            if since is not None:
+                sub.backlog = [ev for ev in self._history if ev.id > since]
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+
+event_bus = EventBus(history=settings.stream_history_events, queue_size=settings.stream_queue_size)
+
+
+class PriceTicker:
+    """One price computation per tick for the whole process, however many streams are open."""
+
+    def __init__(self, bus: EventBus, interval_seconds: float) -> None:
+        self._bus = bus
+        self._interval = interval_seconds
+        self._compute: Callable[[], list[dict[str, Any]]] | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def set_compute(self, compute: Callable[[], list[dict[str, Any]]]) -> None:
+        self._compute = compute
+
+    def ensure_running(self) -> None:
+        if self._compute is None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        # Stops on its own once the last viewer leaves; the next subscriber restarts it.
+        while self._bus.subscriber_count and self._compute is not None:
+            try:
+                positions = await asyncio.to_thread(self._compute)
+                self._bus.publish("prices", {"as_of_utc": datetime.now(timezone.utc).isoformat(), "positions": positions})
+            except Exception as exc:
+                self._bus.publish("error", {"context": "price_tick", "error": str(exc)})
+            await asyncio.sleep(self._interval)
+
+
+price_ticker = PriceTicker(event_bus, interval_seconds=settings.stream_tick_seconds)
+
+
+STREAMED_AUDIT_TYPES = ("DECISION", "JOB")
+
+
+def _publish_row(bus: EventBus, kind: str, row: dict[str, Any]) -> None:
+    if kind == "trade":
+        bus.publish("trade", row)
+        return
+    event_type = row["event_type"]
+    payload = row["payload"]
+    if event_type == "DECISION":
+        decision = payload.get("llm_decision") or {}
+        bus.publish(
+            "decision",
+            {
+                "id": row["id"],
+                "ts_utc": row["ts_utc"],
+                "ticker": row["ticker"],
+                "rec": decision.get("rec"),
+                "signal_score": decision.get("signal_score"),
+                "prob_outperform_90d": decision.get("prob_outperform_90d"),
+            },
+        )
+    elif event_type == "JOB":
+        bus.publish("job", payload)
+        # Jobs run on the leader only; their triggers reach other workers through this row.
+        for trigger in payload.get("exit_triggers") or []:
+            bus.publish("exit_trigger", trigger)
+
+
+class LedgerFanout:
+    """Streams trades and DECISION/JOB audit rows committed by any worker, each exactly once.
+
+    This process's writes are published at once from the write listener. While this process
+    has subscribers, a poller also watches data_versions() every stream_fanout_poll_seconds
+    and publishes rows other workers committed, so leader-only job events reach every stream.
+    """
+
+    def __init__(self, bus: EventBus, interval_seconds: float, remember: int = 4096) -> None:
+        self._bus = bus
+        self._interval = interval_seconds
+        self._remember = remember
+        self._lock = threading.Lock()
+        self._marks: tuple[int, int] | None = None
+        self._published: dict[str, set[int]] = {"trade": set(), "audit": set()}
+        self._task: asyncio.Task[None] | None = None
+
+    def publish(self, kind: str, row: dict[str, Any]) -> None:
+        with self._lock:
+            seen = self._published[kind]
+            if row["id"] in seen:
+                return
+            seen.add(row["id"])
+            if len(seen) > self._remember:
+                floor = max(seen) - self._remember
+                seen.difference_update([i for i in seen if i <= floor])
+        _publish_row(self._bus, kind, row)
+
+    def reset(self) -> None:
+        """Forget published ids and poll marks, for when the process switches databases."""
+        with self._lock:
+            self._marks = None
+            self._published = {"trade": set(), "audit": set()}
+
+    def poll(self) -> int:
+        """Publish rows committed since the last poll; returns how many rows were read."""
+        versions = data_versions()
+        with self._lock:
+            marks = self._marks
+            if marks is None or versions == marks:
+                # The first poll only sets the marks: subscribers get new rows, not the ledger.
+                self._marks = versions
+                return 0
+            self._marks = versions
+        trades, audits = ledger_rows_between(marks[0], versions[0], marks[1], versions[1], STREAMED_AUDIT_TYPES)
+        for row in trades:
+            self.publish("trade", row)
+        for row in audits:
+            self.publish("audit", row)
+        return len(trades) + len(audits)
+
+    def ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        # Like the price tick: only polls while this process has viewers.
+        while self._bus.subscriber_count:
+            try:
+                await asyncio.to_thread(self.poll)
+            except Exception as exc:
+                self._bus.publish("error", {"context": "ledger_fanout", "error": str(exc)})
+            await asyncio.sleep(self._interval)
+        with self._lock:
+            # Rows written while nobody watched are not replayed to the next viewer.
+            self._marks = None
+
+
+ledger_fanout = LedgerFanout(event_bus, interval_seconds=settings.stream_fanout_poll_seconds)
+
+
+def _on_write(kind: str, row: dict[str, Any]) -> None:
+    if kind == "trade" or (kind == "audit" and row["event_type"] in STREAMED_AUDIT_TYPES):
+        ledger_fanout.publish(kind, row)
+
+
+add_write_listener(_on_write)
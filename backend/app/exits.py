@@ -1,5 +1,34 @@
-from app.db import get_hysteresis_state, upsert_hysteresis_state
-from app.models import ExitDecision
+from typing import Any
+
+import numpy as np
+
+from app.db import update_hysteresis_state, update_hysteresis_states
+from app.market_data import Bars, fetch_bars_with_status
+from app.models import DEFAULT_POLICY, ExitDecision, PolicyParams
+
+
+def _exit_decisions(
+    current_price: np.ndarray,
+    prev_close: np.ndarray,
+    atr_14d: np.ndarray,
+    signal_score: np.ndarray,
+    peak_price: np.ndarray,
+    downgrade_streak: np.ndarray,
+    params: PolicyParams,
+) -> list[ExitDecision]:
+    trail_stop_hit = current_price < peak_price - params.trail_atr_mult * atr_14d
+    pnl_today = np.divide(current_price, prev_close, out=np.ones_like(current_price), where=prev_close > 0) - 1.0
+    take_profit = pnl_today >= params.take_profit_day_pct
+    downgraded = (downgrade_streak >= params.downgrade_streak) & (signal_score < params.downgrade_signal)
+    # Same precedence as the rules read top to bottom: trail stop, take profit, downgrade.
+    choice = np.select([trail_stop_hit, take_profit, downgraded], [0, 1, 2], default=3)
+    options = (
+        ExitDecision(action="SELL_ALL", frac=1.0, reason="atr_trailing_stop_hit"),
+        ExitDecision(action="SELL_PARTIAL", frac=params.take_profit_frac, reason="take_profit_plus_1pct_day"),
+        ExitDecision(action="SELL_ALL", frac=1.0, reason="downgrade_streak_trigger"),
+        ExitDecision(action="HOLD", frac=0.0, reason="hold_conditions"),
+    )
+    return [options[i] for i in choice.tolist()]
 
 
 def exit_policy_v2(
@@ -8,22 +37,77 @@ def exit_policy_v2(
     prev_close: float,
     atr_14d: float,
     signal_score: float,
+    params: PolicyParams = DEFAULT_POLICY,
 ) -> ExitDecision:
-    state = get_hysteresis_state(ticker)
-    peak_price = state["peak_price"] if state["peak_price"] is not None else current_price
-    peak_price = max(peak_price, current_price)
-
-    trail_stop = peak_price - 3.0 * atr_14d
-    trail_stop_hit = current_price < trail_stop
-    pnl_today = (current_price / prev_close - 1.0) if prev_close > 0 else 0.0
-
-    downgrade_streak = state["downgrade_streak"] + 1 if signal_score < 0.70 else 0
-    upsert_hysteresis_state(ticker, peak_price=peak_price, downgrade_streak=downgrade_streak)
-
-    if trail_stop_hit:
-        return ExitDecision(action="SELL_ALL", frac=1.0, reason="atr_trailing_stop_hit")
-    if pnl_today >= 0.01:
-        return ExitDecision(action="SELL_PARTIAL", frac=0.4, reason="take_profit_plus_1pct_day")
-    if downgrade_streak >= 2 and signal_score < 0.70:
-        return ExitDecision(action="SELL_ALL", frac=1.0, reason="downgrade_streak_trigger")
-    return ExitDecision(action="HOLD", frac=0.0, reason="hold_conditions")
+    def advance(current: dict) -> dict:
+        peak = current["peak_price"] if current["peak_price"] is not None else current_price
+        return {
+            "peak_price": max(peak, current_price),
+            "downgrade_streak": current["downgrade_streak"] + 1 if signal_score < params.downgrade_signal else 0,
+        }
+
+    state = update_hysteresis_state(ticker, advance)
+    return _exit_decisions(
+        np.array([current_price], dtype=float),
+        np.array([prev_close], dtype=float),
+        np.array([atr_14d], dtype=float),
+        np.array([signal_score], dtype=float),
+        np.array([state["peak_price"]], dtype=float),
+        np.array([state["downgrade_streak"]]),
+        params,
+    )[0]
+
+
+def evaluate_exits(
+    holdings: list[dict[str, Any]],
+    bars: dict[str, Bars] | None = None,
+    params: PolicyParams = DEFAULT_POLICY,
+) -> dict[str, ExitDecision]:
+    """exit_policy_v2 for every holding at once.
+
+    Each holding carries ticker and signal_score, and optionally current_price (default: the
+    latest close). prev_close and atr_14d come from one bulk bar fetch, computed as in the
+    evidence packet. Peak and streak updates for all tickers are written in one transaction.
+
+    When bars are fetched here, stub bars are discarded: a holding with neither real bars nor
+    a current_price is left out of the result, so a placeholder close never becomes a peak.
+    Callers passing bars must leave stub bars out themselves.
+    """
+    if bars is None:
+        fetched, status = fetch_bars_with_status([h["ticker"] for h in holdings]) if holdings else ({}, {})
+        bars = {t: rows for t, rows in fetched.items() if status.get(t) != "stub"}
+    closes_by_ticker = {t: [r["Close"] for r in rows if r["Close"] > 0] for t, rows in bars.items()}
+    holdings = [h for h in holdings if h.get("current_price") is not None or closes_by_ticker.get(h["ticker"].upper())]
+    if not holdings:
+        return {}
+    tickers = [h["ticker"].upper() for h in holdings]
+    current_price = np.zeros(len(tickers))
+    prev_close = np.zeros(len(tickers))
+    last = np.zeros(len(tickers))
+    for i, (ticker, holding) in enumerate(zip(tickers, holdings)):
+        closes = closes_by_ticker.get(ticker, [])
+        given = holding.get("current_price")
+        current_price[i] = float(given) if given is not None else closes[-1]
+        # Without bars the current price stands in for the last close (no day P&L).
+        last[i] = closes[-1] if closes else current_price[i]
+        prev_close[i] = closes[-2] if len(closes) > 1 else last[i]
+    atr_14d = np.maximum(0.01, last * 0.02)
+    signal_score = np.array([float(h["signal_score"]) for h in holdings])
+    index = {t: i for i, t in enumerate(tickers)}
+
+    def advance(states: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        order = [index[t] for t in states]
+        old_peak = np.array([s["peak_price"] if s["peak_price"] is not None else np.nan for s in states.values()])
+        old_streak = np.array([s["downgrade_streak"] for s in states.values()])
+        peak = np.fmax(old_peak, current_price[order])
+        streak = np.where(signal_score[order] < params.downgrade_signal, old_streak + 1, 0)
+        return {
+            t: {"peak_price": float(p), "downgrade_streak": int(k)}
+            for t, p, k in zip(states, peak.tolist(), streak.tolist())
+        }
+
+    states = update_hysteresis_states(tickers, advance)
+    peak_price = np.array([states[t]["peak_price"] for t in tickers], dtype=float)
+    downgrade_streak = np.array([states[t]["downgrade_streak"] for t in tickers])
+    decisions = _exit_decisions(current_price, prev_close, atr_14d, signal_score, peak_price, downgrade_streak, params)
+    return dict(zip(tickers, decisions))
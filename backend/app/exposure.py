@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Any
+
+from app.config import settings
+from app.db import add_write_listener, exposure_version, position_exposures
+
+UNKNOWN = "Unknown"
+
+
+class ExposureIndex:
+    """Sector/industry exposure at cost, kept in step with the position book.
+
+    Each trade touches one ticker, so an update re-reads that ticker's position row and moves
+    its contribution between buckets; gate checks are dictionary lookups. Those updates only
+    see this process's writes, so lookups also compare exposure_version() (at most every
+    exposure_version_check_seconds) and rebuild when another worker has moved it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_ticker: dict[str, tuple[str, str, float]] = {}
+        self._sector: dict[str, float] = {}
+        self._industry: dict[str, float] = {}
+        self._loaded = False
+        self._version: tuple[int, float] | None = None
+        self._checked_at = 0.0
+
+    def rebuild(self) -> None:
+        # Version first: a write landing between the two reads triggers one more rebuild later.
+        version = exposure_version()
+        rows = position_exposures()
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._by_ticker.clear()
+            self._sector.clear()
+            self._industry.clear()
+            for row in rows:
+                self._set_locked(row["ticker"], row)
+            self._loaded = True
+
+    def refresh(self, ticker: str, trade_id: int | None = None) -> None:
+        """Apply one ticker's position change after a write in this process.
+
+        For a trade, the version moves with it when trade_id is the next id after the known
+        high-water mark, so the next version check does not rebuild for this process's own
+        trade. Any other gap means another worker also booked, and the version is left for
+        that check to catch.
+        """
+        if not self._loaded:
+            self.rebuild()
+            return
+        rows = position_exposures(ticker)
+        with self._lock:
+            self._set_locked(ticker.upper(), rows[0] if rows else None)
+            known = self._version
+            if trade_id is not None and known is not None and trade_id == known[0] + 1:
+                self._version = (trade_id, known[1])
+
+    def _set_locked(self, ticker: str, row: dict[str, Any] | None) -> None:
+        old = self._by_ticker.pop(ticker, None)
+        if old is not None:
+            sector, industry, value = old
+            self._sector[sector] = self._sector.get(sector, 0.0) - value
+            self._industry[industry] = self._industry.get(industry, 0.0) - value
+        if row is None or row["cost_value"] <= 0:
+            return
+        entry = (row["sector"], row["industry"], row["cost_value"])
+        self._by_ticker[ticker] = entry
+        self._sector[entry[0]] = self._sector.get(entry[0], 0.0) + entry[2]
+        self._industry[entry[1]] = self._industry.get(entry[1], 0.0) + entry[2]
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.rebuild()
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < settings.exposure_version_check_seconds:
+                return
+            self._checked_at = now
+            known = self._version
+        if exposure_version() != known:
+            self.rebuild()
+
+    def sector_weight(self, sector: str | None) -> float:
+        self._ensure_loaded()
+        with self._lock:
+            return max(0.0, self._sector.get(sector or UNKNOWN, 0.0)) / settings.paper_portfolio_usd
+
+    def industry_weight(self, industry: str | None) -> float:
+        self._ensure_loaded()
+        with self._lock:
+            return max(0.0, self._industry.get(industry or UNKNOWN, 0.0)) / settings.paper_portfolio_usd
+
+    def sector_cap_ok(self, sector: str | None, add_weight: float | None = None) -> bool:
+        # Names without a known sector cannot be attributed, so they are never blocked here.
+        if not sector or sector == UNKNOWN:
+            return True
+        add = settings.default_max_alloc_pct if add_weight is None else add_weight
+        return self.sector_weight(sector) + add <= settings.sector_cap_pct + 1e-9
+
+    def corr_penalty(self, industry: str | None) -> float:
+        # Same-industry names move together; the share of the industry budget already used is
+        # the penalty fed to compute_alloc_pct.
+        if not industry or industry == UNKNOWN:
+            return 0.0
+        return min(1.0, self.industry_weight(industry) / settings.industry_cap_pct)
+
+    def corr_penalty_ok(self, industry: str | None) -> bool:
+        return self.corr_penalty(industry) < 1.0
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        self._ensure_loaded()
+        with self._lock:
+            return {
+                "sector": {k: round(v, 2) for k, v in self._sector.items() if v > 1e-9},
+                "industry": {k: round(v, 2) for k, v in self._industry.items() if v > 1e-9},
+            }
+
+
+exposure_index = ExposureIndex()
+
+
+def _on_write(kind: str, row: dict[str, Any]) -> None:
+    if kind == "trade":
+        exposure_index.refresh(row["ticker"], trade_id=row["id"])
+    elif kind == "fundamentals":
+        for ticker in row["tickers"]:
+            exposure_index.refresh(ticker)
+
+
+add_write_listener(_on_write)
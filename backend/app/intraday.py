@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.db import derive_active_positions
+from app.lazy import pd, yf
+from app.resilience import UpstreamUnavailable, empty_download, resilient_call
+from app.trading_calendar import is_market_open
+
+OHLCV = ("Open", "High", "Low", "Close", "Volume")
+CLOSE = OHLCV.index("Close")
+
+
+class RingBuffer:
+    """Fixed-capacity intraday bars for one ticker: epoch-second stamps plus float64 OHLCV rows.
+
+    float64 because the last close is booked as a trade price; float32 would round it off
+    at the sixth significant digit.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._ts = np.zeros(self.capacity, dtype=np.int64)
+        self._values = np.zeros((self.capacity, len(OHLCV)), dtype=np.float64)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slot(self, offset: int) -> int:
+        return (self._start + offset) % self.capacity
+
+    def extend(self, ts: np.ndarray, values: np.ndarray) -> int:
+        """Append bars (oldest first) newer than the last one stored and return how many were added.
+
+        A bar stamped like the last stored bar is the still-forming bar and overwrites it.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if self._size:
+            last = self._ts[self._slot(self._size - 1)]
+            same = ts == last
+            if same.any():
+                self._values[self._slot(self._size - 1)] = values[np.flatnonzero(same)[-1]]
+            keep = ts > last
+            ts, values = ts[keep], values[keep]
+        if len(ts) > self.capacity:
+            ts, values = ts[-self.capacity :], values[-self.capacity :]
+        added = len(ts)
+        if not added:
+            return 0
+        slots = (self._start + self._size + np.arange(added)) % self.capacity
+        self._ts[slots] = ts
+        self._values[slots] = values
+        overflow = max(0, self._size + added - self.capacity)
+        self._start = (self._start + overflow) % self.capacity
+        self._size = min(self.capacity, self._size + added)
+        return added
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        # Oldest-first copies, safe to hand out while the poller keeps writing.
+        slots = (self._start + np.arange(self._size)) % self.capacity
+        return self._ts[slots], self._values[slots]
+
+    def last_close(self) -> float | None:
+        if not self._size:
+            return None
+        return float(self._values[self._slot(self._size - 1), CLOSE])
+
+
+class IntradayCache:
+    """Per-process intraday bars for current holdings, filled by the scheduled poller."""
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self._buffers: dict[str, RingBuffer] = {}
+        self._updated_at: dict[str, float] = {}
+
+    def update(self, bars: dict[str, tuple[np.ndarray, np.ndarray]], now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        added = 0
+        with self._lock:
+            for ticker, (ts, values) in bars.items():
+                buffer = self._buffers.get(ticker)
+                if buffer is None:
+                    buffer = self._buffers[ticker] = RingBuffer(self._capacity)
+                added += buffer.extend(ts, values)
+                self._updated_at[ticker] = now
+        return added
+
+    def retain(self, tickers: list[str]) -> None:
+        keep = set(tickers)
+        with self._lock:
+            for ticker in [t for t in self._buffers if t not in keep]:
+                del self._buffers[ticker]
+                self._updated_at.pop(ticker, None)
+
+    def latest_prices(self, tickers: list[str], max_age_seconds: float | None = None, now: float | None = None) -> dict[str, float]:
+        """Last intraday close for tickers refreshed within max_age_seconds; others are absent."""
+        now = time.time() if now is None else now
+        max_age = settings.intraday_poll_seconds * 2 if max_age_seconds is None else max_age_seconds
+        out: dict[str, float] = {}
+        with self._lock:
+            for ticker in tickers:
+                buffer = self._buffers.get(ticker)
+                if buffer is None or now - self._updated_at.get(ticker, 0.0) > max_age:
+                    continue
+                price = buffer.last_close()
+                if price is not None and price > 0:
+                    out[ticker] = price
+        return out
+
+    def bars(self, ticker: str) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            buffer = self._buffers.get(ticker)
+            if buffer is None:
+                return np.empty(0, dtype=np.int64), np.empty((0, len(OHLCV)), dtype=np.float64)
+            return buffer.arrays()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buffers.clear()
+            self._updated_at.clear()
+
+
+intraday_cache = IntradayCache(settings.intraday_buffer_bars)
+
+
+def _frame_arrays(frame: pd.DataFrame) -> tuple[np.ndarray, np.ndarray] | None:
+    if frame is None or frame.empty or "Close" not in frame:
+        return None
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+        return None
+    ts = frame.index.asi8 // 1_000_000_000
+    values = frame.reindex(columns=list(OHLCV)).fillna(0.0).to_numpy(dtype=np.float64)
+    return ts, values
+
+
+def _yf_intraday(tickers: list[str], interval: str) -> pd.DataFrame:
+    data = yf.download(tickers, period="1d", interval=interval, progress=False, auto_adjust=False, group_by="ticker")
+    if data is None or data.empty:
+        raise empty_download(tickers)
+    return data
+
+
+def _download_intraday(tickers: list[str], interval: str) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    try:
+        data = resilient_call("yfinance_intraday", _yf_intraday, tickers, interval)
+    except UpstreamUnavailable:
+        return {}
+    out: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    if isinstance(data.columns, pd.MultiIndex):
+        present = set(data.columns.get_level_values(0))
+        for ticker in tickers:
+            arrays = _frame_arrays(data[ticker]) if ticker in present else None
+            if arrays is not None:
+                out[ticker] = arrays
+    elif len(tickers) == 1:
+        arrays = _frame_arrays(data)
+        if arrays is not None:
+            out[tickers[0]] = arrays
+    return out
+
+
+def poll_intraday(tickers: list[str] | None = None, now: float | None = None) -> dict[str, Any]:
+    """Refresh intraday bars for holdings with one download.
+
+    Exits are not checked here; the reserve job and /api/portfolio/active run exit_policy_v2
+    with these prices through evaluate_exits.
+    """
+    if tickers is None:
+        tickers = [p["ticker"] for p in derive_active_positions()]
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    intraday_cache.retain(tickers)
+    if not tickers:
+        return {"tickers": [], "bars_added": 0}
+    downloaded = _download_intraday(tickers, settings.intraday_interval)
+    added = intraday_cache.update(downloaded, now=now)
+    return {"tickers": sorted(downloaded), "bars_added": added}
+
+
+def poll_intraday_in_session(now: datetime | None = None) -> dict[str, Any] | None:
+    """The scheduled poll: skipped outside the regular session, with one interval of grace
+    after the close so the final bar lands."""
+    grace = timedelta(seconds=settings.intraday_poll_seconds)
+    if not is_market_open(now, grace=grace):
+        return None
+    return poll_intraday()
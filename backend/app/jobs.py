@@ -1,37 +1,46 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any, Callable
-
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable
 
 from app.config import (
     BROAD_JOB_HOURS,
     BROAD_MAX_QUERIES,
+    LEADER_HEARTBEAT_SECONDS,
     RESERVE_JOB_MINUTES,
     RESERVE_MAX_QUERIES,
     settings,
 )
-from app.db import derive_active_positions, insert_audit_log
+from app.db import (
+    derive_active_positions,
+    insert_audit_log,
+    most_recent_decision_payloads,
+    stale_walk_forward_tickers,
+)
 from app.entry_policy import entry_gate
 from app.evidence import build_evidence_packet
+from app.exits import evaluate_exits
+from app.intraday import intraday_cache, poll_intraday_in_session
+from app.exposure import exposure_index
+from app.leader import LeaderLease
 from app.llm_router import llm_decide_from_evidence
-from app.news_providers import gdelt_news, gnews_news, guardian_news, newsdata_news
-from app.provider_router import ProviderRouter
+from app.market_data import fetch_bars_with_status
+from app.news_counters import MACRO_KEY, news_counters, prune_news_counts
+from app.news_index import index_articles, prune_news_index
+from app.optimizer import optimize_portfolio
+from app.provider_router import ProviderRouter, build_news_router
 from app.shock import compute_shock_score
+from app.walk_forward import refresh_walk_forward, walk_forward_ok
+from app.warmup import start_warmup
 
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
 
-def _make_news_router(ttl_seconds: int, budget: int) -> ProviderRouter:
-    return ProviderRouter(
-        providers={
-            "gdelt": gdelt_news,
-            "newsdata": newsdata_news,
-            "gnews": gnews_news,
-            "guardian": guardian_news,
-        },
-        quotas={"gdelt": budget, "newsdata": budget, "gnews": budget, "guardian": budget},
-        ttl_seconds=ttl_seconds,
-    )
+
+def _make_news_router(ttl_seconds: int) -> ProviderRouter:
+    # Daily provider budgets live in the shared SQLite ledger; per-run volume is bounded
+    # by RESERVE_MAX_QUERIES / BROAD_MAX_QUERIES through the ticker slices below.
+    return build_news_router(ttl_seconds=ttl_seconds)
 
 
 def analyze_ticker(ticker: str, router: ProviderRouter | None = None, ttl_seconds: int = 300) -> tuple[dict[str, Any], dict[str, Any]]:
@@ -45,34 +54,68 @@ def run_reserve_job(
     analyzer: Callable[[str, ProviderRouter | None, int], tuple[dict[str, Any], dict[str, Any]]] = analyze_ticker,
 ) -> dict[str, Any]:
     now_iso = datetime.now(timezone.utc).isoformat()
-    router = router or _make_news_router(ttl_seconds=30 * 60, budget=RESERVE_MAX_QUERIES)
+    owned_routers: list[ProviderRouter] = []
+    if router is None:
+        router = _make_news_router(ttl_seconds=30 * 60)
+        owned_routers.append(router)
     holdings = [p["ticker"] for p in derive_active_positions()]
     tickers = holdings[:RESERVE_MAX_QUERIES]
     shock_triggers: list[str] = []
     checked: list[str] = []
     errors: list[dict[str, str]] = []
 
+    signal_scores: dict[str, float] = {}
+    exit_triggers: list[dict[str, Any]] = []
+
     try:
         for ticker in tickers:
             try:
-                evidence, _ = analyzer(ticker, router, 30 * 60)
+                _, decision = analyzer(ticker, router, 30 * 60)
                 checked.append(ticker)
-                shock = compute_shock_score(
-                    today_hits=int(evidence.get("today_hits", 0)),
-                    baseline_7d=float(evidence.get("baseline_7d", 1.0)),
-                    macro_relevance=float(evidence.get("macro_relevance", 0.0)),
-                )
-                if shock > 0.6:
-                    shock_triggers.append(ticker)
+                if decision.get("signal_score") is not None:
+                    signal_scores[ticker] = float(decision["signal_score"])
             except Exception as exc:
                 errors.append({"ticker": ticker, "error": str(exc)})
 
+        # Holdings beyond the query budget fall back to their last recorded decision.
+        since_iso = (datetime.now(timezone.utc) - timedelta(hours=settings.recent_decision_hours)).isoformat()
+        unscored = [t for t in holdings if t not in signal_scores]
+        for ticker, payload in most_recent_decision_payloads(unscored, since_iso).items():
+            score = (payload.get("llm_decision") or {}).get("signal_score")
+            if score is not None:
+                signal_scores[ticker] = float(score)
+        # Holdings are priced from the intraday buffers where the poller has a recent bar, so the
+        # trailing stop sees today's price; ATR and prev_close still come from the daily bars.
+        # Holdings with only stub bars and no intraday price come back without a decision and
+        # are listed as skipped.
+        intraday = intraday_cache.latest_prices(list(signal_scores))
+        exits = evaluate_exits(
+            [{"ticker": t, "signal_score": s, "current_price": intraday.get(t)} for t, s in signal_scores.items()]
+        )
+        exits_skipped = sorted(t for t in signal_scores if t not in exits)
+        for ticker, decision in exits.items():
+            if decision.action == "HOLD":
+                continue
+            trigger = {"ticker": ticker, "action": decision.action, "frac": decision.frac, "reason": decision.reason}
+            # Streamed from the JOB row below, so viewers on every worker get them.
+            exit_triggers.append(trigger)
+
+        # Shock is scored for every holding from the hourly counters, beyond the query budget.
+        macro_relevance = news_counters.macro_relevance()
+        for ticker, (today_hits, baseline_7d) in news_counters.counts_many(holdings).items():
+            shock = compute_shock_score(today_hits=today_hits, baseline_7d=baseline_7d, macro_relevance=macro_relevance)
+            if shock > 0.6:
+                shock_triggers.append(ticker)
+
         payload = {
             "job_name": "reserve_hourly",
             "ran_at_utc": now_iso,
             "max_queries": RESERVE_MAX_QUERIES,
             "tickers_checked": checked,
+            "tickers_scored": holdings,
             "shock_triggers": shock_triggers,
+            "exit_triggers": exit_triggers,
+            "exits_skipped_no_market_data": exits_skipped,
             "errors": errors,
         }
         insert_audit_log(event_type="JOB", ticker=None, payload=payload)
@@ -86,6 +129,9 @@ def run_reserve_job(
             payload={"job_name": "reserve_hourly", "ran_at_utc": now_iso, "error": str(exc)},
         )
         raise
+    finally:
+        for owned in owned_routers:
+            owned.close()
 
 
 def run_broad_job(
@@ -93,19 +139,36 @@ def run_broad_job(
     analyzer: Callable[[str, ProviderRouter | None, int], tuple[dict[str, Any], dict[str, Any]]] = analyze_ticker,
 ) -> dict[str, Any]:
     now_iso = datetime.now(timezone.utc).isoformat()
-    ticker_router = router or _make_news_router(ttl_seconds=60 * 60, budget=BROAD_MAX_QUERIES)
-    non_ticker_router = router or _make_news_router(ttl_seconds=4 * 60 * 60, budget=5)
+    owned_routers: list[ProviderRouter] = []
+    if router is None:
+        ticker_router = _make_news_router(ttl_seconds=60 * 60)
+        non_ticker_router = _make_news_router(ttl_seconds=4 * 60 * 60)
+        owned_routers.extend([ticker_router, non_ticker_router])
+    else:
+        ticker_router = non_ticker_router = router
     holdings = [p["ticker"] for p in derive_active_positions()]
     universe = list(dict.fromkeys(holdings + list(settings.watchlist)))
     tickers = universe[:BROAD_MAX_QUERIES]
     checked: list[str] = []
     entry_candidates: list[str] = []
+    candidates: list[dict[str, Any]] = []
+    target_allocations: dict[str, Any] = {}
     errors: list[dict[str, str]] = []
 
     try:
+        prune_news_index(settings.news_retention_days)
+        prune_news_counts()
+        # Walk-forward results expire after walk_forward_ttl_hours; only stale tickers rerun.
+        walk_forward_refreshed = 0
+        try:
+            walk_forward_refreshed = len(refresh_walk_forward(stale_walk_forward_tickers(universe)))
+        except Exception as exc:
+            errors.append({"ticker": "UNIVERSE", "error": f"walk_forward: {exc}"})
         # Non-ticker macro snapshot uses a longer cache TTL.
-        macro_news = non_ticker_router.call(cache_key="macro:global", ticker="MACRO", limit=1)
+        macro_news = non_ticker_router.call(cache_key="macro:global", ticker=MACRO_KEY, limit=1)
         macro_hits = len(macro_news) if isinstance(macro_news, list) else 0
+        if isinstance(macro_news, list):
+            index_articles(MACRO_KEY, macro_news)
 
         for ticker in tickers:
             try:
@@ -118,12 +181,33 @@ def run_broad_job(
                     avg_close_20d=float(evidence.get("avg_close_20d", 0.0)),
                     market_cap=evidence.get("market_cap"),
                     shock_score=float(evidence.get("shock_score", 0.0)),
+                    sector_cap_ok=exposure_index.sector_cap_ok(evidence.get("sector")),
+                    corr_penalty_ok=exposure_index.corr_penalty_ok(evidence.get("industry")),
+                    walk_forward_ok=walk_forward_ok(ticker),
                 )
                 if gate.action == "BUY":
                     entry_candidates.append(ticker)
+                if gate.action == "BUY" or ticker in holdings:
+                    candidates.append(
+                        {
+                            "ticker": ticker,
+                            "sector": evidence.get("sector", "Unknown"),
+                            "prob_outperform_90d": float(decision.get("prob_outperform_90d", 0.5)),
+                            "vol_20d": float(evidence.get("vol_20d", 0.0)),
+                            "velocity": float(evidence.get("velocity", 0.0)),
+                            "corr_penalty": float(evidence.get("corr_penalty", 0.0)),
+                        }
+                    )
             except Exception as exc:
                 errors.append({"ticker": ticker, "error": str(exc)})
 
+        # Size the book jointly: holdings plus today's entry candidates, one covariance solve.
+        try:
+            bars, bar_status = fetch_bars_with_status([c["ticker"] for c in candidates]) if candidates else ({}, {})
+            target_allocations = optimize_portfolio(candidates, bars, bar_status=bar_status)
+        except Exception as exc:
+            errors.append({"ticker": "PORTFOLIO", "error": f"optimizer: {exc}"})
+
         payload = {
             "job_name": "broad_6h",
             "ran_at_utc": now_iso,
@@ -131,6 +215,8 @@ def run_broad_job(
             "macro_hits": macro_hits,
             "tickers_checked": checked,
             "entry_candidates": entry_candidates,
+            "target_allocations": target_allocations,
+            "walk_forward_refreshed": walk_forward_refreshed,
             "errors": errors,
         }
         insert_audit_log(event_type="JOB", ticker=None, payload=payload)
@@ -144,12 +230,30 @@ def run_broad_job(
             payload={"job_name": "broad_6h", "ran_at_utc": now_iso, "error": str(exc)},
         )
         raise
+    finally:
+        for owned in owned_routers:
+            owned.close()
 
 
-def create_scheduler(app: object | None = None) -> BackgroundScheduler:
+def _leader_only(job: Callable[[], Any], lease: LeaderLease | None) -> Callable[[], None]:
+    def wrapper() -> None:
+        # Renew before running so a worker that lost the lease never starts a job.
+        if lease is not None and not lease.heartbeat():
+            return
+        job()
+
+    return wrapper
+
+
+def create_scheduler(app: object | None = None, lease: LeaderLease | None = None) -> BackgroundScheduler:
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     scheduler = BackgroundScheduler(timezone="UTC")
+    reserve_job: Callable[[], Any] = run_reserve_job
+    broad_job: Callable[[], Any] = run_broad_job
+    warmup_router: ProviderRouter | None = None
     if app is not None and hasattr(app, "state") and hasattr(app.state, "news_router"):
-        shared_router = app.state.news_router
+        shared_router = warmup_router = app.state.news_router
 
         def reserve_wrapper() -> None:
             run_reserve_job(router=shared_router)
@@ -157,9 +261,37 @@ def create_scheduler(app: object | None = None) -> BackgroundScheduler:
         def broad_wrapper() -> None:
             run_broad_job(router=shared_router)
 
-        scheduler.add_job(reserve_wrapper, "interval", minutes=RESERVE_JOB_MINUTES, id="reserve_job", replace_existing=True)
-        scheduler.add_job(broad_wrapper, "interval", hours=BROAD_JOB_HOURS, id="broad_job", replace_existing=True)
-    else:
-        scheduler.add_job(run_reserve_job, "interval", minutes=RESERVE_JOB_MINUTES, id="reserve_job", replace_existing=True)
-        scheduler.add_job(run_broad_job, "interval", hours=BROAD_JOB_HOURS, id="broad_job", replace_existing=True)
+        reserve_job = reserve_wrapper
+        broad_job = broad_wrapper
+
+    scheduler.add_job(
+        _leader_only(reserve_job, lease), "interval", minutes=RESERVE_JOB_MINUTES, id="reserve_job", replace_existing=True
+    )
+    scheduler.add_job(_leader_only(broad_job, lease), "interval", hours=BROAD_JOB_HOURS, id="broad_job", replace_existing=True)
+    # Not leader-only: the intraday buffers are per-process memory that every worker serves from.
+    # Outside market hours the poll is a no-op.
+    scheduler.add_job(
+        poll_intraday_in_session,
+        "interval",
+        seconds=settings.intraday_poll_seconds,
+        id="intraday_poll",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+    # Also per-process: each worker warms its own caches before the open.
+    scheduler.add_job(
+        lambda: start_warmup(warmup_router, delay_seconds=0.0),
+        "cron",
+        day_of_week="mon-fri",
+        hour=settings.warmup_cron_hour,
+        minute=settings.warmup_cron_minute,
+        timezone="America/New_York",
+        id="premarket_warmup",
+        replace_existing=True,
+    )
+    if lease is not None:
+        scheduler.add_job(
+            lease.heartbeat, "interval", seconds=LEADER_HEARTBEAT_SECONDS, id="leader_heartbeat", replace_existing=True
+        )
     return scheduler
@@ -0,0 +1,39 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule:
+    """Stands in for a heavy module and imports it on first attribute access.
+
+    Attributes set on the placeholder (e.g. by unittest.mock.patch) shadow the real module's,
+    and every importer shares one placeholder, as they would share the module itself.
+    """
+
+    def __init__(self, name: str) -> None:
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self) -> ModuleType:
+        module = self._module
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+# yfinance pulls in pandas, curl_cffi and bs4; together they dominate cold start, and most
+# processes (tests, /health, followers without market-data traffic) never need them.
+yf = LazyModule("yfinance")
+pd = LazyModule("pandas")
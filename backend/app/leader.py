@@ -0,0 +1,37 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+from app.db import acquire_lease, release_lease
+
+
+class LeaderLease:
+    def __init__(self, name: str, ttl_seconds: float, holder: str | None = None) -> None:
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._valid_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        # A stalled heartbeat must not leave two leaders, so trust the lease only until it expires.
+        return time.time() < self._valid_until
+
+    def heartbeat(self, now: float | None = None) -> bool:
+        ts = now if now is not None else time.time()
+        with self._lock:
+            try:
+                acquired = acquire_lease(self.name, self.holder, self.ttl_seconds, now=ts)
+            except Exception:
+                acquired = False
+            self._valid_until = ts + self.ttl_seconds if acquired else 0.0
+            return acquired
+
+    def release(self) -> None:
+        with self._lock:
+            if self._valid_until > 0.0:
+                release_lease(self.name, self.holder)
+            self._valid_until = 0.0
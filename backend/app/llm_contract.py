@@ -1,6 +1,5 @@
-from jsonschema import validate
-from jsonschema.exceptions import ValidationError
-
+from functools import lru_cache
+from typing import Any
 
 DECISION_SCHEMA = {
     "type": "object",
@@ -28,9 +27,20 @@ DECISION_SCHEMA = {
 }
 
 
+@lru_cache(maxsize=1)
+def _decision_validator() -> Any:
+    # jsonschema is imported on the first decision, not at startup; the checked schema is reused.
+    from jsonschema import Draft202012Validator
+
+    Draft202012Validator.check_schema(DECISION_SCHEMA)
+    return Draft202012Validator(DECISION_SCHEMA)
+
+
 def validate_decision_payload(payload: dict) -> dict:
-    try:
-        validate(instance=payload, schema=DECISION_SCHEMA)
-    except ValidationError as exc:
-        raise ValueError(f"Invalid LLM decision payload: {exc.message}") from exc
+    from jsonschema.exceptions import best_match
+
+    # Same error selection as jsonschema.validate.
+    error = best_match(_decision_validator().iter_errors(payload))
+    if error is not None:
+        raise ValueError(f"Invalid LLM decision payload: {error.message}") from error
     return payload
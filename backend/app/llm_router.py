@@ -1,14 +1,26 @@
+from typing import Any
+
+import numpy as np
+
 from app.llm_contract import validate_decision_payload
 
 
+def score_features(momentum: Any, vol: Any, news_sentiment: Any) -> tuple[Any, Any]:
+    # Works on floats and on NumPy arrays, so backtests replay exactly the live scoring.
+    signal_score = np.clip(0.55 + momentum * 2.0 + news_sentiment * 0.2 - vol, 0.0, 1.0)
+    prob_outperform = np.clip(0.50 + momentum + news_sentiment * 0.25, 0.0, 1.0)
+    return signal_score, prob_outperform
+
+
 def llm_decide_from_evidence(evidence_packet: dict) -> dict:
     # TODO: Implement real LLM provider routing and model call.
     momentum = evidence_packet.get("price_momentum_20d", 0.0)
     vol = evidence_packet.get("vol_20d", 0.0)
     news_sentiment = evidence_packet.get("news_sentiment", 0.0)
 
-    signal_score = max(0.0, min(1.0, 0.55 + momentum * 2.0 + news_sentiment * 0.2 - vol))
-    prob_outperform = max(0.0, min(1.0, 0.50 + momentum + news_sentiment * 0.25))
+    signal_array, prob_array = score_features(momentum, vol, news_sentiment)
+    signal_score = float(signal_array)
+    prob_outperform = float(prob_array)
 
     if signal_score >= 0.80 and prob_outperform >= 0.60:
         rec = "STRONG_BUY"
@@ -42,3 +54,15 @@ def llm_decide_from_evidence(evidence_packet: dict) -> dict:
         ],
     }
     return validate_decision_payload(decision)
+
+
+def llm_decide_batch(evidence_packets: list[dict]) -> list[dict | Exception]:
+    # Decides each packet in turn with llm_decide_from_evidence; there is no shared provider
+    # request. Failures are returned per packet so one bad ticker does not sink the batch.
+    results: list[dict | Exception] = []
+    for packet in evidence_packets:
+        try:
+            results.append(llm_decide_from_evidence(packet))
+        except Exception as exc:
+            results.append(exc)
+    return results
@@ -1,31 +1,56 @@
-from datetime import datetime, timedelta, timezone
-from typing import Any
-
-import yfinance as yf
-from fastapi import FastAPI, HTTPException, Request
+import asyncio
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterator, Literal
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
-from app.config import ENABLE_SCHEDULER, settings
+from app.config import ENABLE_SCHEDULER, LEADER_LEASE_SECONDS, settings
 from app.db import (
+    check_positions_consistency,
     derive_active_positions,
+    flush_hysteresis_state,
     get_hysteresis_state,
     init_db,
     insert_audit_log,
     insert_trade,
     most_recent_decision_hashes,
-    most_recent_decision_payload,
+    most_recent_decision_payloads,
+    prune_provider_state,
+    realization_for_trade,
+    rebuild_positions,
+    reset_hysteresis_cache,
 )
 from app.entry_policy import entry_gate
+from app.events import event_bus, format_sse, ledger_fanout, price_ticker
 from app.evidence import build_evidence_packet
-from app.exits import exit_policy_v2
+from app.exits import evaluate_exits
+from app.exposure import exposure_index
 from app.hashing import canonical_json_hash
 from app.jobs import create_scheduler
-from app.llm_router import llm_decide_from_evidence
+from app.leader import LeaderLease
+from app.llm_router import llm_decide_batch, llm_decide_from_evidence
+from app.market_data import fetch_bars_with_status, fetch_fundamentals
 from app.metrics import compute_metrics
-from app.news_providers import gdelt_news, gnews_news, guardian_news, newsdata_news
-from app.provider_router import ProviderRouter
+from app.risk import compute_risk_metrics
+from app.news_counters import news_counters
+from app.news_index import prune_news_index
+from app.news_providers import close_http_clients
+from app.orders import NoMarketPrice, OrderSpec, OrderValidationError, execute_orders
+from app.pricing import current_prices
+from app.profiler import ProfilerBusy, collapsed, sample_stacks
+from app.provider_router import ProviderRouter, build_news_router
+from app import resilience
+from app.resilience import breaker_states
+from app.response_cache import cached_json
 from app.sizing import compute_alloc_pct, derive_qty
+from app.timing import render_prometheus
+from app.walk_forward import walk_forward_ok
+from app.warmup import LiveRequestMiddleware, mark_disabled, readiness, start_warmup, stop_warmup
 
 app = FastAPI(title="Stock Analysis Portfolio Bot v2")
 
@@ -36,6 +61,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LiveRequestMiddleware)
 
 
 class BuyRequest(BaseModel):
@@ -46,20 +72,27 @@ class BuyRequest(BaseModel):
     fees: float = 0.0
 
 
-class SellRequest(BaseModel):
+class AnalyzeBatchRequest(BaseModel):
+    tickers: list[str]
+
+
+class OrderItem(BaseModel):
     ticker: str
+    side: Literal["BUY", "SELL"]
     qty_optional: float | None = None
+    notional_usd_optional: float | None = None
     fees: float = 0.0
 
 
-def _safe_current_price(ticker: str) -> float:
-    try:
-        data = yf.download(ticker, period="5d", interval="1d", progress=False, auto_adjust=False)
-        if data is not None and not data.empty:
-            return float(data["Close"].dropna().iloc[-1])
-    except Exception:
-        pass
-    return 100.0
+class OrdersRequest(BaseModel):
+    orders: list[OrderItem]
+    risk_mode: str | None = None
+
+
+class SellRequest(BaseModel):
+    ticker: str
+    qty_optional: float | None = None
+    fees: float = 0.0
 
 
 def analyze(ticker: str, router: ProviderRouter | None = None) -> tuple[dict[str, Any], dict[str, Any]]:
@@ -71,59 +104,210 @@ def analyze(ticker: str, router: ProviderRouter | None = None) -> tuple[dict[str
 @app.on_event("startup")
 def _startup() -> None:
     init_db()
-    app.state.news_router = ProviderRouter(
-        providers={
-            "gdelt": gdelt_news,
-            "newsdata": newsdata_news,
-            "gnews": gnews_news,
-            "guardian": guardian_news,
-        },
-        quotas={"gdelt": 100, "newsdata": 100, "gnews": 100, "guardian": 100},
-        ttl_seconds=300,
-    )
+    reset_hysteresis_cache()
+    mismatches = check_positions_consistency()
+    if mismatches:
+        insert_audit_log(event_type="ERROR", payload={"context": "position_book_rebuilt", "mismatches": mismatches})
+        rebuild_positions()
+    exposure_index.rebuild()
+    prune_provider_state(settings.news_cache_max_age_seconds, settings.news_quota_keep_days)
+    prune_news_index(settings.news_retention_days)
+    news_counters.reload()
+    app.state.news_router = build_news_router(ttl_seconds=300)
+    if settings.warmup_on_startup:
+        start_warmup(app.state.news_router)
+    else:
+        mark_disabled()
     if ENABLE_SCHEDULER:
-        scheduler = create_scheduler(app)
+        # Every worker runs a scheduler, but only the holder of the SQLite lease runs jobs;
+        # the others keep heart-beating and take over once the leader's lease expires.
+        lease = LeaderLease("scheduler", ttl_seconds=LEADER_LEASE_SECONDS)
+        lease.heartbeat()
+        scheduler = create_scheduler(app, lease=lease)
         scheduler.start()
         app.state.scheduler = scheduler
+        app.state.leader_lease = lease
 
 
 @app.on_event("shutdown")
 def _shutdown() -> None:
+    stop_warmup()
     scheduler = getattr(app.state, "scheduler", None)
     if scheduler is not None and scheduler.running:
         scheduler.shutdown(wait=False)
+    flush_hysteresis_state()
+    lease = getattr(app.state, "leader_lease", None)
+    if lease is not None:
+        lease.release()
+    router = getattr(app.state, "news_router", None)
+    if router is not None:
+        router.close()
+    close_http_clients()
 
 
 @app.get("/health")
-def health() -> dict[str, str]:
+async def health() -> dict[str, str]:
+    # Served on the event loop, never the threadpool, and touches no market-data module.
     return {"status": "ok"}
 
 
+@app.get("/metrics/prom")
+def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/debug/profile")
+def debug_profile(
+    seconds: float = Query(default=5.0, gt=0),
+    interval_ms: float = Query(default=10.0, ge=1.0, le=1000.0),
+) -> PlainTextResponse:
+    # Collapsed stacks ("thread;frame;...;frame count"), ready for flamegraph.pl or speedscope.
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.profile_max_seconds}")
+    try:
+        samples = sample_stacks(seconds, interval_ms / 1000.0)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return PlainTextResponse(collapsed(samples))
+
+
+@app.get("/api/ready")
+def ready(request: Request, response: Response) -> dict[str, Any]:
+    # 503 until the first warm-up completes, so a load balancer can hold traffic back.
+    state = readiness(getattr(request.app.state, "news_router", None))
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
+@app.get("/api/market-data/status")
+def market_data_status_endpoint() -> dict[str, Any]:
+    return {"breakers": breaker_states(), "retry_budget_tokens": round(resilience.retry_budget.tokens, 2)}
+
+
 @app.get("/api/analyze/{ticker}")
-def analyze_endpoint(request: Request, ticker: str) -> dict[str, Any]:
+def analyze_endpoint(request: Request, ticker: str) -> Response:
     router = getattr(request.app.state, "news_router", None)
-    evidence_packet, llm_decision = analyze(ticker, router=router)
-    return {"evidence_packet": evidence_packet, "llm_decision": llm_decision}
+
+    def compute() -> dict[str, Any]:
+        evidence_packet, llm_decision = analyze(ticker, router=router)
+        return {"evidence_packet": evidence_packet, "llm_decision": llm_decision}
+
+    return cached_json(request, compute)
+
+
+def analyze_batch(tickers: list[str], router: ProviderRouter | None = None) -> Iterator[dict[str, Any]]:
+    # One bulk download for bars and one concurrent sweep for fundamentals up front; evidence
+    # (news) is built in parallel and each group of finished packets goes to llm_decide_batch.
+    # Results built on stub bars are streamed as "degraded", not "ok".
+    bars, bar_status = fetch_bars_with_status(tickers)
+    infos = fetch_fundamentals(tickers)
+    ok = degraded = 0
+    with ThreadPoolExecutor(max_workers=min(len(tickers), settings.analyze_batch_workers)) as pool:
+        pending: dict[Future[dict[str, Any]], str] = {
+            pool.submit(build_evidence_packet, t, news_router=router, bars=bars[t], info=infos[t]): t for t in tickers
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            ready: list[tuple[str, dict[str, Any]]] = []
+            for future in done:
+                ticker = pending.pop(future)
+                try:
+                    ready.append((ticker, future.result()))
+                except Exception as exc:
+                    yield {
+                        "ticker": ticker,
+                        "status": "error",
+                        "stage": "evidence",
+                        "market_data_status": bar_status[ticker],
+                        "error": str(exc),
+                    }
+            decisions = llm_decide_batch([packet for _, packet in ready]) if ready else []
+            for (ticker, packet), decision in zip(ready, decisions):
+                if isinstance(decision, Exception):
+                    yield {
+                        "ticker": ticker,
+                        "status": "error",
+                        "stage": "decision",
+                        "market_data_status": bar_status[ticker],
+                        "error": str(decision),
+                    }
+                    continue
+                if bar_status[ticker] == "stub":
+                    degraded += 1
+                    status = "degraded"
+                else:
+                    ok += 1
+                    status = "ok"
+                yield {
+                    "ticker": ticker,
+                    "status": status,
+                    "market_data_status": bar_status[ticker],
+                    "evidence_packet": packet,
+                    "llm_decision": decision,
+                }
+    yield {
+        "status": "done",
+        "requested": len(tickers),
+        "ok": ok,
+        "degraded": degraded,
+        "failed": len(tickers) - ok - degraded,
+    }
+
+
+@app.post("/api/analyze/batch")
+def analyze_batch_endpoint(request: Request, req: AnalyzeBatchRequest) -> StreamingResponse:
+    tickers = list(dict.fromkeys(t.strip().upper() for t in req.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required")
+    if len(tickers) > settings.analyze_batch_max_tickers:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.analyze_batch_max_tickers} tickers per request"
+        )
+    router = getattr(request.app.state, "news_router", None)
+    lines = (json.dumps(item, default=str) + "\n" for item in analyze_batch(tickers, router=router))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 
 @app.get("/api/portfolio/active")
-def active_positions(request: Request) -> list[dict[str, Any]]:
+def active_positions(request: Request) -> Response:
+    router = getattr(request.app.state, "news_router", None)
+    return cached_json(request, lambda: _active_positions(router))
+
+
+def _active_positions(router: ProviderRouter | None) -> list[dict[str, Any]]:
     positions = derive_active_positions()
+    tickers = [p["ticker"] for p in positions]
     since_iso = (datetime.now(timezone.utc) - timedelta(hours=settings.recent_decision_hours)).isoformat()
-    router = getattr(request.app.state, "news_router", None)
+    recent = most_recent_decision_payloads(tickers, since_iso)
+    fetched, bar_status = fetch_bars_with_status(tickers) if tickers else ({}, {})
+    # Stub bars must not feed prev_close or ATR; those holdings are priced from current_price alone.
+    bars = {t: rows for t, rows in fetched.items() if bar_status.get(t) != "stub"}
+    prices, stale = current_prices(tickers)
     result: list[dict[str, Any]] = []
+    scored: list[dict[str, Any]] = []
     for p in positions:
         ticker = p["ticker"]
-        current_price = _safe_current_price(ticker)
         avg_cost = p["avg_cost"]
-        unrealized = (current_price / avg_cost - 1.0) if avg_cost > 0 else 0.0
-        recent_decision = most_recent_decision_payload(ticker, since_iso)
-        evidence: dict[str, Any] | None = None
+        # Without any real price the position is shown at cost and kept out of exit checks.
+        current_price = prices.get(ticker, avg_cost)
+        row: dict[str, Any] = {
+            "ticker": ticker,
+            "net_qty": p["net_qty"],
+            "avg_cost": avg_cost,
+            "current_price": current_price,
+            "price_stale": ticker in stale or ticker not in prices,
+            "unrealized_pnl_pct": (current_price / avg_cost - 1.0) if avg_cost > 0 else 0.0,
+            "last_decision": None,
+            "sell_trigger": False,
+            "sell_reason": "no_recent_decision",
+        }
+        result.append(row)
+        recent_decision = recent.get(ticker)
 
         if recent_decision is None:
             try:
                 evidence_packet, llm_decision = analyze(ticker, router=router)
-                evidence = evidence_packet
                 evidence_hash = canonical_json_hash(evidence_packet)
                 decision_hash = canonical_json_hash(llm_decision)
                 insert_audit_log(
@@ -140,60 +324,90 @@ def active_positions(request: Request) -> list[dict[str, Any]]:
                     ticker=ticker,
                     payload={"error": str(exc), "context": "active_positions_no_recent_decision"},
                 )
-                result.append(
-                    {
-                        "ticker": ticker,
-                        "net_qty": p["net_qty"],
-                        "avg_cost": avg_cost,
-                        "current_price": current_price,
-                        "unrealized_pnl_pct": unrealized,
-                        "last_decision": None,
-                        "sell_trigger": False,
-                        "sell_reason": "no_recent_decision",
-                    }
-                )
                 continue
 
         llm_decision = recent_decision.get("llm_decision") or {}
-        signal_score_raw = llm_decision.get("signal_score")
-        if signal_score_raw is None:
-            result.append(
+        row["last_decision"] = llm_decision if llm_decision else None
+        if llm_decision.get("signal_score") is None:
+            continue
+        if ticker not in prices:
+            row["sell_reason"] = "market_data_unavailable"
+            continue
+        scored.append({"ticker": ticker, "signal_score": float(llm_decision["signal_score"]), "current_price": current_price})
+
+    # One bulk pass for every scored holding: a single hysteresis read and write.
+    exits = evaluate_exits(scored, bars=bars)
+    for row in result:
+        exit_decision = exits.get(row["ticker"])
+        if exit_decision is None:
+            continue
+        if exit_decision.action != "HOLD":
+            event_bus.publish(
+                "exit_trigger",
                 {
-                    "ticker": ticker,
-                    "net_qty": p["net_qty"],
-                    "avg_cost": avg_cost,
-                    "current_price": current_price,
-                    "unrealized_pnl_pct": unrealized,
-                    "last_decision": llm_decision if llm_decision else None,
-                    "sell_trigger": False,
-                    "sell_reason": "no_recent_decision",
-                }
+                    "ticker": row["ticker"],
+                    "action": exit_decision.action,
+                    "frac": exit_decision.frac,
+                    "reason": exit_decision.reason,
+                    "current_price": row["current_price"],
+                },
             )
-            continue
+        row["sell_trigger"] = exit_decision.action != "HOLD"
+        row["sell_reason"] = exit_decision.reason
+    return result
 
-        if evidence is None:
-            evidence = build_evidence_packet(ticker, news_router=router)
-        signal_score = float(signal_score_raw)
-        exit_decision = exit_policy_v2(
-            ticker=ticker,
-            current_price=current_price,
-            prev_close=evidence["prev_close"],
-            atr_14d=evidence["atr_14d"],
-            signal_score=signal_score,
-        )
-        result.append(
+
+def _price_tick() -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    positions = derive_active_positions()
+    prices, stale = current_prices([p["ticker"] for p in positions])
+    for p in positions:
+        avg_cost = p["avg_cost"]
+        current_price = prices.get(p["ticker"], avg_cost)
+        out.append(
             {
-                "ticker": ticker,
+                "ticker": p["ticker"],
                 "net_qty": p["net_qty"],
                 "avg_cost": avg_cost,
                 "current_price": current_price,
-                "unrealized_pnl_pct": unrealized,
-                "last_decision": llm_decision,
-                "sell_trigger": exit_decision.action != "HOLD",
-                "sell_reason": exit_decision.reason,
+                "price_stale": p["ticker"] in stale or p["ticker"] not in prices,
+                "unrealized_pnl_pct": (current_price / avg_cost - 1.0) if avg_cost > 0 else 0.0,
             }
         )
-    return result
+    return out
+
+
+price_ticker.set_compute(_price_tick)
+
+
+@app.get("/api/stream")
+async def stream(request: Request, last_event_id: str | None = Header(default=None)) -> StreamingResponse:
+    sub = event_bus.subscribe(last_event_id)
+    price_ticker.ensure_running()
+    ledger_fanout.ensure_running()
+
+    async def events() -> Any:
+        try:
+            yield "retry: 3000\n\n"
+            for ev in sub.backlog:
+                yield format_sse(ev)
+            while not await request.is_disconnected():
+                try:
+                    ev = await asyncio.wait_for(sub.queue.get(), timeout=settings.stream_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if ev is None:
+                    break
+                yield format_sse(ev)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/portfolio/buy")
@@ -211,6 +425,8 @@ def buy_position(request: Request, req: BuyRequest) -> dict[str, Any]:
         decision_hash=decision_hash,
         payload={"evidence_packet": evidence_packet, "llm_decision": llm_decision},
     )
+    if evidence_packet.get("market_data_status") == "stub":
+        raise HTTPException(status_code=503, detail=f"No market price available for {ticker}")
 
     entry = entry_gate(
         ticker=ticker,
@@ -219,6 +435,9 @@ def buy_position(request: Request, req: BuyRequest) -> dict[str, Any]:
         avg_close_20d=float(evidence_packet["avg_close_20d"]),
         market_cap=evidence_packet.get("market_cap"),
         shock_score=float(evidence_packet["shock_score"]),
+        sector_cap_ok=exposure_index.sector_cap_ok(evidence_packet.get("sector")),
+        corr_penalty_ok=exposure_index.corr_penalty_ok(evidence_packet.get("industry")),
+        walk_forward_ok=walk_forward_ok(ticker),
     )
     if entry.action != "BUY":
         return {"status": "no_trade", "reason": entry.reason, "ticker": ticker}
@@ -281,8 +500,11 @@ def sell_position(req: SellRequest) -> dict[str, Any]:
     if qty <= 0 or qty > current_pos["net_qty"]:
         raise HTTPException(status_code=400, detail="Invalid sell quantity")
 
-    current_price = _safe_current_price(ticker)
-    insert_trade(
+    prices, _stale = current_prices([ticker])
+    if ticker not in prices:
+        raise HTTPException(status_code=503, detail=f"No market price available for {ticker}")
+    current_price = prices[ticker]
+    trade_id = insert_trade(
         ticker=ticker,
         side="SELL",
         qty=qty,
@@ -306,9 +528,55 @@ def sell_position(req: SellRequest) -> dict[str, Any]:
         decision_hash=decision_hash,
         payload={"qty": qty, "price": current_price, "fees": req.fees},
     )
-    return {"status": "ok", "ticker": ticker, "qty": qty, "price": current_price}
+    realization = realization_for_trade(trade_id) or {}
+    return {
+        "status": "ok",
+        "ticker": ticker,
+        "qty": qty,
+        "price": current_price,
+        "cost_basis": realization.get("cost_basis"),
+        "realized_pnl": realization.get("pnl"),
+    }
+
+
+@app.post("/api/portfolio/orders")
+def portfolio_orders(request: Request, req: OrdersRequest) -> dict[str, Any]:
+    orders = [
+        OrderSpec(
+            ticker=o.ticker.strip().upper(),
+            side=o.side,
+            qty_optional=o.qty_optional,
+            notional_usd_optional=o.notional_usd_optional,
+            fees=o.fees,
+        )
+        for o in req.orders
+    ]
+    router = getattr(request.app.state, "news_router", None)
+    try:
+        return execute_orders(orders, risk_mode=req.risk_mode, router=router)
+    except OrderValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except NoMarketPrice as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
 
 
 @app.get("/api/metrics")
-def metrics_endpoint() -> dict[str, Any]:
-    return compute_metrics()
+def metrics_endpoint(
+    request: Request,
+    start: date | None = None,
+    end: date | None = None,
+    resolution: Literal["lttb", "ohlc"] = "lttb",
+    max_points: int = Query(default=settings.metrics_max_points, ge=2, le=settings.metrics_max_points),
+) -> Response:
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return cached_json(
+        request, lambda: compute_metrics(start=start, end=end, resolution=resolution, max_points=max_points)
+    )
+
+
+@app.get("/api/metrics/risk")
+def risk_metrics_endpoint(request: Request, start: date | None = None, end: date | None = None) -> Response:
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return cached_json(request, lambda: compute_risk_metrics(start=start, end=end))
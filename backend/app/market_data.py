@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from app.config import settings
+from app.db import get_fundamentals, put_fundamentals
+from app.lazy import pd, yf
+from app.resilience import UpstreamUnavailable, empty_download, reset_resilience, resilient_call
+
+# [{"Close": float, "Volume": float}, ...] oldest first, at most BAR_LIMIT rows.
+Bars = list[dict[str, float]]
+BAR_LIMIT = 30
+
+_lock = threading.Lock()
+_bar_cache: dict[str, tuple[float, Bars]] = {}
+_fundamentals_cache: dict[str, tuple[float, dict[str, Any]]] = {}
+_history_cache: dict[tuple[str, int], tuple[float, Bars]] = {}
+# Tickers with a background bar refresh in flight, so a stale entry is revalidated once.
+_revalidating: set[str] = set()
+
+
+def _safe_float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def stub_bars() -> Bars:
+    # TODO: Implement real market data provider fallback.
+    closes = [100.0 + i * 0.2 for i in range(30)]
+    vols = [1_000_000.0 + i * 1_000.0 for i in range(30)]
+    return [{"Close": c, "Volume": v} for c, v in zip(closes, vols)]
+
+
+def reset_market_data_cache() -> None:
+    with _lock:
+        _bar_cache.clear()
+        _fundamentals_cache.clear()
+        _history_cache.clear()
+        _revalidating.clear()
+    reset_resilience()
+
+
+def _rows_from_frame(frame: pd.DataFrame | None, limit: int = BAR_LIMIT) -> Bars:
+    if frame is None or frame.empty or "Close" not in frame:
+        return []
+    frame = frame.dropna(subset=["Close"])
+    rows: Bars = []
+    for _, row in frame.tail(limit).iterrows():
+        rows.append({"Close": _safe_float(row.get("Close")), "Volume": _safe_float(row.get("Volume"))})
+    return rows
+
+
+def _yf_download(tickers: list[str], lookback_days: int, limit: int) -> dict[str, Bars]:
+    # yfinance is used strictly as raw input, never as direct trading decision engine.
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=lookback_days)
+    data = yf.download(
+        tickers, start=start.date(), end=end.date(), progress=False, auto_adjust=False, group_by="ticker"
+    )
+    # yfinance reports most failures as an empty frame rather than an exception.
+    if data is None or data.empty:
+        raise empty_download(tickers)
+    out: dict[str, Bars] = {}
+    if isinstance(data.columns, pd.MultiIndex):
+        present = set(data.columns.get_level_values(0))
+        for ticker in tickers:
+            if ticker in present:
+                out[ticker] = _rows_from_frame(data[ticker], limit)
+    elif len(tickers) == 1:
+        out[tickers[0]] = _rows_from_frame(data, limit)
+    return {t: rows for t, rows in out.items() if rows}
+
+
+def _download(
+    tickers: list[str], lookback_days: int = 60, limit: int = BAR_LIMIT, source: str = "yfinance_bars"
+) -> dict[str, Bars]:
+    try:
+        return resilient_call(source, _yf_download, tickers, lookback_days, limit)
+    except UpstreamUnavailable:
+        return {}
+
+
+def _store_bars(downloaded: dict[str, Bars], fetched_at: float) -> None:
+    with _lock:
+        for ticker, rows in downloaded.items():
+            _bar_cache[ticker] = (fetched_at, rows)
+
+
+def _revalidate(tickers: list[str]) -> None:
+    with _lock:
+        todo = [t for t in tickers if t not in _revalidating]
+        _revalidating.update(todo)
+    if not todo:
+        return
+
+    def run() -> None:
+        try:
+            _store_bars(_download(todo), time.time())
+        finally:
+            with _lock:
+                _revalidating.difference_update(todo)
+
+    threading.Thread(target=run, name="bars-revalidate", daemon=True).start()
+
+
+def fetch_bars_with_status(tickers: list[str]) -> tuple[dict[str, Bars], dict[str, str]]:
+    """Daily bars for many tickers plus each ticker's status: "fresh", "stale" or "stub".
+
+    Stale-while-revalidate: bars past market_data_ttl_seconds are served at once and refreshed
+    in the background. Cache misses share one download; if it fails, a ticker with no good
+    bars at all gets stub rows, reported as "stub".
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    now = time.time()
+    out: dict[str, Bars] = {}
+    status: dict[str, str] = {}
+    with _lock:
+        for ticker in tickers:
+            cached = _bar_cache.get(ticker)
+            if cached is not None:
+                out[ticker] = cached[1]
+                status[ticker] = "fresh" if now - cached[0] < settings.market_data_ttl_seconds else "stale"
+    stale = [t for t, s in status.items() if s == "stale"]
+    if stale:
+        _revalidate(stale)
+    misses = [t for t in tickers if t not in out]
+    if misses:
+        downloaded = _download(misses)
+        _store_bars(downloaded, now)
+        for ticker in misses:
+            # Stub rows are not cached so the next request retries the real source.
+            out[ticker] = downloaded.get(ticker) or stub_bars()
+            status[ticker] = "fresh" if ticker in downloaded else "stub"
+    return out, status
+
+
+def fetch_bars(tickers: list[str]) -> dict[str, Bars]:
+    """Daily bars for many tickers with one yfinance download for all cache misses."""
+    return fetch_bars_with_status(tickers)[0]
+
+
+def market_data_status(ticker: str) -> str:
+    with _lock:
+        cached = _bar_cache.get(ticker.upper())
+    if cached is None:
+        return "stub"
+    return "fresh" if time.time() - cached[0] < settings.market_data_ttl_seconds else "stale"
+
+
+def cache_fill(tickers: list[str]) -> dict[str, int]:
+    """How many of tickers have fresh bars, stale bars and fresh fundamentals in memory."""
+    now = time.time()
+    fill = {"bars_fresh": 0, "bars_stale": 0, "fundamentals": 0}
+    with _lock:
+        for ticker in {t.upper() for t in tickers}:
+            bars = _bar_cache.get(ticker)
+            if bars is not None:
+                fill["bars_fresh" if now - bars[0] < settings.market_data_ttl_seconds else "bars_stale"] += 1
+            info = _fundamentals_cache.get(ticker)
+            if info is not None and now - info[0] < settings.fundamentals_ttl_seconds:
+                fill["fundamentals"] += 1
+    return fill
+
+
+def last_good_closes(tickers: list[str]) -> dict[str, float]:
+    """Latest cached real close per ticker, however old; tickers never downloaded are absent."""
+    out: dict[str, float] = {}
+    with _lock:
+        for ticker in tickers:
+            cached = _bar_cache.get(ticker.upper())
+            if cached is not None and cached[1]:
+                out[ticker] = cached[1][-1]["Close"]
+    return out
+
+
+def fetch_history(tickers: list[str], lookback_days: int) -> dict[str, Bars]:
+    """Long daily history for backtests, one download for all cache misses.
+
+    Unlike fetch_bars there is no stub fallback: tickers without data are simply absent.
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    now = time.time()
+    out: dict[str, Bars] = {}
+    with _lock:
+        for ticker in tickers:
+            cached = _history_cache.get((ticker, lookback_days))
+            if cached is not None and now - cached[0] < settings.market_data_ttl_seconds:
+                out[ticker] = cached[1]
+    misses = [t for t in tickers if t not in out]
+    if misses:
+        downloaded = _download(misses, lookback_days=lookback_days, limit=lookback_days, source="yfinance_history")
+        with _lock:
+            for ticker, rows in downloaded.items():
+                _history_cache[(ticker, lookback_days)] = (now, rows)
+        out.update(downloaded)
+    return out
+
+
+def _fetch_info(ticker: str) -> dict[str, Any]:
+    try:
+        return resilient_call("yfinance_info", lambda: yf.Ticker(ticker).info) or {}
+    except UpstreamUnavailable:
+        return {}
+
+
+def fetch_fundamentals(tickers: list[str]) -> dict[str, dict[str, Any]]:
+    """Ticker info (market cap, sector, industry): memory, then SQLite, then yfinance concurrently."""
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    now = time.time()
+    out: dict[str, dict[str, Any]] = {}
+    with _lock:
+        for ticker in tickers:
+            cached = _fundamentals_cache.get(ticker)
+            if cached is not None and now - cached[0] < settings.fundamentals_ttl_seconds:
+                out[ticker] = cached[1]
+    misses = [t for t in tickers if t not in out]
+    if misses:
+        # Second tier: the fundamentals table, shared by workers and restarts.
+        stored = get_fundamentals(misses, max_age_seconds=settings.fundamentals_ttl_seconds)
+        with _lock:
+            for ticker, info in stored.items():
+                _fundamentals_cache[ticker] = (now, info)
+        out.update(stored)
+        misses = [t for t in misses if t not in stored]
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(len(misses), settings.analyze_batch_workers)) as pool:
+            infos = dict(zip(misses, pool.map(_fetch_info, misses)))
+        fetched = {t: info for t, info in infos.items() if info}
+        put_fundamentals(fetched, fetched_at=now)
+        with _lock:
+            for ticker, info in fetched.items():
+                _fundamentals_cache[ticker] = (now, info)
+        out.update(infos)
+    return out
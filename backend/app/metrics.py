@@ -1,106 +1,99 @@
 from datetime import date, datetime, timedelta, timezone
 from typing import Any, Callable
 
-import yfinance as yf
 
 from app.config import METRICS_LOOKBACK_DAYS, settings
-from app.db import insert_audit_log, list_trades
+from app.db import list_trades, realization_stats
+from app.downsample import lttb, ohlc_buckets
+from app.lazy import yf
+from app.resilience import UpstreamUnavailable, empty_download, resilient_call
+from app.timing import span, timed
+from app.trading_calendar import trading_days
 
 # (ticker, start_date_iso, end_date_iso) -> {date_iso: close_price}
 PriceProvider = Callable[[str, str, str], dict[str, float]]
 
 
-def _parse_ts_date(ts_utc: str) -> str:
+def parse_ts_date(ts_utc: str) -> str:
     return ts_utc[:10] if ts_utc else ""
 
 
+def _download_closes(ticker: str, start_d: date, end_d: date) -> dict[str, float]:
+    data = yf.download(
+        ticker,
+        start=start_d,
+        end=end_d + timedelta(days=1),
+        progress=False,
+        auto_adjust=True,
+        group_by=None,
+    )
+    if data is None or data.empty:
+        raise empty_download([ticker])
+    out: dict[str, float] = {}
+    close_name = "Adj Close" if "Adj Close" in data.columns else "Close"
+    if hasattr(data.columns, "levels"):
+        close_series = data[close_name].iloc[:, 0]
+    else:
+        close_series = data[close_name]
+    for ts in close_series.index:
+        d = ts.date() if hasattr(ts, "date") else ts
+        out[d.isoformat()] = float(close_series.loc[ts])
+    return out
+
+
+# Every close downloaded so far, per ticker: served for the requested window while the
+# source is failing.
+_last_good_closes: dict[str, dict[str, float]] = {}
+
+
 def _yfinance_closes(
     ticker: str,
     start_iso: str,
     end_iso: str,
     trades: list[dict[str, Any]],
+    stale: set[str] | None = None,
 ) -> dict[str, float]:
+    start_d = datetime.fromisoformat(start_iso.replace("Z", "+00:00")).date()
+    end_d = datetime.fromisoformat(end_iso.replace("Z", "+00:00")).date()
     try:
-        start_d = datetime.fromisoformat(start_iso.replace("Z", "+00:00")).date()
-        end_d = datetime.fromisoformat(end_iso.replace("Z", "+00:00")).date()
-        data = yf.download(
-            ticker,
-            start=start_d,
-            end=end_d + timedelta(days=1),
-            progress=False,
-            auto_adjust=True,
-            group_by=None,
-        )
-        if data is None or data.empty:
-            raise ValueError("empty data")
-        out: dict[str, float] = {}
-        close_name = "Adj Close" if "Adj Close" in data.columns else "Close"
-        if hasattr(data.columns, "levels"):
-            close_series = data[close_name].iloc[:, 0]
-        else:
-            close_series = data[close_name]
-        for ts in close_series.index:
-            d = ts.date() if hasattr(ts, "date") else ts
-            out[d.isoformat()] = float(close_series.loc[ts])
-        return out
-    except Exception as exc:
-        insert_audit_log(
-            event_type="ERROR",
-            ticker=ticker,
-            payload={
-                "error": str(exc),
-                "context": "metrics_yfinance_closes",
-                "start": start_iso,
-                "end": end_iso,
-            },
-        )
-        fallback = 0.0
-        for t in reversed(trades):
-            if t["ticker"] == ticker and _parse_ts_date(t["ts_utc"]) <= end_iso:
-                fallback = float(t["price"])
-                break
-        out = {}
-        start_d = datetime.fromisoformat(start_iso.replace("Z", "+00:00")).date()
-        end_d = datetime.fromisoformat(end_iso.replace("Z", "+00:00")).date()
-        d = start_d
-        while d <= end_d:
-            out[d.isoformat()] = fallback
-            d += timedelta(days=1)
+        out = resilient_call("yfinance_history", _download_closes, ticker, start_d, end_d)
+        _last_good_closes.setdefault(ticker, {}).update(out)
         return out
+    except UpstreamUnavailable:
+        # Failures are audited once per circuit opening by resilient_call, not per request.
+        if stale is not None:
+            stale.add(ticker)
+    known = {d: c for d, c in _last_good_closes.get(ticker, {}).items() if start_iso[:10] <= d <= end_iso[:10]}
+    if known:
+        return known
+    fallback = 0.0
+    for t in reversed(trades):
+        if t["ticker"] == ticker and parse_ts_date(t["ts_utc"]) <= end_iso:
+            fallback = float(t["price"])
+            break
+    out = {}
+    d = start_d
+    while d <= end_d:
+        out[d.isoformat()] = fallback
+        d += timedelta(days=1)
+    return out
 
 
-def _default_price_provider(
-    trades: list[dict[str, Any]],
-) -> PriceProvider:
-    def provider(ticker: str, start_iso: str, end_iso: str) -> dict[str, float]:
-        return _yfinance_closes(ticker, start_iso, end_iso, trades)
+class _DefaultPriceProvider:
+    def __init__(self, trades: list[dict[str, Any]]) -> None:
+        self.trades = trades
+        # Tickers served from last good closes (or the trade-price fallback) on this request.
+        self.stale: set[str] = set()
 
-    return provider
+    def __call__(self, ticker: str, start_iso: str, end_iso: str) -> dict[str, float]:
+        return _yfinance_closes(ticker, start_iso, end_iso, self.trades, self.stale)
 
 
-def _replay_trades_through_date(
+def default_price_provider(
     trades: list[dict[str, Any]],
-    through_date_iso: str,
-    initial_cash: float,
-) -> tuple[float, dict[str, float]]:
-    cash = initial_cash
-    position_qty: dict[str, float] = {}
-    for t in trades:
-        ts_date = _parse_ts_date(t["ts_utc"])
-        if ts_date > through_date_iso:
-            continue
-        ticker = t["ticker"]
-        qty = float(t["qty"])
-        price = float(t["price"])
-        fees = float(t["fees"])
-        side = t["side"]
-        if side == "BUY":
-            cash -= qty * price + fees
-            position_qty[ticker] = position_qty.get(ticker, 0.0) + qty
-        else:
-            cash += qty * price - fees
-            position_qty[ticker] = position_qty.get(ticker, 0.0) - qty
-    return cash, position_qty
+) -> PriceProvider:
+    """Daily closes behind the breaker; tickers served from fallback data end up in its `stale` set."""
+    return _DefaultPriceProvider(trades)
 
 
 def _forward_fill_closes(dates_sorted: list[str], closes: dict[str, float]) -> dict[str, float]:
@@ -112,58 +105,69 @@ def _forward_fill_closes(dates_sorted: list[str], closes: dict[str, float]) -> d
     return result
 
 
-def _compute_win_rate_fifo(trades: list[dict[str, Any]]) -> float:
-    # FIFO per ticker: list of (qty, price, fees) for buys; match sells to them
-    buys: dict[str, list[tuple[float, float, float]]] = {}
-    wins = 0
-    total_closed = 0
-    for t in trades:
-        ticker = t["ticker"]
-        qty = float(t["qty"])
-        price = float(t["price"])
-        fees = float(t["fees"])
-        side = t["side"]
-        if side == "BUY":
-            buys.setdefault(ticker, []).append((qty, price, fees))
-        else:
-            remaining = qty
-            sell_price = price
-            sell_fees = fees
-            buy_cost = 0.0
-            buy_fees = 0.0
-            while remaining > 0 and ticker in buys and buys[ticker]:
-                bq, bp, bf = buys[ticker][0]
-                take = min(remaining, bq)
-                buy_cost += take * bp
-                buy_fees += bf * (take / bq) if bq else 0
-                remaining -= take
-                if bq <= take:
-                    buys[ticker].pop(0)
-                else:
-                    buys[ticker][0] = (bq - take, bp, bf * (1 - take / bq))
-            if remaining < qty:
-                realized_qty = qty - remaining
-                pnl = realized_qty * sell_price - buy_cost - sell_fees - buy_fees
-                total_closed += 1
-                if pnl > 0:
-                    wins += 1
-    return (wins / total_closed) if total_closed else 0.0
+def metrics_window(start: date | None = None, end: date | None = None) -> tuple[date, date]:
+    end_d = end or datetime.now(timezone.utc).date()
+    start_d = start or end_d - timedelta(days=METRICS_LOOKBACK_DAYS)
+    return start_d, end_d
+
+
+def _replay_equity_curve(
+    trades: list[dict[str, Any]],
+    dates_sorted: list[str],
+    closes_by_ticker: dict[str, dict[str, float]],
+    initial_cash: float,
+) -> list[dict[str, Any]]:
+    # Single forward pass over the time-ordered ledger: O(days + trades) instead of a
+    # full replay per day, which matters once the window spans years.
+    cash = initial_cash
+    position_qty: dict[str, float] = {}
+    i = 0
+    curve: list[dict[str, Any]] = []
+    for day_iso in dates_sorted:
+        while i < len(trades) and parse_ts_date(trades[i]["ts_utc"]) <= day_iso:
+            t = trades[i]
+            qty = float(t["qty"])
+            price = float(t["price"])
+            fees = float(t["fees"])
+            if t["side"] == "BUY":
+                cash -= qty * price + fees
+                position_qty[t["ticker"]] = position_qty.get(t["ticker"], 0.0) + qty
+            else:
+                cash += qty * price - fees
+                position_qty[t["ticker"]] = position_qty.get(t["ticker"], 0.0) - qty
+            i += 1
+        total = cash
+        for ticker, qty in position_qty.items():
+            if qty <= 0:
+                continue
+            total += qty * closes_by_ticker.get(ticker, {}).get(day_iso, 0.0)
+        curve.append({"date": day_iso, "value": round(total, 2)})
+    return curve
 
 
+def downsample_curve(curve: list[dict[str, Any]], resolution: str, max_points: int) -> list[dict[str, Any]]:
+    if len(curve) <= max_points:
+        return curve
+    if resolution == "ohlc":
+        return ohlc_buckets(curve, max_points)
+    return lttb(curve, max_points)
+
+
+@timed("metrics.compute")
 def compute_metrics(
     price_provider: PriceProvider | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    resolution: str = "lttb",
+    max_points: int | None = None,
 ) -> dict[str, Any]:
     trades = list_trades()
-    end_d = datetime.now(timezone.utc).date()
-    start_d = end_d - timedelta(days=METRICS_LOOKBACK_DAYS)
+    start_d, end_d = metrics_window(start, end)
     start_iso = start_d.isoformat()
     end_iso = end_d.isoformat()
+    max_points = max_points or settings.metrics_max_points
 
-    dates_sorted: list[str] = []
-    d = start_d
-    while d <= end_d:
-        dates_sorted.append(d.isoformat())
-        d += timedelta(days=1)
+    dates_sorted = [d.isoformat() for d in trading_days(start_d, end_d)] or [end_iso]
 
     if not trades:
         return {
@@ -171,27 +175,25 @@ def compute_metrics(
             "sharpe": 0.0,
             "max_drawdown": 0.0,
             "win_rate": 0.0,
+            "avg_win": 0.0,
+            "avg_loss": 0.0,
+            "realized_pnl_by_ticker": {},
+            "start": start_iso,
+            "end": end_iso,
+            "resolution": resolution,
+            "stale_tickers": [],
         }
 
-    get_closes = price_provider or _default_price_provider(trades)
+    get_closes = price_provider or default_price_provider(trades)
     tickers = list({t["ticker"] for t in trades})
     closes_by_ticker: dict[str, dict[str, float]] = {}
-    for ticker in tickers:
-        raw = get_closes(ticker, start_iso, end_iso)
-        closes_by_ticker[ticker] = _forward_fill_closes(dates_sorted, raw)
+    with span("metrics.prices"):
+        for ticker in tickers:
+            raw = get_closes(ticker, start_iso, end_iso)
+            closes_by_ticker[ticker] = _forward_fill_closes(dates_sorted, raw)
 
-    equity_curve: list[dict[str, Any]] = []
-    for day_iso in dates_sorted:
-        cash, position_qty = _replay_trades_through_date(
-            trades, day_iso, settings.paper_portfolio_usd
-        )
-        total = cash
-        for ticker, qty in position_qty.items():
-            if qty <= 0:
-                continue
-            close = closes_by_ticker.get(ticker, {}).get(day_iso, 0.0)
-            total += qty * close
-        equity_curve.append({"date": day_iso, "value": round(total, 2)})
+    with span("metrics.replay"):
+        equity_curve = _replay_equity_curve(trades, dates_sorted, closes_by_ticker, settings.paper_portfolio_usd)
 
     equity_values = [p["value"] for p in equity_curve]
     if len(equity_values) < 2:
@@ -226,11 +228,19 @@ def compute_metrics(
             if dd > max_dd:
                 max_dd = dd
 
-    win_rate = _compute_win_rate_fifo(trades)
+    realized = realization_stats(start_iso, end_iso)
+    win_rate = (realized["wins"] / realized["closed"]) if realized["closed"] else 0.0
 
     return {
-        "equity_curve": equity_curve,
+        "equity_curve": downsample_curve(equity_curve, resolution, max_points),
         "sharpe": round(sharpe, 4),
         "max_drawdown": round(max_dd, 4),
         "win_rate": round(win_rate, 4),
+        "avg_win": round(realized["avg_win"], 2),
+        "avg_loss": round(realized["avg_loss"], 2),
+        "realized_pnl_by_ticker": {t: round(v, 2) for t, v in realized["realized_pnl_by_ticker"].items()},
+        "start": start_iso,
+        "end": end_iso,
+        "resolution": resolution,
+        "stale_tickers": sorted(getattr(get_closes, "stale", ())),
     }
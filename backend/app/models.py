@@ -13,3 +13,29 @@ class ExitDecision:
     action: Literal["HOLD", "SELL_PARTIAL", "SELL_ALL"]
     frac: float
     reason: str
+
+
+@dataclass(frozen=True)
+class PolicyParams:
+    # Entry gate thresholds.
+    strong_buy_signal: float = 0.80
+    strong_buy_prob: float = 0.60
+    buy_signal: float = 0.70
+    buy_prob: float = 0.55
+    entry_confirmations: int = 2
+    shock_override: float = 0.7
+    # Exit policy.
+    trail_atr_mult: float = 3.0
+    take_profit_day_pct: float = 0.01
+    take_profit_frac: float = 0.4
+    downgrade_signal: float = 0.70
+    downgrade_streak: int = 2
+    # Allocation sizing.
+    alloc_min: float = 0.01
+    alloc_max: float = 0.05
+    vol_penalty: float = 0.20
+    velocity_penalty: float = 0.10
+    corr_penalty_weight: float = 0.10
+
+
+DEFAULT_POLICY = PolicyParams()
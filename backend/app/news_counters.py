@@ -0,0 +1,176 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.config import settings
+from app.db import get_conn
+
+# Today (24h) plus the 7 days before it, one slot per hour.
+RING_HOURS = 24 * 8
+MACRO_KEY = "MACRO"
+
+
+def _epoch_hour(ts: datetime) -> int:
+    return int(ts.timestamp()) // 3600
+
+
+class NewsCounterStore:
+    """Hourly distinct-story hits per ticker over the last RING_HOURS, mirrored from SQLite.
+
+    record() updates this process's ring directly. Hits recorded by other workers are pulled in
+    by reads, at most every news_counter_sync_seconds: rows from a day before the last sync
+    onward are re-read and overwrite their slots, since SQLite holds the totals. Back-dated hits
+    older than that reach this process at its next reload().
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rows: dict[str, int] = {}
+        self._counts = np.zeros((16, RING_HOURS), dtype=np.int32)
+        # Every ticker shares the ring layout: slot h % RING_HOURS holds epoch hour _slot_hour[slot].
+        self._slot_hour = np.full(RING_HOURS, -1, dtype=np.int64)
+        self._head = -1
+        self._loaded = False
+        self._synced_hour = -1
+        self._synced_at = 0.0
+
+    def reload(self, now: datetime | None = None) -> None:
+        now_hour = _epoch_hour(now or datetime.now(timezone.utc))
+        synced_at = time.monotonic()
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT ticker, bucket_hour, hits FROM news_hourly_counts WHERE bucket_hour > ?",
+                (now_hour - RING_HOURS,),
+            ).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            self._rows = {}
+            self._counts = np.zeros((16, RING_HOURS), dtype=np.int32)
+            self._slot_hour[:] = -1
+            self._head = -1
+            self._advance(now_hour)
+            for row in rows:
+                self._add_locked(row["ticker"], int(row["bucket_hour"]), int(row["hits"]))
+            self._loaded = True
+            self._synced_hour = now_hour
+            self._synced_at = synced_at
+
+    def sync(self) -> None:
+        """Overwrite recent slots with SQLite's totals, which include other workers' hits."""
+        now_hour = _epoch_hour(datetime.now(timezone.utc))
+        synced_at = time.monotonic()
+        with self._lock:
+            since = min(self._synced_hour, now_hour) - 24
+        conn = get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT ticker, bucket_hour, hits FROM news_hourly_counts WHERE bucket_hour > ?", (since,)
+            ).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            for row in rows:
+                hour = int(row["bucket_hour"])
+                if hour <= self._head - RING_HOURS:
+                    continue
+                self._add_locked(row["ticker"], hour, 0)
+                self._counts[self._rows[row["ticker"]], hour % RING_HOURS] = int(row["hits"])
+            self._synced_hour = max(self._synced_hour, now_hour)
+            self._synced_at = synced_at
+
+    def record(self, ticker: str, hours: list[int]) -> None:
+        if not hours:
+            return
+        self._ensure_loaded()
+        ticker = ticker.upper()
+        per_hour: dict[int, int] = {}
+        for hour in hours:
+            per_hour[hour] = per_hour.get(hour, 0) + 1
+        conn = get_conn()
+        try:
+            conn.executemany(
+                """
+                INSERT INTO news_hourly_counts(ticker, bucket_hour, hits) VALUES (?, ?, ?)
+                ON CONFLICT(ticker, bucket_hour) DO UPDATE SET hits=hits + excluded.hits
+                """,
+                [(ticker, hour, n) for hour, n in per_hour.items()],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            for hour, n in per_hour.items():
+                self._add_locked(ticker, hour, n)
+
+    def counts(self, ticker: str, now: datetime | None = None) -> tuple[int, float]:
+        return self.counts_many([ticker], now=now)[ticker.upper()]
+
+    def counts_many(self, tickers: list[str], now: datetime | None = None) -> dict[str, tuple[int, float]]:
+        self._ensure_loaded()
+        if time.monotonic() - self._synced_at >= settings.news_counter_sync_seconds:
+            self.sync()
+        now_hour = _epoch_hour(now or datetime.now(timezone.utc))
+        with self._lock:
+            # Reads never move the ring: a query for a later hour must not wipe live slots.
+            # Slots outside the requested window are masked out instead.
+            today_mask = (self._slot_hour > now_hour - 24) & (self._slot_hour <= now_hour)
+            prior_mask = (self._slot_hour > now_hour - RING_HOURS) & (self._slot_hour <= now_hour - 24)
+            today = self._counts @ today_mask.astype(np.int32)
+            prior = self._counts @ prior_mask.astype(np.int32)
+            out: dict[str, tuple[int, float]] = {}
+            for ticker in tickers:
+                row = self._rows.get(ticker.upper())
+                today_hits = int(today[row]) if row is not None else 0
+                prior_7d = float(prior[row]) if row is not None else 0.0
+                out[ticker.upper()] = (today_hits, max(settings.news_baseline_floor, prior_7d / 7.0))
+            return out
+
+    def macro_relevance(self, now: datetime | None = None) -> float:
+        # Neutral prior on quiet days, scaled up by the macro headline volume multiple.
+        today_hits, baseline_7d = self.counts(MACRO_KEY, now=now)
+        return min(1.0, settings.news_macro_relevance_default * max(1.0, today_hits / baseline_7d))
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.reload()
+
+    def _advance(self, now_hour: int) -> None:
+        if now_hour <= self._head:
+            return
+        first = max(self._head + 1, now_hour - RING_HOURS + 1)
+        for hour in range(first, now_hour + 1):
+            slot = hour % RING_HOURS
+            self._counts[:, slot] = 0
+            self._slot_hour[slot] = hour
+        self._head = now_hour
+
+    def _add_locked(self, ticker: str, hour: int, n: int) -> None:
+        self._advance(hour)
+        if hour <= self._head - RING_HOURS:
+            return
+        row = self._rows.get(ticker)
+        if row is None:
+            row = len(self._rows)
+            if row >= self._counts.shape[0]:
+                grown = np.zeros((self._counts.shape[0] * 2, RING_HOURS), dtype=np.int32)
+                grown[: self._counts.shape[0]] = self._counts
+                self._counts = grown
+            self._rows[ticker] = row
+        self._counts[row, hour % RING_HOURS] += n
+
+
+news_counters = NewsCounterStore()
+
+
+def prune_news_counts(now: datetime | None = None) -> None:
+    oldest_hour = _epoch_hour(now or datetime.now(timezone.utc)) - RING_HOURS
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM news_hourly_counts WHERE bucket_hour <= ?", (oldest_hour,))
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,156 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Any
+
+from app.config import settings
+from app.db import get_conn
+from app.news_counters import news_counters
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Trailing " - Reuters" / " | CNBC" attributions differ per outlet for the same wire story.
+_ATTRIBUTION_RE = re.compile(r"\s+[-|]\s+[^-|]{1,40}$")
+
+
+def normalize_headline(headline: str) -> str:
+    text = _ATTRIBUTION_RE.sub("", headline.strip()).lower()
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def headline_hash(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+# MinHash over the headline's word set; salts are fixed so signatures stay comparable across restarts.
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_SALTS = [
+    (
+        int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MINHASH_PRIME | 1,
+        int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MINHASH_PRIME,
+    )
+    for i in range(64)
+]
+
+
+def minhash_signature(normalized: str) -> tuple[int, ...]:
+    tokens = set(normalized.split()) or {""}
+    base = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _MINHASH_PRIME for h in base) for a, b in _MINHASH_SALTS)
+
+
+def estimated_jaccard(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _pack_signature(signature: tuple[int, ...]) -> bytes:
+    return b"".join(v.to_bytes(8, "big") for v in signature)
+
+
+def _unpack_signature(blob: bytes) -> tuple[int, ...]:
+    return tuple(int.from_bytes(blob[i : i + 8], "big") for i in range(0, len(blob), 8))
+
+
+def _epoch_hour(ts: datetime) -> int:
+    return int(ts.timestamp()) // 3600
+
+
+def _parse_published(value: Any, fallback: datetime) -> datetime:
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return fallback
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def index_articles(ticker: str, items: list[dict[str, Any]], now: datetime | None = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    ticker = ticker.upper()
+    since_hour = _epoch_hour(now) - settings.news_cluster_window_hours
+    conn = get_conn()
+    try:
+        reps = [
+            (int(row["cluster_id"]), _unpack_signature(row["minhash"]))
+            for row in conn.execute(
+                "SELECT cluster_id, minhash FROM news_articles WHERE ticker=? AND bucket_hour>=? AND id=cluster_id",
+                (ticker, since_hour),
+            ).fetchall()
+        ]
+        new_cluster_hours: list[int] = []
+        for item in items:
+            normalized = normalize_headline(str(item.get("headline", "")))
+            if not normalized:
+                continue
+            digest = headline_hash(normalized)
+            signature = minhash_signature(normalized)
+            published = min(_parse_published(item.get("published_utc"), now), now)
+            cur = conn.execute(
+                """
+                INSERT OR IGNORE INTO news_articles(
+                  ticker, headline_hash, minhash, cluster_id, source, headline, summary, published_utc, bucket_hour
+                ) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?)
+                """,
+                (
+                    ticker,
+                    digest,
+                    _pack_signature(signature),
+                    str(item.get("source", "")),
+                    str(item.get("headline", "")),
+                    str(item.get("summary", "")),
+                    published.isoformat(),
+                    _epoch_hour(published),
+                ),
+            )
+            if cur.rowcount == 0:
+                continue  # exact duplicate of an article already indexed
+            article_id = int(cur.lastrowid)
+            cluster_id = next(
+                (cid for cid, rep in reps if estimated_jaccard(rep, signature) >= settings.news_near_dup_jaccard),
+                article_id,
+            )
+            conn.execute("UPDATE news_articles SET cluster_id=? WHERE id=?", (cluster_id, article_id))
+            if cluster_id == article_id:
+                reps.append((article_id, signature))
+                new_cluster_hours.append(_epoch_hour(published))
+        conn.commit()
+    finally:
+        conn.close()
+    # Only distinct stories feed the hourly hit counters used for shock scoring.
+    news_counters.record(ticker, new_cluster_hours)
+    return len(new_cluster_hours)
+
+
+def top_news(ticker: str, limit: int = 5) -> list[dict[str, Any]]:
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            """
+            SELECT a.source, a.headline, a.summary, a.published_utc,
+                   (SELECT COUNT(*) FROM news_articles d WHERE d.cluster_id=a.id) AS duplicates
+            FROM news_articles a
+            WHERE a.ticker=? AND a.id=a.cluster_id
+            ORDER BY a.bucket_hour DESC, a.published_utc DESC, a.id DESC
+            LIMIT ?
+            """,
+            (ticker.upper(), limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def prune_news_index(retention_days: int, now: datetime | None = None) -> int:
+    oldest_hour = _epoch_hour(now or datetime.now(timezone.utc)) - retention_days * 24
+    conn = get_conn()
+    try:
+        # Clusters go as a unit so no member outlives the representative it points at.
+        cur = conn.execute(
+            """
+            DELETE FROM news_articles
+            WHERE cluster_id IN (SELECT id FROM news_articles WHERE id=cluster_id AND bucket_hour < ?)
+            """,
+            (oldest_hour,),
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
@@ -1,5 +1,15 @@
+from __future__ import annotations
+
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    import httpx
+
+# One pooled client per upstream base URL so keep-alive connections are reused across calls.
+_HTTP_CLIENTS: dict[str, httpx.Client] = {}
+_HTTP_CLIENTS_LOCK = threading.Lock()
 
 
 def _mock_news(prefix: str, ticker: str, limit: int = 5) -> list[dict[str, Any]]:
@@ -36,3 +46,58 @@ def gnews_news(ticker: str, limit: int = 5) -> list[dict[str, Any]]:
 def guardian_news(ticker: str, limit: int = 5) -> list[dict[str, Any]]:
     # TODO: Implement real Guardian call.
     return _mock_news("guardian", ticker, limit)
+
+
+def get_http_client(base_url: str, timeout_seconds: float = 10.0) -> httpx.Client:
+    # Imported on the first real provider call; the mock providers never need it.
+    import httpx
+
+    with _HTTP_CLIENTS_LOCK:
+        client = _HTTP_CLIENTS.get(base_url)
+        if client is None or client.is_closed:
+            client = httpx.Client(
+                base_url=base_url,
+                timeout=timeout_seconds,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+            _HTTP_CLIENTS[base_url] = client
+        return client
+
+
+def close_http_clients() -> None:
+    with _HTTP_CLIENTS_LOCK:
+        clients = list(_HTTP_CLIENTS.values())
+        _HTTP_CLIENTS.clear()
+    for client in clients:
+        client.close()
+
+
+def _normalize_item(source: str, raw: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "source": str(raw.get("source") or source),
+        "headline": str(raw.get("headline") or raw.get("title") or ""),
+        "summary": str(raw.get("summary") or raw.get("description") or ""),
+        "published_utc": str(raw.get("published_utc") or raw.get("publishedAt") or raw.get("pubDate") or ""),
+    }
+
+
+def make_http_news_provider(
+    source: str,
+    base_url: str,
+    path: str = "/news",
+    params: dict[str, Any] | None = None,
+    timeout_seconds: float = 10.0,
+) -> Callable[..., list[dict[str, Any]]]:
+    # The endpoint returns a list of articles or an object with an `articles`/`results` list;
+    # items are normalized to the same shape as the mock providers.
+    def provider(ticker: str, limit: int = 5) -> list[dict[str, Any]]:
+        client = get_http_client(base_url, timeout_seconds)
+        query = {**(params or {}), "q": ticker.upper(), "limit": limit}
+        resp = client.get(path, params=query)
+        resp.raise_for_status()
+        data = resp.json()
+        if isinstance(data, dict):
+            data = data.get("articles") or data.get("results") or []
+        return [_normalize_item(source, item) for item in data[:limit] if isinstance(item, dict)]
+
+    return provider
@@ -0,0 +1,130 @@
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.market_data import Bars
+from app.sizing import compute_alloc_pct
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def covariance_from_bars(tickers: list[str], bars: dict[str, Bars], shrinkage: float | None = None) -> np.ndarray:
+    """Annualized covariance of daily returns over the common tail of every ticker's bars.
+
+    Thirty bars give fewer observations than names, so the sample matrix is shrunk towards
+    its diagonal to keep it positive definite.
+    """
+    shrinkage = settings.optimizer_cov_shrinkage if shrinkage is None else shrinkage
+    closes = [np.array([r["Close"] for r in bars[t]], dtype=float) for t in tickers]
+    n_obs = min((len(c) for c in closes), default=0)
+    if n_obs < 3:
+        return np.eye(len(tickers)) * 0.04
+    matrix = np.vstack([c[-n_obs:] for c in closes])
+    matrix = np.where(matrix > 0, matrix, np.nan)
+    returns = np.nan_to_num(np.diff(np.log(matrix), axis=1))
+    sample = np.cov(returns) * TRADING_DAYS_PER_YEAR
+    sample = np.atleast_2d(sample)
+    diag = np.diag(np.maximum(np.diag(sample), 1e-6))
+    return (1.0 - shrinkage) * sample + shrinkage * diag
+
+
+def _project(w: np.ndarray, caps: np.ndarray, sector_ids: np.ndarray, sector_cap: float, budget: float) -> np.ndarray:
+    """Map w into the feasible set: box clip, then scale down over-cap sectors, then the book.
+
+    This is a heuristic, not the Euclidean projection. Scaling only shrinks weights, so the
+    result is always feasible, but it shrinks a sector or the book proportionally where the
+    exact projection would subtract a common amount, and it can land on a different point.
+    """
+    w = np.clip(w, 0.0, caps)
+    sector_sums = np.bincount(sector_ids, weights=w)
+    factor = np.where(sector_sums > sector_cap, sector_cap / np.where(sector_sums > 0, sector_sums, 1.0), 1.0)
+    w = w * factor[sector_ids]
+    total = w.sum()
+    if total > budget:
+        w = w * (budget / total)
+    return w
+
+
+def solve_mean_variance(
+    expected: np.ndarray,
+    cov: np.ndarray,
+    caps: np.ndarray,
+    sector_ids: np.ndarray,
+    sector_cap: float,
+    budget: float,
+    risk_aversion: float,
+    max_iter: int = 500,
+    tol: float = 1e-7,
+) -> np.ndarray:
+    """Gradient ascent on expected . w - risk_aversion / 2 * w' cov w, kept feasible by _project.
+
+    Because _project is a heuristic rather than an exact projection, this converges to a
+    feasible, good allocation but not necessarily the constrained optimum.
+    """
+    lipschitz = risk_aversion * float(np.linalg.eigvalsh(cov)[-1]) if len(expected) else 1.0
+    step = 1.0 / max(lipschitz, 1e-9)
+    w = _project(caps * 0.5, caps, sector_ids, sector_cap, budget)
+    for _ in range(max_iter):
+        grad = expected - risk_aversion * (cov @ w)
+        nxt = _project(w + step * grad, caps, sector_ids, sector_cap, budget)
+        if np.max(np.abs(nxt - w), initial=0.0) < tol:
+            return nxt
+        w = nxt
+    return w
+
+
+def optimize_portfolio(
+    candidates: list[dict[str, Any]],
+    bars: dict[str, Bars],
+    risk_mode: str | None = None,
+    bar_status: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    """Target weights for holdings plus entry candidates.
+
+    Each candidate carries ticker, sector, prob_outperform_90d, vol_20d, velocity and
+    corr_penalty (the compute_alloc_pct inputs). The standalone compute_alloc_pct size is
+    the per-name cap; the solver trims names that add correlated risk and enforces the
+    sector cap and gross budget.
+
+    Tickers whose bar_status is "stub" are left out and listed under "excluded": flat stub
+    bars have zero variance and would look riskless to the solver.
+    """
+    bar_status = bar_status or {}
+    excluded = sorted(c["ticker"] for c in candidates if bar_status.get(c["ticker"]) == "stub")
+    candidates = [c for c in candidates if bar_status.get(c["ticker"]) != "stub"]
+    if not candidates:
+        return {"weights": {}, "sector_weights": {}, "gross": 0.0, "excluded": excluded}
+    tickers = [c["ticker"] for c in candidates]
+    caps = np.array(
+        [
+            compute_alloc_pct(
+                prob_outperform_90d=float(c["prob_outperform_90d"]),
+                vol_20d=float(c["vol_20d"]),
+                velocity=float(c["velocity"]),
+                corr_penalty=float(c.get("corr_penalty", 0.0)),
+                risk_mode=risk_mode,
+            )
+            for c in candidates
+        ]
+    )
+    # Edge over a coin flip on the 90d horizon, annualized.
+    expected = (np.array([float(c["prob_outperform_90d"]) for c in candidates]) - 0.5) * (365.0 / 90.0)
+    sectors = [str(c.get("sector") or "Unknown") for c in candidates]
+    sector_names, sector_ids = np.unique(sectors, return_inverse=True)
+    weights = solve_mean_variance(
+        expected=expected,
+        cov=covariance_from_bars(tickers, bars),
+        caps=caps,
+        sector_ids=sector_ids,
+        sector_cap=settings.sector_cap_pct,
+        budget=settings.optimizer_max_gross,
+        risk_aversion=settings.optimizer_risk_aversion,
+    )
+    sector_weights = np.bincount(sector_ids, weights=weights, minlength=len(sector_names))
+    return {
+        "weights": {t: round(float(w), 6) for t, w in zip(tickers, weights)},
+        "sector_weights": {str(s): round(float(w), 6) for s, w in zip(sector_names, sector_weights)},
+        "gross": round(float(weights.sum()), 6),
+        "excluded": excluded,
+    }
@@ -0,0 +1,281 @@
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import settings
+from app.db import (
+    derive_active_positions,
+    get_hysteresis_state,
+    insert_audit_log,
+    insert_trade,
+    most_recent_decision_hashes,
+    paper_cash_balance,
+    realization_for_trade,
+    transaction,
+    upsert_hysteresis_state,
+)
+from app.entry_policy import apply_entry_step, evaluate_entry
+from app.evidence import build_evidence_packets
+from app.exposure import exposure_index
+from app.hashing import canonical_json_hash
+from app.llm_router import llm_decide_batch
+from app.pricing import current_prices
+from app.provider_router import ProviderRouter
+from app.sizing import compute_alloc_pct, derive_qty
+from app.walk_forward import walk_forward_ok
+
+
+class OrderValidationError(ValueError):
+    pass
+
+
+class NoMarketPrice(RuntimeError):
+    """A sell in the batch has no real (intraday, quoted or last good) price."""
+
+
+@dataclass
+class OrderSpec:
+    ticker: str
+    side: str
+    qty_optional: float | None = None
+    notional_usd_optional: float | None = None
+    fees: float = 0.0
+
+
+def _validate(orders: list[OrderSpec]) -> dict[str, dict[str, Any]]:
+    if not orders:
+        raise OrderValidationError("At least one order is required")
+    if len(orders) > settings.portfolio_orders_max:
+        raise OrderValidationError(f"At most {settings.portfolio_orders_max} orders per request")
+    seen: set[str] = set()
+    for order in orders:
+        if order.ticker in seen:
+            raise OrderValidationError(f"Duplicate order for {order.ticker}")
+        seen.add(order.ticker)
+    positions = {p["ticker"]: p for p in derive_active_positions()}
+    for order in orders:
+        if order.side != "SELL":
+            continue
+        pos = positions.get(order.ticker)
+        if pos is None:
+            raise OrderValidationError(f"No active position to sell: {order.ticker}")
+        qty = order.qty_optional if order.qty_optional is not None else pos["net_qty"]
+        if qty <= 0 or qty > pos["net_qty"]:
+            raise OrderValidationError(f"Invalid sell quantity for {order.ticker}")
+    return positions
+
+
+def execute_orders(
+    orders: list[OrderSpec],
+    risk_mode: str | None = None,
+    router: ProviderRouter | None = None,
+) -> dict[str, Any]:
+    """Evaluate, size and book a list of buys and sells; every ledger write lands in one commit."""
+    positions = _validate(orders)
+    buys = [o for o in orders if o.side == "BUY"]
+    sells = [o for o in orders if o.side == "SELL"]
+
+    # Same lookup as /api/portfolio/sell; a sell is never booked at a stub price.
+    sell_prices, _stale = current_prices([o.ticker for o in sells]) if sells else ({}, set())
+    unpriced = sorted(o.ticker for o in sells if o.ticker not in sell_prices)
+    if unpriced:
+        raise NoMarketPrice(f"No market price available for {', '.join(unpriced)}")
+
+    evidence = build_evidence_packets([o.ticker for o in buys], news_router=router)
+    ready = [o for o in buys if not isinstance(evidence[o.ticker], Exception)]
+    decisions = dict(zip([o.ticker for o in ready], llm_decide_batch([evidence[o.ticker] for o in ready])))
+
+    results: dict[str, dict[str, Any]] = {}
+    planned_buys: list[dict[str, Any]] = []
+    # Sector weight already claimed by earlier buys in this batch, on top of the book.
+    batch_sector: dict[str, float] = {}
+    for order in buys:
+        packet = evidence[order.ticker]
+        decision = decisions.get(order.ticker)
+        if isinstance(packet, Exception) or decision is None or isinstance(decision, Exception):
+            error = packet if isinstance(packet, Exception) else decision
+            results[order.ticker] = {"ticker": order.ticker, "side": "BUY", "status": "error", "error": str(error)}
+            continue
+        if packet.get("market_data_status") == "stub":
+            # Stub bars during an outage carry a placeholder close; like an unpriced sell, the
+            # buy is not booked, but only this line item is rejected.
+            results[order.ticker] = {
+                "ticker": order.ticker,
+                "side": "BUY",
+                "status": "error",
+                "error": f"No market price available for {order.ticker}",
+            }
+            continue
+        # The gate is evaluated against the stored count; its step is written only if the batch commits.
+        entry, passed = evaluate_entry(
+            decision=decision,
+            avg_vol_20d=float(packet["avg_vol_20d"]),
+            avg_close_20d=float(packet["avg_close_20d"]),
+            market_cap=packet.get("market_cap"),
+            shock_score=float(packet["shock_score"]),
+            consecutive_ok=get_hysteresis_state(order.ticker)["consecutive_ok"],
+            sector_cap_ok=exposure_index.sector_cap_ok(
+                packet.get("sector"), settings.default_max_alloc_pct + batch_sector.get(packet.get("sector"), 0.0)
+            ),
+            corr_penalty_ok=exposure_index.corr_penalty_ok(packet.get("industry")),
+            walk_forward_ok=walk_forward_ok(order.ticker),
+        )
+        if entry.action == "BUY":
+            batch_sector[packet.get("sector")] = batch_sector.get(packet.get("sector"), 0.0) + settings.default_max_alloc_pct
+        plan: dict[str, Any] = {"order": order, "packet": packet, "decision": decision, "entry": entry, "passed": passed}
+        if entry.action == "BUY":
+            plan["alloc_pct"] = compute_alloc_pct(
+                prob_outperform_90d=float(decision["prob_outperform_90d"]),
+                vol_20d=float(packet["vol_20d"]),
+                velocity=float(packet["velocity"]),
+                corr_penalty=float(packet["corr_penalty"]),
+                risk_mode=risk_mode,
+            )
+            plan["price"] = float(packet["current_price"])
+            plan["qty"] = derive_qty(plan["price"], plan["alloc_pct"], order.qty_optional, order.notional_usd_optional)
+        planned_buys.append(plan)
+
+    # Joint sizing: buys sized from alloc_pct share the paper cash left after explicit buys
+    # and this batch's sell proceeds, scaled down pro rata if they would overdraw it.
+    cash_before = paper_cash_balance()
+    cash = cash_before
+    for order in sells:
+        qty = order.qty_optional if order.qty_optional is not None else positions[order.ticker]["net_qty"]
+        cash += qty * sell_prices[order.ticker] - order.fees
+    sized = [p for p in planned_buys if "qty" in p]
+    for plan in sized:
+        plan["auto"] = plan["order"].qty_optional is None and plan["order"].notional_usd_optional is None
+    fixed_cost = sum(p["qty"] * p["price"] + p["order"].fees for p in sized if not p["auto"])
+    auto_cost = sum(p["qty"] * p["price"] + p["order"].fees for p in sized if p["auto"])
+    scale = 1.0
+    if auto_cost > 0 and fixed_cost + auto_cost > cash:
+        scale = max(0.0, cash - fixed_cost) / auto_cost
+    for plan in sized:
+        if plan["auto"]:
+            plan["qty"] *= scale
+            plan["alloc_pct"] *= scale
+
+    sell_hashes = {o.ticker: most_recent_decision_hashes(o.ticker) for o in sells}
+    trade_ids: dict[str, int] = {}
+    with transaction() as conn:
+        # BEGIN IMMEDIATE holds the write lock from here, so this read cannot race another seller.
+        held = {
+            row["ticker"]: row["net_qty"]
+            for row in conn.execute(
+                f"SELECT ticker, net_qty FROM positions WHERE ticker IN ({','.join('?' * len(sells))})",
+                [o.ticker for o in sells],
+            )
+        }
+        for order in sells:
+            qty = order.qty_optional if order.qty_optional is not None else positions[order.ticker]["net_qty"]
+            if qty > held.get(order.ticker, 0.0) + 1e-9:
+                raise OrderValidationError(f"Invalid sell quantity for {order.ticker}")
+            evidence_hash, decision_hash = sell_hashes[order.ticker]
+            if evidence_hash is None or decision_hash is None:
+                evidence_hash = decision_hash = canonical_json_hash({})
+                insert_audit_log(
+                    event_type="ERROR",
+                    ticker=order.ticker,
+                    evidence_hash=evidence_hash,
+                    decision_hash=decision_hash,
+                    payload={"error": "Missing prior DECISION hashes for SELL"},
+                    conn=conn,
+                )
+            price = sell_prices[order.ticker]
+            trade_ids[order.ticker] = insert_trade(
+                ticker=order.ticker,
+                side="SELL",
+                qty=qty,
+                price=price,
+                fees=order.fees,
+                evidence_hash=evidence_hash,
+                decision_hash=decision_hash,
+                strategy_id="v2",
+                model_version="stub-llm-v2",
+                note="batch_sell",
+                conn=conn,
+            )
+            insert_audit_log(
+                event_type="SELL",
+                ticker=order.ticker,
+                evidence_hash=evidence_hash,
+                decision_hash=decision_hash,
+                payload={"qty": qty, "price": price, "fees": order.fees},
+                conn=conn,
+            )
+            results[order.ticker] = {"ticker": order.ticker, "side": "SELL", "status": "ok", "qty": qty, "price": price}
+
+        for plan in planned_buys:
+            order, packet, decision, entry = plan["order"], plan["packet"], plan["decision"], plan["entry"]
+            evidence_hash = canonical_json_hash(packet)
+            decision_hash = canonical_json_hash(decision)
+            insert_audit_log(
+                event_type="DECISION",
+                ticker=order.ticker,
+                evidence_hash=evidence_hash,
+                decision_hash=decision_hash,
+                payload={"evidence_packet": packet, "llm_decision": decision},
+                conn=conn,
+            )
+            if entry.action != "BUY":
+                results[order.ticker] = {"ticker": order.ticker, "side": "BUY", "status": "no_trade", "reason": entry.reason}
+                continue
+            if plan["qty"] <= 0:
+                results[order.ticker] = {
+                    "ticker": order.ticker,
+                    "side": "BUY",
+                    "status": "no_trade",
+                    "reason": "insufficient_cash",
+                }
+                continue
+            trade_ids[order.ticker] = insert_trade(
+                ticker=order.ticker,
+                side="BUY",
+                qty=plan["qty"],
+                price=plan["price"],
+                fees=order.fees,
+                evidence_hash=evidence_hash,
+                decision_hash=decision_hash,
+                strategy_id="v2",
+                model_version="stub-llm-v2",
+                note=entry.reason,
+                conn=conn,
+            )
+            insert_audit_log(
+                event_type="BUY",
+                ticker=order.ticker,
+                evidence_hash=evidence_hash,
+                decision_hash=decision_hash,
+                payload={"qty": plan["qty"], "price": plan["price"], "fees": order.fees, "reason": entry.reason},
+                conn=conn,
+            )
+            results[order.ticker] = {
+                "ticker": order.ticker,
+                "side": "BUY",
+                "status": "ok",
+                "qty": plan["qty"],
+                "price": plan["price"],
+                "alloc_pct": plan["alloc_pct"],
+            }
+
+    # Hysteresis lives in its own write-through cache, so its writes follow the ledger commit:
+    # a rolled-back batch leaves every entry count where it was.
+    for plan in planned_buys:
+        apply_entry_step(plan["order"].ticker, plan["passed"])
+    for order in sells:
+        if order.ticker not in trade_ids:
+            continue
+        result = results[order.ticker]
+        if result["qty"] >= positions[order.ticker]["net_qty"]:
+            state = get_hysteresis_state(order.ticker)
+            upsert_hysteresis_state(order.ticker, consecutive_ok=0, peak_price=state.get("peak_price"), downgrade_streak=0)
+        realization = realization_for_trade(trade_ids[order.ticker]) or {}
+        result["cost_basis"] = realization.get("cost_basis")
+        result["realized_pnl"] = realization.get("pnl")
+
+    return {
+        "status": "ok",
+        "orders": [results[o.ticker] for o in orders],
+        "cash_before": round(cash_before, 2),
+        "cash_after": round(paper_cash_balance(), 2),
+        "scale": round(scale, 6),
+    }
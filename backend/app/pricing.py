@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from app.intraday import intraday_cache
+from app.lazy import pd, yf
+from app.market_data import last_good_closes
+from app.resilience import UpstreamUnavailable, empty_download, resilient_call
+
+
+def download_quotes(tickers: list[str]) -> dict[str, float]:
+    data = yf.download(tickers, period="5d", interval="1d", progress=False, auto_adjust=False, group_by="ticker")
+    if data is None or data.empty:
+        raise empty_download(tickers)
+    prices: dict[str, float] = {}
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex) and ticker not in data.columns.get_level_values(0):
+            continue
+        frame = data[ticker] if isinstance(data.columns, pd.MultiIndex) else data
+        closes = frame["Close"].dropna()
+        if not closes.empty:
+            prices[ticker] = float(closes.iloc[-1])
+    return prices
+
+
+def current_prices(tickers: list[str]) -> tuple[dict[str, float], set[str]]:
+    """Latest price per ticker plus the tickers priced from last good data.
+
+    Intraday buffers first, then one quote download behind the circuit breaker, then the last
+    cached daily close (flagged stale). Tickers with no real price at all are left out, so
+    callers booking trades never price them from stub bars.
+    """
+    prices = intraday_cache.latest_prices(tickers)
+    missing = [t for t in tickers if t not in prices]
+    if missing:
+        try:
+            prices.update(resilient_call("yfinance_quotes", download_quotes, missing))
+        except UpstreamUnavailable:
+            pass
+    stale = [t for t in tickers if t not in prices]
+    last_good = last_good_closes(stale)
+    prices.update(last_good)
+    return prices, set(last_good)
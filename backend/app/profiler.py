@@ -0,0 +1,53 @@
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+_busy = threading.Lock()
+
+
+def _stack(frame: FrameType | None) -> list[str]:
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+def sample_stacks(seconds: float, interval_seconds: float = 0.01) -> Counter[str]:
+    """Sample every other thread's Python stack for `seconds`, in collapsed-stack form.
+
+    Keys are "thread;outer;...;inner" and values the number of samples that saw that stack,
+    which is what flamegraph.pl, speedscope and inferno read. The sampling thread (the caller)
+    is left out. One profile runs at a time; a concurrent request raises ProfilerBusy.
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already being captured")
+    try:
+        own = threading.get_ident()
+        samples: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _stack(frame)
+                if stack:
+                    samples[";".join([names.get(ident, f"thread-{ident}"), *stack])] += 1
+            time.sleep(interval_seconds)
+        return samples
+    finally:
+        _busy.release()
+
+
+def collapsed(samples: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
@@ -1,14 +1,42 @@
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any, Callable
 
+from app.config import settings
+from app.db import consume_provider_quota, get_cached_news, put_cached_news
+from app.news_providers import gdelt_news, gnews_news, guardian_news, newsdata_news
+
 
 class ProviderRouter:
-    def __init__(self, providers: dict[str, Callable[..., Any]], quotas: dict[str, int], ttl_seconds: int = 300) -> None:
+    def __init__(
+        self,
+        providers: dict[str, Callable[..., Any]],
+        quotas: dict[str, int],
+        ttl_seconds: int = 300,
+        hedge_after_seconds: float | None = None,
+        ewma_alpha: float = 0.3,
+        failure_penalty_seconds: float = 5.0,
+        max_workers: int = 8,
+        shared_state: bool = False,
+    ) -> None:
         self.ordering = ["gdelt", "newsdata", "gnews", "guardian"]
         self.providers = providers
         self.quotas = quotas.copy()
         self.ttl_seconds = ttl_seconds
         self.cache: dict[str, tuple[float, Any]] = {}
+        # Hedged mode: when set, a second provider is raced against the first one once
+        # the first has been outstanding for this long, and the ordering follows latency.
+        self.hedge_after_seconds = hedge_after_seconds
+        self.ewma_alpha = ewma_alpha
+        self.failure_penalty_seconds = failure_penalty_seconds
+        self.latency_ewma: dict[str, float] = {}
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        # Shared mode: quotas are per-UTC-day limits held in the SQLite ledger, and the cache
+        # is read/written through SQLite, so every router in every worker draws on one budget.
+        self.shared_state = shared_state
 
     def call(self, cache_key: str, **kwargs: Any) -> Any:
         now = time.time()
@@ -16,15 +44,147 @@ class ProviderRouter:
             ts, value = self.cache[cache_key]
             if now - ts <= self.ttl_seconds:
                 return value
+        if self.shared_state:
+            stored = get_cached_news(cache_key, self.ttl_seconds, now=now)
+            if stored is not None:
+                self.cache[cache_key] = stored
+                return stored[1]
+
+        if self.hedge_after_seconds is not None:
+            result = self._hedged_call(**kwargs)
+            self._store(cache_key, now, result)
+            return result
 
         for provider_name in self.ordering:
-            if self.quotas.get(provider_name, 0) <= 0:
-                continue
             provider = self.providers.get(provider_name)
             if provider is None:
                 continue
+            if not self._try_consume(provider_name):
+                continue
             result = provider(**kwargs)
-            self.quotas[provider_name] -= 1
-            self.cache[cache_key] = (now, result)
+            self._store(cache_key, now, result)
             return result
         raise RuntimeError("No provider available with remaining quota")
+
+    def is_cached(self, cache_key: str, now: float | None = None) -> bool:
+        entry = self.cache.get(cache_key)
+        return entry is not None and (now if now is not None else time.time()) - entry[0] <= self.ttl_seconds
+
+    def close(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _store(self, cache_key: str, now: float, result: Any) -> None:
+        self.cache[cache_key] = (now, result)
+        if self.shared_state:
+            put_cached_news(cache_key, result, stored_at=now)
+
+    def _try_consume(self, provider_name: str) -> bool:
+        if self.shared_state:
+            return consume_provider_quota(provider_name, self.quotas.get(provider_name, 0))
+        with self._lock:
+            if self.quotas.get(provider_name, 0) <= 0:
+                return False
+            self.quotas[provider_name] -= 1
+            return True
+
+    def _reserve_next(self, tried: set[str]) -> str | None:
+        with self._lock:
+            candidates = [name for name in self.ordering if name not in tried and name in self.providers]
+        for provider_name in candidates:
+            if self._try_consume(provider_name):
+                return provider_name
+        return None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="news-hedge")
+            return self._executor
+
+    def _record_latency(self, provider_name: str, seconds: float) -> None:
+        with self._lock:
+            prev = self.latency_ewma.get(provider_name)
+            if prev is None:
+                self.latency_ewma[provider_name] = seconds
+            else:
+                self.latency_ewma[provider_name] = self.ewma_alpha * seconds + (1.0 - self.ewma_alpha) * prev
+            # Providers without samples keep their slot ahead of slow ones; sort is stable.
+            self.ordering = sorted(self.ordering, key=lambda name: self.latency_ewma.get(name, 0.0))
+
+    def _record_once(self, recorded: set[str], provider_name: str, seconds: float) -> None:
+        # One sample per provider per hedged call, whichever of the winner or the attempt gets here first.
+        with self._lock:
+            if provider_name in recorded:
+                return
+            recorded.add(provider_name)
+        self._record_latency(provider_name, seconds)
+
+    def _timed(self, provider_name: str, kwargs: dict[str, Any], recorded: set[str]) -> Any:
+        started = time.monotonic()
+        try:
+            result = self.providers[provider_name](**kwargs)
+        except Exception:
+            self._record_once(recorded, provider_name, time.monotonic() - started + self.failure_penalty_seconds)
+            raise
+        self._record_once(recorded, provider_name, time.monotonic() - started)
+        return result
+
+    def _hedged_call(self, **kwargs: Any) -> Any:
+        executor = self._get_executor()
+        tried: set[str] = set()
+        pending: dict[Future, str] = {}
+        launched_at: dict[str, float] = {}
+        recorded: set[str] = set()
+        errors: list[str] = []
+
+        def launch() -> bool:
+            provider_name = self._reserve_next(tried)
+            if provider_name is None:
+                return False
+            tried.add(provider_name)
+            launched_at[provider_name] = time.monotonic()
+            pending[executor.submit(self._timed, provider_name, kwargs, recorded)] = provider_name
+            return True
+
+        if not launch():
+            raise RuntimeError("No provider available with remaining quota")
+
+        while pending:
+            # A new hedge starts each time hedge_after_seconds passes with no result. A failure
+            # starts the next provider at once, even while another call is still in flight.
+            done, _ = wait(list(pending), timeout=self.hedge_after_seconds, return_when=FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            for future in done:
+                provider_name = pending.pop(future)
+                exc = future.exception()
+                if exc is None:
+                    for other, other_name in pending.items():
+                        # A loser that is still running counts its time so far as a lower bound;
+                        # when it finishes later, its own sample is dropped.
+                        if not other.cancel():
+                            self._record_once(recorded, other_name, time.monotonic() - launched_at[other_name])
+                    return future.result()
+                errors.append(f"{provider_name}: {exc}")
+                launch()
+        raise RuntimeError(f"All news providers failed: {'; '.join(errors)}")
+
+
+def build_news_router(ttl_seconds: int = 300) -> ProviderRouter:
+    quota = settings.news_daily_quota_per_provider
+    return ProviderRouter(
+        providers={
+            "gdelt": gdelt_news,
+            "newsdata": newsdata_news,
+            "gnews": gnews_news,
+            "guardian": guardian_news,
+        },
+        quotas={"gdelt": quota, "newsdata": quota, "gnews": quota, "guardian": quota},
+        ttl_seconds=ttl_seconds,
+        hedge_after_seconds=settings.news_hedge_after_seconds,
+        shared_state=True,
+    )
@@ -0,0 +1,173 @@
+import random
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+from app.config import settings
+from app.db import insert_audit_log
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(RuntimeError):
+    pass
+
+
+class NoDataForSymbol(UpstreamUnavailable):
+    """The source answered but has nothing for the one symbol asked about: a per-ticker miss,
+    not an outage, so it is neither retried nor counted against the circuit."""
+
+
+def empty_download(tickers: list[str]) -> Exception:
+    # yfinance reports outages and unknown symbols alike as an empty frame; only a
+    # single-symbol request can be blamed on the symbol.
+    return NoDataForSymbol(f"no data for {tickers[0]}") if len(tickers) == 1 else ValueError("empty download")
+
+
+class CircuitBreaker:
+    """Closed -> open after failure_threshold consecutive failures; after reset_seconds one
+    half-open trial call decides between closing again and another open period."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked(time.monotonic())
+
+    def _state_locked(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if now - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state_locked(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; True when this failure opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            was_open = self._opened_at is not None
+            if was_open or self._failures >= self.failure_threshold:
+                # A failed half-open trial starts a fresh open period.
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+            return not was_open and self._opened_at is not None
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {"state": self._state_locked(time.monotonic()), "consecutive_failures": self._failures}
+
+
+class RetryBudget:
+    """Process-wide cap on retries: every first attempt deposits ratio tokens, every retry
+    spends one, so retries stay a bounded fraction of traffic while a source is failing."""
+
+    def __init__(self, ratio: float, max_tokens: float) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return self._tokens
+
+
+_lock = threading.Lock()
+_breakers: dict[str, CircuitBreaker] = {}
+retry_budget = RetryBudget(settings.market_data_retry_budget_ratio, settings.market_data_retry_budget_max)
+
+
+def breaker(source: str) -> CircuitBreaker:
+    with _lock:
+        found = _breakers.get(source)
+        if found is None:
+            found = _breakers[source] = CircuitBreaker(
+                source, settings.market_data_breaker_failures, settings.market_data_breaker_reset_seconds
+            )
+        return found
+
+
+def breaker_states() -> dict[str, dict[str, Any]]:
+    with _lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
+
+
+def reset_resilience() -> None:
+    global retry_budget
+    with _lock:
+        _breakers.clear()
+    retry_budget = RetryBudget(settings.market_data_retry_budget_ratio, settings.market_data_retry_budget_max)
+
+
+def resilient_call(source: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call fn through the source's circuit breaker with jittered retries from the shared budget.
+
+    Raises UpstreamUnavailable without calling fn while the circuit is open, and after the
+    last failed attempt. A logical call counts as one breaker failure however many attempts it
+    made, and NoDataForSymbol passes straight through without counting. One ERROR audit row is
+    written when a circuit opens, not per failure.
+    """
+    circuit = breaker(source)
+    if not circuit.allow():
+        raise UpstreamUnavailable(f"{source}: circuit open")
+    retry_budget.deposit()
+    attempts = max(1, settings.market_data_retry_attempts)
+    last_exc: Exception | None = None
+    for attempt in range(attempts):
+        try:
+            result = fn(*args, **kwargs)
+        except NoDataForSymbol:
+            # The source is up; it just has nothing for this ticker.
+            circuit.record_success()
+            raise
+        except Exception as exc:
+            last_exc = exc
+            if attempt + 1 >= attempts or circuit.state != "closed" or not retry_budget.withdraw():
+                break
+            # Full jitter: concurrent callers that failed together do not retry together.
+            time.sleep(random.uniform(0.0, settings.market_data_retry_base_seconds * 2**attempt))
+            continue
+        circuit.record_success()
+        return result
+    if circuit.record_failure():
+        insert_audit_log(
+            event_type="ERROR",
+            ticker=None,
+            payload={"context": "circuit_open", "source": source, "error": str(last_exc)},
+        )
+    raise UpstreamUnavailable(f"{source}: {last_exc}") from last_exc
@@ -0,0 +1,123 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.db import data_versions
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+
+@dataclass
+class CachedResponse:
+    # Strong validator of the identity body; each content-coding gets its own, see _etag_for.
+    etag: str
+    body: bytes
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+
+def market_asof(now: float | None = None) -> int:
+    bucket = max(1, settings.market_data_asof_seconds)
+    return int(now if now is not None else time.time()) // bucket * bucket
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _pick_encoding(accept_encoding: str) -> str | None:
+    offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def _etag_for(etag: str, encoding: str | None) -> str:
+    # A strong ETag names one exact byte sequence, and the gzip/br/identity bodies differ.
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {c.strip() for c in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[Any, ...], CachedResponse] = OrderedDict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: tuple[Any, ...]) -> CachedResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple[Any, ...], entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def encoded(self, entry: CachedResponse, encoding: str) -> bytes:
+        with self._lock:
+            data = entry.encoded.get(encoding)
+        if data is None:
+            data = _encode(entry.body, encoding)
+            with self._lock:
+                entry.encoded[encoding] = data
+        return data
+
+
+response_cache = ResponseCache(settings.response_cache_entries)
+
+
+def _cache_key(request: Request) -> tuple[Any, ...]:
+    trades_version, audit_version = data_versions()
+    return (request.url.path, str(request.url.query), trades_version, audit_version, market_asof())
+
+
+def cached_json(request: Request, compute: Callable[[], Any]) -> Response:
+    key = _cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        body = json.dumps(compute(), separators=(",", ":"), default=str).encode("utf-8")
+        entry = CachedResponse(etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body)
+        # Key by the versions seen after computing: a handler that appends audit rows
+        # (e.g. a fresh DECISION) would otherwise never hit its own cache entry.
+        response_cache.put(_cache_key(request), entry)
+
+    encoding = _pick_encoding(request.headers.get("accept-encoding", ""))
+    if len(entry.body) < settings.response_compress_min_bytes:
+        encoding = None
+    etag = _etag_for(entry.etag, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=response_cache.encoded(entry, encoding), media_type="application/json", headers=headers)
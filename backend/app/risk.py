@@ -0,0 +1,177 @@
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.db import list_trades
+from app.metrics import PriceProvider, default_price_provider, metrics_window, parse_ts_date
+from app.trading_calendar import trading_days
+
+TRADING_DAYS_PER_YEAR = 252
+ROLLING_VOL_WINDOW = 30
+
+
+def _closes_matrix(
+    tickers: list[str],
+    dates: list[str],
+    get_closes: PriceProvider,
+) -> np.ndarray:
+    start_iso, end_iso = dates[0], dates[-1]
+    index = {d: i for i, d in enumerate(dates)}
+    raw = np.full((len(tickers), len(dates)), np.nan)
+    for row, ticker in enumerate(tickers):
+        for d, close in get_closes(ticker, start_iso, end_iso).items():
+            col = index.get(d)
+            if col is not None:
+                raw[row, col] = close
+    return _forward_fill(raw)
+
+
+def _forward_fill(raw: np.ndarray) -> np.ndarray:
+    # Carry the last known close forward along each row; leading gaps become 0.0.
+    valid = ~np.isnan(raw)
+    last_idx = np.where(valid, np.arange(raw.shape[1]), -1)
+    np.maximum.accumulate(last_idx, axis=1, out=last_idx)
+    rows = np.arange(raw.shape[0])[:, None]
+    filled = raw[rows, np.maximum(last_idx, 0)]
+    return np.where(last_idx >= 0, filled, 0.0)
+
+
+def build_equity_matrix(
+    trades: list[dict[str, Any]],
+    dates: list[str],
+    tickers: list[str],
+    closes: np.ndarray,
+    initial_cash: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Returns (equity[days], position_values[tickers, days], held_qty[tickers, days]) with the same
+    # replay rules as compute_metrics: a trade counts from its own date onwards, longs only are marked.
+    n_days = len(dates)
+    qty_delta = np.zeros((len(tickers), n_days))
+    cash_delta = np.zeros(n_days)
+    if trades:
+        row_of = {t: i for i, t in enumerate(tickers)}
+        trade_days = np.array([parse_ts_date(t["ts_utc"]) for t in trades])
+        cols = np.searchsorted(np.array(dates), trade_days, side="left")
+        keep = trade_days <= dates[-1]
+        rows = np.array([row_of[t["ticker"]] for t in trades])
+        qty = np.array([float(t["qty"]) for t in trades])
+        price = np.array([float(t["price"]) for t in trades])
+        fees = np.array([float(t["fees"]) for t in trades])
+        is_buy = np.array([t["side"] == "BUY" for t in trades])
+        signed_qty = np.where(is_buy, qty, -qty)
+        cash_flow = np.where(is_buy, -(qty * price + fees), qty * price - fees)
+        np.add.at(qty_delta, (rows[keep], cols[keep]), signed_qty[keep])
+        np.add.at(cash_delta, cols[keep], cash_flow[keep])
+    held = np.cumsum(qty_delta, axis=1)
+    values = np.where(held > 0, held * closes, 0.0)
+    equity = initial_cash + np.cumsum(cash_delta) + values.sum(axis=0)
+    return equity, values, held
+
+
+def _simple_returns(series: np.ndarray) -> np.ndarray:
+    prev = series[:-1]
+    safe_prev = np.where(prev > 0, prev, 1.0)
+    return np.where(prev > 0, (series[1:] - prev) / safe_prev, 0.0)
+
+
+def _drawdown_durations(underwater: np.ndarray) -> tuple[int, int]:
+    if not underwater.any():
+        return 0, 0
+    # Length of each underwater run via the index of the last time equity was at its peak.
+    idx = np.arange(len(underwater))
+    last_peak = np.maximum.accumulate(np.where(underwater, -1, idx))
+    run_lengths = np.where(underwater, idx - last_peak, 0)
+    return int(run_lengths.max()), int(run_lengths[-1])
+
+
+def risk_metrics_from_arrays(
+    dates: list[str],
+    equity: np.ndarray,
+    held: np.ndarray,
+    closes: np.ndarray,
+    tickers: list[str],
+    benchmark_closes: np.ndarray | None = None,
+) -> dict[str, Any]:
+    returns = _simple_returns(equity)
+    n = len(returns)
+    ann = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    mean_ret = float(returns.mean()) if n else 0.0
+    std = float(returns.std()) if n >= 2 else 0.0
+    sharpe = mean_ret / std * ann if std > 0 else 0.0
+    downside = float(np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))) if n else 0.0
+    sortino = mean_ret / downside * ann if downside > 0 else 0.0
+
+    running_peak = np.maximum.accumulate(equity)
+    drawdowns = np.where(running_peak > 0, (running_peak - equity) / np.where(running_peak > 0, running_peak, 1.0), 0.0)
+    max_dd = float(drawdowns.max()) if len(drawdowns) else 0.0
+    max_dd_days, current_dd_days = _drawdown_durations(equity < running_peak)
+
+    total_return = float(equity[-1] / equity[0] - 1.0) if len(equity) and equity[0] > 0 else 0.0
+    ann_return = (1.0 + total_return) ** (TRADING_DAYS_PER_YEAR / n) - 1.0 if n and total_return > -1.0 else 0.0
+    calmar = ann_return / max_dd if max_dd > 0 else 0.0
+
+    rolling_vol: list[dict[str, Any]] = []
+    if n >= ROLLING_VOL_WINDOW:
+        windows = np.lib.stride_tricks.sliding_window_view(returns, ROLLING_VOL_WINDOW)
+        vols = windows.std(axis=1) * ann
+        rolling_vol = [
+            {"date": dates[i + ROLLING_VOL_WINDOW], "value": round(float(v), 6)} for i, v in enumerate(vols)
+        ]
+
+    beta = 0.0
+    if benchmark_closes is not None and n >= 2:
+        bench_returns = _simple_returns(benchmark_closes)
+        bench_var = float(bench_returns.var())
+        if bench_var > 0:
+            beta = float(np.mean((returns - mean_ret) * (bench_returns - bench_returns.mean())) / bench_var)
+
+    # P&L of each position on day t is yesterday's holding times today's price move.
+    if len(equity) >= 2 and equity[0] > 0:
+        daily_pnl = np.where(held[:, :-1] > 0, held[:, :-1], 0.0) * np.diff(closes, axis=1)
+        contribution = daily_pnl.sum(axis=1) / equity[0]
+    else:
+        contribution = np.zeros(len(tickers))
+
+    return {
+        "sharpe": round(sharpe, 4),
+        "sortino": round(sortino, 4),
+        "calmar": round(calmar, 4),
+        "annualized_return": round(ann_return, 6),
+        "max_drawdown": round(max_dd, 4),
+        "max_drawdown_duration_days": max_dd_days,
+        "current_drawdown_duration_days": current_dd_days,
+        "beta": round(beta, 4),
+        "rolling_vol_30d": rolling_vol,
+        "position_contribution": {t: round(float(c), 6) for t, c in zip(tickers, contribution)},
+    }
+
+
+def compute_risk_metrics(
+    price_provider: PriceProvider | None = None,
+    benchmark: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> dict[str, Any]:
+    benchmark = benchmark or settings.risk_benchmark_ticker
+    trades = list_trades()
+    start_d, end_d = metrics_window(start, end)
+    dates = [d.isoformat() for d in trading_days(start_d, end_d)] or [end_d.isoformat()]
+
+    if not trades:
+        equity = np.full(1, settings.paper_portfolio_usd)
+        empty = np.zeros((0, 1))
+        return {
+            "benchmark": benchmark,
+            **risk_metrics_from_arrays([end_d.isoformat()], equity, empty, empty, []),
+            "stale_tickers": [],
+        }
+
+    get_closes = price_provider or default_price_provider(trades)
+    tickers = sorted({t["ticker"] for t in trades})
+    closes = _closes_matrix(tickers + [benchmark], dates, get_closes)
+    equity, _values, held = build_equity_matrix(trades, dates, tickers, closes[:-1], settings.paper_portfolio_usd)
+    metrics = risk_metrics_from_arrays(dates, equity, held, closes[:-1], tickers, benchmark_closes=closes[-1])
+    return {"benchmark": benchmark, **metrics, "stale_tickers": sorted(getattr(get_closes, "stale", ()))}
@@ -1,4 +1,5 @@
 from app.config import settings
+from app.models import DEFAULT_POLICY, PolicyParams
 
 
 def compute_alloc_pct(
@@ -7,13 +8,18 @@ def compute_alloc_pct(
     velocity: float,
     corr_penalty: float,
     risk_mode: str | None = None,
+    params: PolicyParams = DEFAULT_POLICY,
 ) -> float:
     prob = max(0.5, min(1.0, prob_outperform_90d))
-    base = 0.01 + (prob - 0.5) * (0.05 - 0.01) / 0.5
+    base = params.alloc_min + (prob - 0.5) * (params.alloc_max - params.alloc_min) / 0.5
 
-    penalty = max(0.0, vol_20d) * 0.20 + max(0.0, velocity) * 0.10 + max(0.0, corr_penalty) * 0.10
+    penalty = (
+        max(0.0, vol_20d) * params.vol_penalty
+        + max(0.0, velocity) * params.velocity_penalty
+        + max(0.0, corr_penalty) * params.corr_penalty_weight
+    )
     alloc = base - penalty
-    alloc = max(0.01, alloc)
+    alloc = max(params.alloc_min, alloc)
 
     max_alloc = settings.default_max_alloc_pct
     if (risk_mode or "").lower() == "moderate":
@@ -0,0 +1,259 @@
+import argparse
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, fields, replace
+from multiprocessing import shared_memory
+from typing import Any, Iterable
+
+import numpy as np
+
+from app.config import settings
+from app.llm_router import score_features
+from app.market_data import fetch_history
+from app.models import DEFAULT_POLICY, PolicyParams
+from app.sizing import compute_alloc_pct
+from app.walk_forward import NEWS_SENTIMENT_PRIOR, _process_context, rolling_features
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Default search space: the hardcoded thresholds sit in the middle of each range. The
+# strong_buy_* thresholds are left out: every STRONG_BUY the model emits (0.80/0.60) already
+# clears the buy thresholds below, so varying them cannot change a result.
+DEFAULT_SPACE: dict[str, tuple[Any, ...]] = {
+    "buy_signal": (0.65, 0.70, 0.75),
+    "buy_prob": (0.52, 0.55, 0.58),
+    "entry_confirmations": (1, 2, 3),
+    "trail_atr_mult": (2.0, 3.0, 4.0),
+    "take_profit_frac": (0.25, 0.4, 0.6),
+    "downgrade_streak": (1, 2, 3),
+    "alloc_max": (0.04, 0.05, 0.07),
+}
+
+# Set in each worker by _attach: a read-only view of the parent's closes and the features
+# derived from it, computed once per worker rather than once per parameter set.
+_worker: dict[str, Any] = {}
+
+
+def grid(space: dict[str, Iterable[Any]], base: PolicyParams = DEFAULT_POLICY) -> list[PolicyParams]:
+    keys = list(space)
+    return [replace(base, **dict(zip(keys, values))) for values in itertools.product(*(space[k] for k in keys))]
+
+
+def random_search(
+    space: dict[str, Iterable[Any]], n: int, seed: int = 0, base: PolicyParams = DEFAULT_POLICY
+) -> list[PolicyParams]:
+    """n distinct draws from the grid (fewer when the grid itself is smaller)."""
+    rng = random.Random(seed)
+    choices = {k: list(v) for k, v in space.items()}
+    total = int(np.prod([len(v) for v in choices.values()])) if choices else 1
+    seen: set[tuple[Any, ...]] = set()
+    out: list[PolicyParams] = []
+    while len(out) < min(n, total):
+        values = tuple(rng.choice(choices[k]) for k in choices)
+        if values not in seen:
+            seen.add(values)
+            out.append(replace(base, **dict(zip(choices, values))))
+    return out
+
+
+def closes_matrix(history: dict[str, list[dict[str, float]]]) -> tuple[list[str], np.ndarray]:
+    """Tickers x days close matrix aligned on the most recent bar, NaN before a ticker's history."""
+    tickers = sorted(history)
+    n_days = max((len(history[t]) for t in tickers), default=0)
+    matrix = np.full((len(tickers), n_days), np.nan)
+    for i, ticker in enumerate(tickers):
+        closes = [r["Close"] for r in history[ticker]]
+        if closes:
+            matrix[i, n_days - len(closes) :] = closes
+    return tickers, matrix
+
+
+def _features(closes: np.ndarray) -> dict[str, np.ndarray]:
+    momentum = np.full(closes.shape, np.nan)
+    vol = np.full(closes.shape, np.nan)
+    for i, row in enumerate(closes):
+        momentum[i], vol[i] = rolling_features(row)
+    signal, prob = score_features(momentum, vol, NEWS_SENTIMENT_PRIOR)
+    return {"closes": closes, "momentum": momentum, "vol": vol, "signal": signal, "prob": prob}
+
+
+def simulate(features: dict[str, np.ndarray], params: PolicyParams) -> dict[str, Any]:
+    """Replay entry_gate/exit_policy_v2/compute_alloc_pct day by day across all tickers at once.
+
+    Trades fill at the close that triggered them. The book starts as 1.0 of cash; entries are
+    sized with compute_alloc_pct against current equity and limited to the cash on hand.
+    Shock, liquidity and walk-forward inputs have no history here, so they never block.
+    """
+    closes = features["closes"]
+    signal, prob, momentum, vol = features["signal"], features["prob"], features["momentum"], features["vol"]
+    n_tickers, n_days = closes.shape
+    prices = np.nan_to_num(closes)
+    units = np.zeros(n_tickers)
+    peak = np.zeros(n_tickers)
+    consecutive = np.zeros(n_tickers, dtype=int)
+    streak = np.zeros(n_tickers, dtype=int)
+    cash = 1.0
+    equity = np.ones(n_days)
+    trades = 0
+    for t in range(1, n_days):
+        price, prev = prices[:, t], prices[:, t - 1]
+        sig, pr = signal[:, t], prob[:, t]
+        valid = ~np.isnan(sig)
+        held = units > 0
+
+        # Exits, mirroring exit_policy_v2 for open positions.
+        peak = np.where(held, np.maximum(peak, price), peak)
+        streak = np.where(held & valid & (sig < params.downgrade_signal), streak + 1, 0)
+        atr = np.maximum(0.01, price * 0.02)
+        pnl_today = np.divide(price, prev, out=np.zeros(n_tickers), where=prev > 0) - 1.0
+        sell_all = held & (price < peak - params.trail_atr_mult * atr)
+        partial = held & ~sell_all & (pnl_today >= params.take_profit_day_pct)
+        sell_all |= held & ~partial & (streak >= params.downgrade_streak) & valid & (sig < params.downgrade_signal)
+        sold = np.where(sell_all, units, np.where(partial, units * params.take_profit_frac, 0.0))
+        cash += float(sold @ price)
+        units -= sold
+        trades += int(np.count_nonzero(sold))
+        consecutive[sell_all] = 0
+        streak[sell_all] = 0
+
+        # Entries, mirroring entry_gate for names not held.
+        flat = units <= 0
+        # rec == "STRONG_BUY" comes from the model's own fixed cut-offs, not from params.
+        strong_ok = (sig >= 0.80) & (pr >= 0.60) & (sig >= params.strong_buy_signal) & (pr >= params.strong_buy_prob)
+        buy_ok = (sig >= params.buy_signal) & (pr >= params.buy_prob)
+        pass_gate = flat & valid & (strong_ok | buy_ok)
+        consecutive = np.where(flat, np.where(pass_gate, consecutive + 1, 0), consecutive)
+        book = cash + float(units @ price)
+        for i in np.flatnonzero(pass_gate & (consecutive >= params.entry_confirmations)):
+            alloc = compute_alloc_pct(
+                prob_outperform_90d=float(pr[i]),
+                vol_20d=float(vol[i, t]),
+                velocity=abs(float(momentum[i, t])),
+                corr_penalty=0.0,
+                params=params,
+            )
+            spend = min(cash, alloc * book)
+            if spend <= 0 or price[i] <= 0:
+                continue
+            units[i] = spend / price[i]
+            peak[i] = price[i]
+            streak[i] = 0
+            cash -= spend
+            trades += 1
+        equity[t] = cash + float(units @ price)
+    return {**_performance(equity), "trades": trades}
+
+
+def _performance(equity: np.ndarray) -> dict[str, float]:
+    returns = equity[1:] / equity[:-1] - 1.0 if len(equity) > 1 else np.empty(0)
+    std = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+    sharpe = float(returns.mean()) / std * np.sqrt(TRADING_DAYS_PER_YEAR) if std > 0 else 0.0
+    running_peak = np.maximum.accumulate(equity)
+    max_drawdown = float((equity / running_peak - 1.0).min()) if len(equity) else 0.0
+    return {
+        "sharpe": round(sharpe, 4),
+        "max_drawdown": round(max_drawdown, 6),
+        "total_return": round(float(equity[-1] - 1.0), 6) if len(equity) else 0.0,
+    }
+
+
+def _attach(name: str, shape: tuple[int, int]) -> None:
+    # Pool children share the parent's resource tracker, so the parent's unlink is the only cleanup.
+    shm = shared_memory.SharedMemory(name=name)
+    closes = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker["shm"] = shm
+    _worker["features"] = _features(closes)
+
+
+def _run_one(params: PolicyParams) -> dict[str, Any]:
+    return {"params": asdict(params), **simulate(_worker["features"], params)}
+
+
+def rank_results(results: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Best Sharpe first; the shallower drawdown breaks ties.
+    ranked = sorted(results, key=lambda r: (-r["sharpe"], -r["max_drawdown"]))
+    return [{"rank": i + 1, **r} for i, r in enumerate(ranked)]
+
+
+def run_sweep(params_list: list[PolicyParams], closes: np.ndarray, workers: int | None = None) -> list[dict[str, Any]]:
+    """Score every parameter set against the same closes matrix and rank by Sharpe.
+
+    The matrix is copied once into shared memory; pool workers map it read-only instead of
+    receiving a pickled copy with every task.
+    """
+    if not params_list:
+        return []
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+    workers = min(workers or os.cpu_count() or 1, len(params_list))
+    if workers <= 1:
+        features = _features(closes)
+        return rank_results([{"params": asdict(p), **simulate(features, p)} for p in params_list])
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, closes.nbytes))
+    try:
+        np.ndarray(closes.shape, dtype=np.float64, buffer=shm.buf)[:] = closes
+        chunksize = max(1, len(params_list) // (workers * 4))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_process_context(),
+            initializer=_attach,
+            initargs=(shm.name, closes.shape),
+        ) as pool:
+            results = list(pool.map(_run_one, params_list, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+    return rank_results(results)
+
+
+def format_table(ranked: list[dict[str, Any]], limit: int = 20) -> str:
+    if not ranked:
+        return "no results"
+    # Only the parameters that vary across the sweep are worth a column.
+    names = [f.name for f in fields(PolicyParams) if len({r["params"][f.name] for r in ranked}) > 1]
+    header = ["rank", "sharpe", "max_dd", "return", "trades", *names]
+    rows = [
+        [
+            str(r["rank"]),
+            f"{r['sharpe']:.3f}",
+            f"{r['max_drawdown']:.2%}",
+            f"{r['total_return']:.2%}",
+            str(r["trades"]),
+            *(str(r["params"][n]) for n in names),
+        ]
+        for r in ranked[:limit]
+    ]
+    widths = [max(len(h), *(len(row[i]) for row in rows)) for i, h in enumerate(header)]
+    lines = ["  ".join(h.rjust(w) for h, w in zip(header, widths))]
+    lines.extend("  ".join(c.rjust(w) for c, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep entry/exit/sizing thresholds over cached daily history.")
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--days", type=int, default=settings.walk_forward_history_days)
+    parser.add_argument("--random", type=int, default=0, help="sample N parameter sets instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", default=None, help="also write the full ranking here")
+    args = parser.parse_args(argv)
+
+    history = fetch_history(args.tickers, args.days)
+    if not history:
+        raise SystemExit("no history downloaded for the requested tickers")
+    _, closes = closes_matrix(history)
+    params_list = random_search(DEFAULT_SPACE, args.random, args.seed) if args.random else grid(DEFAULT_SPACE)
+    ranked = run_sweep(params_list, closes, workers=args.workers)
+    print(format_table(ranked, limit=args.top))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as fh:
+            json.dump(ranked, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
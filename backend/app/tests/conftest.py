@@ -0,0 +1,25 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Test clients run the app's startup hooks; the cache warm-up would download market data and
+# write JOB rows behind every test. Tests that exercise it call run_warmup directly.
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+
+# Settings are read once at import, so the scratch database is chosen before any app module
+# loads. Tests never write to the stocks.db in the working tree.
+if "DB_PATH" not in os.environ:
+    _db_dir = tempfile.mkdtemp(prefix="stockbot-tests-")
+    atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+    os.environ["DB_PATH"] = os.path.join(_db_dir, "stocks.db")
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _schema() -> None:
+    # The scratch database starts empty; tests that skip init_db still find every table.
+    from app.db import init_db
+
+    init_db()
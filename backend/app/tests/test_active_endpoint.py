@@ -2,7 +2,7 @@ from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 
-from app.db import get_conn, init_db, insert_trade
+from app.db import get_conn, init_db, insert_trade, reset_hysteresis_cache
 from app.main import app
 
 
@@ -11,11 +11,15 @@ def _reset() -> None:
     conn = get_conn()
     try:
         conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
         conn.execute("DELETE FROM audit_log")
         conn.execute("DELETE FROM hysteresis_state")
         conn.commit()
     finally:
         conn.close()
+    reset_hysteresis_cache()
 
 
 def test_active_without_recent_decision_populates_decision_and_no_false_sell_trigger() -> None:
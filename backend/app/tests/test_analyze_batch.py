@@ -0,0 +1,116 @@
+import json
+from unittest.mock import patch
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.db import get_conn, init_db
+from app.evidence import build_evidence_packet
+from app.main import app
+from app.market_data import fetch_bars, fetch_fundamentals, reset_market_data_cache
+
+
+def _frame(tickers: list[str], days: int = 40) -> pd.DataFrame:
+    index = pd.date_range("2025-01-01", periods=days, freq="B")
+    columns = pd.MultiIndex.from_product([tickers, ["Close", "Volume"]])
+    data = {(t, "Close"): [50.0 + i + n for i in range(days)] for n, t in enumerate(tickers)}
+    data.update({(t, "Volume"): [1_000_000.0] * days for t in tickers})
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _read_lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_fetch_bars_downloads_all_misses_at_once_and_caches() -> None:
+    reset_market_data_cache()
+    with patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers))) as download:
+        bars = fetch_bars(["aapl", "MSFT", "NVDA"])
+        again = fetch_bars(["AAPL", "MSFT", "NVDA", "TSLA"])
+    assert download.call_count == 2
+    assert download.call_args_list[1].args[0] == ["TSLA"]
+    assert len(bars["AAPL"]) == 30
+    assert bars["MSFT"][-1]["Close"] == 50.0 + 39 + 1
+    assert again["AAPL"] is bars["AAPL"]
+
+
+def test_evidence_uses_prefetched_inputs() -> None:
+    reset_market_data_cache()
+    bars = [{"Close": 10.0 + i, "Volume": 5.0} for i in range(30)]
+    with patch("app.market_data.yf.download", side_effect=AssertionError("no download")):
+        packet = build_evidence_packet("ZZZ", bars=bars, info={"marketCap": 3e9, "sector": "Tech"})
+    assert packet["current_price"] == 39.0
+    assert packet["market_cap"] == 3e9
+    assert packet["sector"] == "Tech"
+
+
+def test_analyze_batch_streams_ndjson_with_partial_failures() -> None:
+    reset_market_data_cache()
+    real_build = build_evidence_packet
+
+    def build(ticker: str, **kwargs):
+        if ticker == "BAD":
+            raise RuntimeError("no data for BAD")
+        return real_build(ticker, **kwargs)
+
+    with TestClient(app) as client, patch("app.main.build_evidence_packet", side_effect=build), patch(
+        "app.main.fetch_fundamentals", side_effect=lambda tickers: {t: {} for t in tickers}
+    ), patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers))) as download:
+        r = client.post("/api/analyze/batch", json={"tickers": ["aapl", "BAD", "MSFT", "AAPL"]})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert download.call_count == 1
+    lines = _read_lines(r)
+    results = {line["ticker"]: line for line in lines[:-1]}
+    assert set(results) == {"AAPL", "BAD", "MSFT"}
+    assert results["AAPL"]["status"] == "ok" and "rec" in results["AAPL"]["llm_decision"]
+    assert results["AAPL"]["market_data_status"] == "fresh"
+    assert results["BAD"] == {
+        "ticker": "BAD",
+        "status": "error",
+        "stage": "evidence",
+        "market_data_status": "fresh",
+        "error": "no data for BAD",
+    }
+    assert lines[-1] == {"status": "done", "requested": 3, "ok": 2, "degraded": 0, "failed": 1}
+
+
+def test_analyze_batch_marks_results_built_on_stub_bars_degraded() -> None:
+    reset_market_data_cache()
+    with TestClient(app) as client, patch(
+        "app.main.fetch_fundamentals", side_effect=lambda tickers: {t: {} for t in tickers}
+    ), patch(
+        "app.market_data.yf.download",
+        side_effect=lambda tickers, **kw: _frame([t for t in tickers if t != "GONE"]),
+    ):
+        r = client.post("/api/analyze/batch", json={"tickers": ["AAPL", "GONE"]})
+    lines = _read_lines(r)
+    results = {line["ticker"]: line for line in lines[:-1]}
+    assert (results["AAPL"]["status"], results["AAPL"]["market_data_status"]) == ("ok", "fresh")
+    assert (results["GONE"]["status"], results["GONE"]["market_data_status"]) == ("degraded", "stub")
+    assert lines[-1] == {"status": "done", "requested": 2, "ok": 1, "degraded": 1, "failed": 0}
+
+
+def test_analyze_batch_enforces_ticker_limit() -> None:
+    tickers = [f"T{i}" for i in range(settings.analyze_batch_max_tickers + 1)]
+    with TestClient(app) as client:
+        too_many = client.post("/api/analyze/batch", json={"tickers": tickers})
+        empty = client.post("/api/analyze/batch", json={"tickers": [" "]})
+    assert too_many.status_code == 400
+    assert empty.status_code == 400
+
+
+def test_fetch_fundamentals_caches_successful_lookups() -> None:
+    reset_market_data_cache()
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM fundamentals")
+        conn.commit()
+    finally:
+        conn.close()
+    with patch("app.market_data._fetch_info", side_effect=lambda t: {"marketCap": 1.0} if t != "X" else {}) as info:
+        fetch_fundamentals(["ZZFUND", "X"])
+        fetch_fundamentals(["ZZFUND", "X"])
+    assert sorted(c.args[0] for c in info.call_args_list) == ["X", "X", "ZZFUND"]
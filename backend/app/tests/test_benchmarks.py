@@ -0,0 +1,61 @@
+from app import db
+from benchmarks.runner import compare, format_report, run_suite
+
+
+def _result(median_s: float, peak_kib: float) -> dict:
+    return {
+        "group": "ledger",
+        "size": 1,
+        "rounds": 1,
+        "median_s": median_s,
+        "min_s": median_s,
+        "items_per_s": 1.0,
+        "peak_kib": peak_kib,
+    }
+
+
+def test_compare_flags_time_and_memory_regressions() -> None:
+    baseline = {"results": {"a": _result(1.0, 100.0), "b": _result(1.0, 100.0), "c": _result(1.0, 100.0)}}
+    current = {
+        "results": {
+            "a": _result(1.3, 100.0),
+            "b": _result(1.0, 200.0),
+            "c": _result(0.5, 100.0),
+            "d": _result(1.0, 100.0),
+        }
+    }
+    rows = {r["case"]: r for r in compare(current, baseline, max_regression=0.25)}
+    assert {name: r["status"] for name, r in rows.items()} == {
+        "a": "REGRESSED",
+        "b": "REGRESSED",
+        "c": "improved",
+        "d": "new",
+    }
+    assert "REGRESSED" in format_report(list(rows.values()))
+
+
+def test_compare_enforces_time_budgets_on_any_machine() -> None:
+    baseline = {"results": {"a": _result(0.2, 100.0)}, "budgets": {"a": 0.5, "b": 0.5}}
+    current = {"results": {"a": _result(0.6, 100.0), "b": _result(0.4, 100.0)}}
+    rows = {r["case"]: r for r in compare(current, baseline, max_regression=10.0)}
+    assert rows["a"]["status"] == "OVER_BUDGET"
+    # A case with no recorded result still gets its budget checked.
+    assert (rows["b"]["status"], rows["b"]["budget_s"]) == ("new", 0.5)
+    assert "500" in format_report(list(rows.values()))
+
+
+def test_suite_runs_every_case_on_tiny_fixtures_and_restores_the_db() -> None:
+    db_path = db.settings.db_path
+    suite = run_suite(ledgers=(12,), universes=(3,), repeat=1)
+    assert sorted(suite["results"]) == [
+        "build_evidence_packets[universe=3]",
+        "compute_metrics[ledger=12]",
+        "compute_risk_metrics[ledger=12]",
+        "compute_risk_metrics_5y[ledger=12]",
+        "derive_active_positions[ledger=12]",
+        "insert_audit_log[ledger=12]",
+        "optimize_portfolio[universe=3]",
+        "run_broad_job[universe=3]",
+    ]
+    assert all(r["median_s"] > 0 and r["peak_kib"] > 0 for r in suite["results"].values())
+    assert db.settings.db_path == db_path
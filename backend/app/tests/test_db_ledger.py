@@ -1,4 +1,14 @@
-from app.db import derive_active_positions, get_conn, init_db, insert_trade
+from app.db import (
+    check_positions_consistency,
+    derive_active_positions,
+    get_conn,
+    init_db,
+    insert_trade,
+    realization_for_trade,
+    realization_stats,
+    rebuild_positions,
+    reset_hysteresis_cache,
+)
 
 
 def _reset() -> None:
@@ -6,11 +16,15 @@ def _reset() -> None:
     conn = get_conn()
     try:
         conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
         conn.execute("DELETE FROM audit_log")
         conn.execute("DELETE FROM hysteresis_state")
         conn.commit()
     finally:
         conn.close()
+    reset_hysteresis_cache()
 
 
 def test_positions_derived_from_ledger() -> None:
@@ -26,3 +40,50 @@ def test_positions_derived_from_ledger() -> None:
     assert positions[0]["ticker"] == "AAPL"
     assert abs(positions[0]["net_qty"] - 7.0) < 1e-9
     assert positions[0]["avg_cost"] > 0
+
+
+def test_position_book_matches_ledger_and_rebuilds() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 10, 100, 1, "eh", "dh")
+    insert_trade("AAPL", "SELL", 4, 110, 0, "eh", "dh")
+    insert_trade("NVDA", "BUY", 3, 500, 0, "eh", "dh")
+    assert check_positions_consistency() == []
+
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE positions SET net_qty=99 WHERE ticker='AAPL'")
+        conn.commit()
+    finally:
+        conn.close()
+    assert [m["ticker"] for m in check_positions_consistency()] == ["AAPL"]
+
+    rebuild_positions()
+    assert check_positions_consistency() == []
+    positions = {p["ticker"]: p for p in derive_active_positions()}
+    assert abs(positions["AAPL"]["net_qty"] - 6.0) < 1e-9
+    assert abs(positions["AAPL"]["avg_cost"] - 100.1) < 1e-9
+
+
+def test_sells_consume_fifo_lots_and_persist_realizations() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 10, 100, 2, "eh", "dh")
+    insert_trade("AAPL", "BUY", 10, 120, 0, "eh", "dh")
+    sell_id = insert_trade("AAPL", "SELL", 15, 130, 1, "eh", "dh")
+    insert_trade("MSFT", "BUY", 1, 300, 0, "eh", "dh")
+    insert_trade("MSFT", "SELL", 1, 250, 0, "eh", "dh")
+
+    realization = realization_for_trade(sell_id)
+    assert realization is not None
+    assert abs(realization["qty"] - 15) < 1e-9
+    assert abs(realization["cost_basis"] - (10 * 100 + 5 * 120)) < 1e-9
+    assert abs(realization["pnl"] - (15 * 130 - 1600 - 1 - 2)) < 1e-9
+
+    stats = realization_stats()
+    assert stats["closed"] == 2
+    assert stats["wins"] == 1
+    assert abs(stats["realized_pnl_by_ticker"]["MSFT"] + 50) < 1e-9
+    assert stats["realized_pnl_by_ticker"]["AAPL"] == stats["avg_win"]
+    assert check_positions_consistency() == []
+
+    rebuild_positions()
+    assert realization_stats() == stats
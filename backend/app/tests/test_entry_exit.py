@@ -1,6 +1,20 @@
-from app.db import get_conn, init_db, upsert_hysteresis_state
+import dataclasses
+import threading
+
+import pytest
+
+from app import db
+from app.db import (
+    flush_hysteresis_state,
+    get_conn,
+    get_hysteresis_state,
+    init_db,
+    reset_hysteresis_cache,
+    update_hysteresis_state,
+    upsert_hysteresis_state,
+)
 from app.entry_policy import entry_gate
-from app.exits import exit_policy_v2
+from app.exits import evaluate_exits, exit_policy_v2
 
 
 def _reset() -> None:
@@ -8,11 +22,15 @@ def _reset() -> None:
     conn = get_conn()
     try:
         conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
         conn.execute("DELETE FROM audit_log")
         conn.execute("DELETE FROM hysteresis_state")
         conn.commit()
     finally:
         conn.close()
+    reset_hysteresis_cache()
 
 
 def test_hysteresis_requires_two_unless_shock_override() -> None:
@@ -86,6 +104,23 @@ def test_strong_buy_gate_is_stricter_and_hard_veto_blocks() -> None:
     assert veto.reason == "hard_veto"
 
 
+def test_failed_walk_forward_blocks_any_entry() -> None:
+    _reset()
+    upsert_hysteresis_state("AMD", consecutive_ok=1)
+    entry = entry_gate(
+        ticker="AMD",
+        decision={"rec": "BUY", "signal_score": 0.90, "prob_outperform_90d": 0.90, "key_risks": []},
+        avg_vol_20d=5_000_000,
+        avg_close_20d=10,
+        market_cap=3_000_000_000,
+        shock_score=0.9,
+        walk_forward_ok=False,
+    )
+    assert entry.action == "NO_TRADE"
+    assert entry.reason == "walk_forward_failed"
+    assert get_hysteresis_state("AMD")["consecutive_ok"] == 0
+
+
 def test_exit_policy_downgrade_streak_and_profit_partial() -> None:
     _reset()
     upsert_hysteresis_state("META", consecutive_ok=2, peak_price=100.0, downgrade_streak=0)
@@ -93,3 +128,109 @@ def test_exit_policy_downgrade_streak_and_profit_partial() -> None:
     second = exit_policy_v2("META", current_price=100.0, prev_close=100.0, atr_14d=1.0, signal_score=0.65)
     assert first.action == "SELL_PARTIAL"
     assert second.action == "SELL_ALL"
+
+
+def _bars(*closes: float) -> list[dict[str, float]]:
+    return [{"Close": c, "Volume": 1e6} for c in closes]
+
+
+def test_evaluate_exits_matches_exit_policy_in_one_write() -> None:
+    _reset()
+    cases = {
+        # ticker: (peak, streak, prev_close, current, signal)
+        "TRAIL": (110.0, 0, 100.0, 100.0, 0.9),
+        "PROFIT": (100.0, 0, 100.0, 101.5, 0.65),
+        "DOWN": (100.0, 1, 100.0, 100.0, 0.65),
+        "HOLD": (100.0, 0, 100.0, 100.0, 0.9),
+        "FRESH": (None, 0, 50.0, 50.0, 0.9),
+    }
+    for ticker, (peak, streak, *_rest) in cases.items():
+        if peak is not None:
+            upsert_hysteresis_state(ticker, peak_price=peak, downgrade_streak=streak)
+    bars = {t: _bars(prev, cur) for t, (_p, _s, prev, cur, _sig) in cases.items()}
+    holdings = [{"ticker": t, "signal_score": sig} for t, (*_rest, sig) in cases.items()]
+
+    writes: list[int] = []
+    original = db._write_hysteresis_rows
+
+    def counting(conn, states):
+        writes.append(len(states))
+        original(conn, states)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(db, "_write_hysteresis_rows", counting)
+        batch = evaluate_exits(holdings, bars=bars)
+    assert writes == [len(cases)]
+    batch_states = {t: get_hysteresis_state(t) for t in cases}
+
+    _reset()
+    for ticker, (peak, streak, *_rest) in cases.items():
+        if peak is not None:
+            upsert_hysteresis_state(ticker, peak_price=peak, downgrade_streak=streak)
+    for ticker, (_p, _s, prev, cur, sig) in cases.items():
+        single = exit_policy_v2(ticker, current_price=cur, prev_close=prev, atr_14d=max(0.01, cur * 0.02), signal_score=sig)
+        assert batch[ticker] == single, ticker
+        state = get_hysteresis_state(ticker)
+        assert (state["peak_price"], state["downgrade_streak"]) == (
+            batch_states[ticker]["peak_price"],
+            batch_states[ticker]["downgrade_streak"],
+        )
+    assert {t: d.reason for t, d in batch.items()} == {
+        "TRAIL": "atr_trailing_stop_hit",
+        "PROFIT": "take_profit_plus_1pct_day",
+        "DOWN": "downgrade_streak_trigger",
+        "HOLD": "hold_conditions",
+        "FRESH": "hold_conditions",
+    }
+
+
+def _stored_consecutive_ok(ticker: str) -> int | None:
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT consecutive_ok FROM hysteresis_state WHERE ticker=?", (ticker,)).fetchone()
+        return None if row is None else int(row["consecutive_ok"])
+    finally:
+        conn.close()
+
+
+def test_concurrent_hysteresis_updates_do_not_lose_writes() -> None:
+    _reset()
+
+    def bump() -> None:
+        for _ in range(25):
+            update_hysteresis_state("AMD", lambda s: {"consecutive_ok": s["consecutive_ok"] + 1})
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert get_hysteresis_state("AMD")["consecutive_ok"] == 100
+    assert _stored_consecutive_ok("AMD") == 100
+
+
+def test_batched_hysteresis_writes_reach_sqlite_on_flush(monkeypatch: pytest.MonkeyPatch) -> None:
+    _reset()
+    monkeypatch.setattr(db, "settings", dataclasses.replace(db.settings, hysteresis_write_mode="batched"))
+    upsert_hysteresis_state("INTC", consecutive_ok=3)
+    assert get_hysteresis_state("INTC")["consecutive_ok"] == 3
+    assert _stored_consecutive_ok("INTC") is None
+    flush_hysteresis_state()
+    assert _stored_consecutive_ok("INTC") == 3
+
+
+def test_hysteresis_updates_start_from_other_workers_rows() -> None:
+    _reset()
+    upsert_hysteresis_state("AMD", consecutive_ok=1, peak_price=50.0)
+    # Another worker advances the row; this process's cache still holds the old one.
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE hysteresis_state SET consecutive_ok=4, peak_price=80.0 WHERE ticker='AMD'")
+        conn.commit()
+    finally:
+        conn.close()
+
+    state = update_hysteresis_state("AMD", lambda s: {"consecutive_ok": s["consecutive_ok"] + 1})
+    assert (state["consecutive_ok"], state["peak_price"]) == (5, 80.0)
+    assert _stored_consecutive_ok("AMD") == 5
+    assert get_hysteresis_state("AMD")["peak_price"] == 80.0
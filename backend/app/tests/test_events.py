@@ -0,0 +1,165 @@
+import asyncio
+import json
+import threading
+
+from app.db import get_conn, init_db, insert_audit_log, insert_trade, reset_hysteresis_cache
+from app.events import EventBus, LedgerFanout, PriceTicker, event_bus, format_sse
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+
+
+def test_trade_and_audit_writes_are_pushed_to_subscribers() -> None:
+    _reset()
+
+    async def scenario() -> list[tuple[str, object]]:
+        sub = event_bus.subscribe()
+        try:
+            # Writes happen on worker threads, like scheduler jobs and sync request handlers.
+            def writes() -> None:
+                insert_trade("AAPL", "BUY", 2, 100, 0, "eh", "dh")
+                insert_audit_log(
+                    event_type="DECISION",
+                    ticker="AAPL",
+                    payload={"evidence_packet": {"big": "x" * 1000}, "llm_decision": {"rec": "BUY", "signal_score": 0.8}},
+                )
+                insert_audit_log(event_type="JOB", payload={"job_name": "reserve_hourly"})
+
+            await asyncio.to_thread(writes)
+            got = [await asyncio.wait_for(sub.queue.get(), timeout=2) for _ in range(3)]
+            return [(ev.event, ev.data) for ev in got if ev is not None]
+        finally:
+            event_bus.unsubscribe(sub)
+
+    events = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["trade", "decision", "job"]
+    assert events[0][1]["ticker"] == "AAPL" and events[0][1]["qty"] == 2
+    assert events[1][1]["rec"] == "BUY" and "evidence_packet" not in events[1][1]
+    assert events[2][1] == {"job_name": "reserve_hourly"}
+
+
+def test_last_event_id_replays_history_and_sse_format() -> None:
+    bus = EventBus(history=3, queue_size=8, epoch="w1")
+    first = bus.publish("job", {"n": 1})
+    for n in range(2, 6):
+        bus.publish("job", {"n": n})
+
+    async def scenario(last_event_id: str | None) -> list[int]:
+        sub = bus.subscribe(last_event_id=last_event_id)
+        return [ev.data["n"] for ev in sub.backlog]
+
+    # Only the last three events are retained.
+    assert asyncio.run(scenario(first.sse_id)) == [3, 4, 5]
+    assert format_sse(first) == 'id: w1-1\nevent: job\ndata: {"n":1}\n\n'
+    # Ids from another worker (or this one before a restart) number a different sequence.
+    assert asyncio.run(scenario("w2-1")) == []
+    assert asyncio.run(scenario("1")) == []
+
+
+def test_price_ticker_computes_once_per_tick_for_all_viewers() -> None:
+    bus = EventBus(history=16, queue_size=8)
+    ticker = PriceTicker(bus, interval_seconds=0.05)
+    calls: list[str] = []
+
+    def compute() -> list[dict[str, object]]:
+        calls.append(threading.current_thread().name)
+        return [{"ticker": "AAPL", "current_price": 101.0}]
+
+    ticker.set_compute(compute)
+
+    async def scenario() -> list[list[str]]:
+        subs = [bus.subscribe() for _ in range(5)]
+        for _ in subs:
+            ticker.ensure_running()
+        received = []
+        for sub in subs:
+            ev = await asyncio.wait_for(sub.queue.get(), timeout=2)
+            received.append(ev)
+        for sub in subs:
+            bus.unsubscribe(sub)
+        await asyncio.sleep(0.15)
+        return [ev.event for ev in received], len({ev.id for ev in received})
+
+    names, distinct = asyncio.run(scenario())
+    assert names == ["prices"] * 5
+    assert distinct == 1
+    # One computation per tick, not one per viewer, and the ticker stops once everyone left.
+    assert len(calls) <= 3
+
+
+def test_slow_subscriber_is_closed_instead_of_buffering() -> None:
+    bus = EventBus(history=16, queue_size=2)
+
+    async def scenario() -> list[object]:
+        sub = bus.subscribe()
+        for n in range(4):
+            bus.publish("job", {"n": n})
+        await asyncio.sleep(0)
+        return [sub.queue.get_nowait() for _ in range(sub.queue.qsize())]
+
+    assert asyncio.run(scenario()) == [None]
+
+
+def _foreign_write(sql: str, params: tuple) -> int:
+    # A raw insert stands in for another worker: no write listener fires in this process.
+    conn = get_conn()
+    try:
+        row_id = int(conn.execute(sql, params).lastrowid)
+        conn.commit()
+        return row_id
+    finally:
+        conn.close()
+
+
+def test_fanout_streams_rows_committed_by_other_workers_once() -> None:
+    _reset()
+    bus = EventBus(history=32, queue_size=32)
+    fanout = LedgerFanout(bus, interval_seconds=1.0)
+
+    async def scenario() -> list[tuple[str, object]]:
+        sub = bus.subscribe()
+        try:
+            assert fanout.poll() == 0  # sets the marks
+            _foreign_write(
+                "INSERT INTO trades(ts_utc, ticker, side, qty, price, fees, evidence_hash, decision_hash) "
+                "VALUES ('2025-01-02T00:00:00+00:00', 'AAPL', 'BUY', 1, 100, 0, 'eh', 'dh')",
+                (),
+            )
+            job = json.dumps({"job_name": "reserve_hourly", "exit_triggers": [{"ticker": "AAPL", "action": "SELL_ALL"}]})
+            audit_id = _foreign_write(
+                "INSERT INTO audit_log(ts_utc, event_type, ticker, payload_json) VALUES ('2025-01-02', 'JOB', NULL, ?)",
+                (job,),
+            )
+            _foreign_write(
+                "INSERT INTO audit_log(ts_utc, event_type, ticker, payload_json) VALUES ('2025-01-02', 'ERROR', NULL, '{}')",
+                (),
+            )
+            # The same row arriving through this process's listener first is not sent twice.
+            local = {"id": audit_id, "ts_utc": "2025-01-02", "event_type": "JOB", "ticker": None, "payload": json.loads(job)}
+            fanout.publish("audit", local)
+            assert fanout.poll() == 2
+            assert fanout.poll() == 0
+            await asyncio.sleep(0)
+            got = []
+            while not sub.queue.empty():
+                got.append(sub.queue.get_nowait())
+            return [(ev.event, ev.data) for ev in got]
+        finally:
+            bus.unsubscribe(sub)
+
+    events = asyncio.run(scenario())
+    assert [name for name, _ in events] == ["job", "exit_trigger", "trade"]
+    assert events[1][1] == {"ticker": "AAPL", "action": "SELL_ALL"}
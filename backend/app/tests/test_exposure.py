@@ -0,0 +1,106 @@
+import dataclasses
+
+import pytest
+
+from app.config import settings
+from app.db import get_conn, init_db, insert_trade, put_fundamentals, reset_hysteresis_cache
+from app.exposure import ExposureIndex, exposure_index
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.execute("DELETE FROM fundamentals")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+    exposure_index.rebuild()
+
+
+def test_exposure_index_follows_trades_without_rescans() -> None:
+    _reset()
+    put_fundamentals(
+        {
+            "NVDA": {"sector": "Technology", "industry": "Semiconductors", "marketCap": 3e12},
+            "AMD": {"sector": "Technology", "industry": "Semiconductors", "marketCap": 2e11},
+            "MSFT": {"sector": "Technology", "industry": "Software", "marketCap": 3e12},
+        }
+    )
+    usd = settings.paper_portfolio_usd
+    insert_trade("NVDA", "BUY", 100, 0.10 * usd / 100, 0, "eh", "dh")
+    assert exposure_index.sector_weight("Technology") == pytest.approx(0.10)
+    assert exposure_index.corr_penalty("Semiconductors") == pytest.approx(0.10 / settings.industry_cap_pct)
+    assert exposure_index.corr_penalty_ok("Semiconductors")
+
+    insert_trade("AMD", "BUY", 50, 0.05 * usd / 50, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 10, 0.08 * usd / 10, 0, "eh", "dh")
+    assert exposure_index.sector_weight("Technology") == pytest.approx(0.23)
+    assert not exposure_index.corr_penalty_ok("Semiconductors")
+    assert exposure_index.corr_penalty_ok("Software")
+    assert not exposure_index.sector_cap_ok("Technology")
+    assert exposure_index.sector_cap_ok("Technology", add_weight=0.02)
+    assert exposure_index.sector_cap_ok("Unknown")
+
+    insert_trade("NVDA", "SELL", 100, 1.0, 0, "eh", "dh")
+    assert exposure_index.sector_weight("Technology") == pytest.approx(0.13)
+    assert exposure_index.corr_penalty_ok("Semiconductors")
+
+    fresh = ExposureIndex()
+    fresh.rebuild()
+    assert fresh.snapshot() == exposure_index.snapshot()
+
+
+def test_late_fundamentals_move_exposure_out_of_unknown() -> None:
+    _reset()
+    insert_trade("XOM", "BUY", 10, 100, 0, "eh", "dh")
+    assert exposure_index.sector_weight("Unknown") == pytest.approx(1000 / settings.paper_portfolio_usd)
+    put_fundamentals({"XOM": {"sector": "Energy", "industry": "Oil & Gas", "marketCap": 4e11}})
+    assert exposure_index.sector_weight("Unknown") == 0.0
+    assert exposure_index.sector_weight("Energy") == pytest.approx(1000 / settings.paper_portfolio_usd)
+
+
+def test_index_picks_up_trades_booked_by_another_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    _reset()
+    monkeypatch.setattr("app.exposure.settings", dataclasses.replace(settings, exposure_version_check_seconds=0.0))
+    put_fundamentals({"XOM": {"sector": "Energy", "industry": "Oil & Gas", "marketCap": 4e11}})
+    # A second index stands in for another worker: this process's write listener never updates it.
+    other = ExposureIndex()
+    assert other.sector_weight("Energy") == 0.0
+    insert_trade("XOM", "BUY", 10, 100, 0, "eh", "dh")
+    assert other.sector_weight("Energy") == pytest.approx(1000 / settings.paper_portfolio_usd)
+
+
+def test_own_trades_update_in_place_and_foreign_ones_rebuild(monkeypatch: pytest.MonkeyPatch) -> None:
+    _reset()
+    monkeypatch.setattr("app.exposure.settings", dataclasses.replace(settings, exposure_version_check_seconds=0.0))
+    put_fundamentals({"XOM": {"sector": "Energy", "industry": "Oil & Gas", "marketCap": 4e11}})
+    exposure_index.sector_weight("Energy")
+    rebuilds: list[int] = []
+    rebuild = exposure_index.rebuild
+    monkeypatch.setattr(exposure_index, "rebuild", lambda: (rebuilds.append(1), rebuild())[1])
+
+    insert_trade("XOM", "BUY", 10, 100, 0, "eh", "dh")
+    insert_trade("XOM", "BUY", 10, 100, 0, "eh", "dh")
+    assert exposure_index.sector_weight("Energy") == pytest.approx(2000 / settings.paper_portfolio_usd)
+    assert rebuilds == []
+
+    # A row written without this process's listener, as another worker's trade would be.
+    conn = get_conn()
+    try:
+        conn.execute(
+            "INSERT INTO trades(ts_utc, ticker, side, qty, price, fees, strategy_id, evidence_hash, decision_hash)"
+            " VALUES ('2025-01-02T15:00:00Z', 'XOM', 'BUY', 1, 100, 0, 'other', 'eh', 'dh')"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    exposure_index.sector_weight("Energy")
+    assert rebuilds == [1]
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.db import (
+    get_conn,
+    get_hysteresis_state,
+    init_db,
+    insert_trade,
+    reset_hysteresis_cache,
+    upsert_hysteresis_state,
+)
+from app.events import event_bus
+from app.intraday import RingBuffer, intraday_cache, poll_intraday, poll_intraday_in_session
+from app.main import _price_tick, app
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+    intraday_cache.clear()
+
+
+def _bars(start: int, closes: list[float]) -> tuple[np.ndarray, np.ndarray]:
+    ts = np.arange(start, start + 300 * len(closes), 300, dtype=np.int64)
+    values = np.array([[c, c, c, c, 1000.0] for c in closes], dtype=np.float64)
+    return ts, values
+
+
+def test_ring_buffer_wraps_and_overwrites_forming_bar() -> None:
+    buffer = RingBuffer(capacity=4)
+    assert buffer.extend(*_bars(0, [1.0, 2.0, 3.0])) == 3
+    # The bar at t=600 is still forming: it is overwritten, then two new bars wrap the buffer.
+    assert buffer.extend(*_bars(600, [3.5, 4.0, 5.0])) == 2
+    ts, values = buffer.arrays()
+    assert ts.tolist() == [300, 600, 900, 1200]
+    assert values[:, 3].tolist() == [2.0, 3.5, 4.0, 5.0]
+    assert buffer.last_close() == 5.0
+    assert buffer.extend(*_bars(0, [9.0])) == 0
+    assert buffer.extend(*_bars(1500, [float(i) for i in range(10)])) == 4
+    assert buffer.arrays()[0].tolist() == [3300, 3600, 3900, 4200]
+
+
+def test_ring_buffer_keeps_prices_exact_for_booking() -> None:
+    buffer = RingBuffer(capacity=2)
+    buffer.extend(*_bars(0, [1234.5678]))
+    # float32 would hand back 1234.5677490234375, which would then be booked as the sell price.
+    assert buffer.last_close() == 1234.5678
+
+
+def test_scheduled_poll_only_runs_in_market_hours() -> None:
+    with patch("app.intraday.poll_intraday", return_value={"tickers": []}) as poll:
+        # Saturday, then a Tuesday at 08:00 New York time: both closed.
+        assert poll_intraday_in_session(datetime(2025, 3, 8, 15, 0, tzinfo=timezone.utc)) is None
+        assert poll_intraday_in_session(datetime(2025, 3, 11, 12, 0, tzinfo=timezone.utc)) is None
+        assert poll.call_count == 0
+        # Tuesday 10:00 New York, and 16:03 (the grace period covers the closing bar).
+        assert poll_intraday_in_session(datetime(2025, 3, 11, 14, 0, tzinfo=timezone.utc)) == {"tickers": []}
+        assert poll_intraday_in_session(datetime(2025, 3, 11, 20, 3, tzinfo=timezone.utc)) == {"tickers": []}
+        # Good Friday 2025 is a market holiday.
+        assert poll_intraday_in_session(datetime(2025, 4, 18, 15, 0, tzinfo=timezone.utc)) is None
+    assert poll.call_count == 2
+
+
+def test_poll_feeds_prices_without_touching_exit_state() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 1, 100, 0, "eh", "dh")
+    upsert_hysteresis_state("AAPL", peak_price=120.0)
+    downloaded = {"AAPL": _bars(0, [110.0, 105.0]), "MSFT": _bars(0, [100.0, 100.5])}
+    published: list[tuple[str, dict]] = []
+    with patch("app.intraday._download_intraday", return_value=downloaded) as download, patch.object(
+        event_bus, "publish", side_effect=lambda kind, data: published.append((kind, data))
+    ):
+        first = poll_intraday()
+        second = poll_intraday()
+    assert download.call_count == 2
+    assert sorted(download.call_args.args[0]) == ["AAPL", "MSFT"]
+    assert first == {"tickers": ["AAPL", "MSFT"], "bars_added": 4}
+    assert second["bars_added"] == 0
+    # Exits belong to exit_policy_v2 alone: polling neither alerts nor moves peaks.
+    assert published == []
+    assert get_hysteresis_state("AAPL")["peak_price"] == 120.0
+
+    # Holdings prices now come from memory rather than a download.
+    with patch("app.pricing.download_quotes", side_effect=AssertionError("downloaded")):
+        ticks = {p["ticker"]: p["current_price"] for p in _price_tick()}
+    assert ticks == {"AAPL": 105.0, "MSFT": 100.5}
+
+
+def test_active_positions_evaluate_exits_on_intraday_price() -> None:
+    with TestClient(app) as client:
+        _reset()
+        insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+        upsert_hysteresis_state("AAPL", peak_price=150.0)
+        with patch("app.intraday._download_intraday", return_value={"AAPL": _bars(0, [120.0])}):
+            poll_intraday()
+        with patch("app.pricing.download_quotes", side_effect=AssertionError("downloaded")):
+            r = client.get("/api/portfolio/active")
+    pos = r.json()[0]
+    assert pos["current_price"] == 120.0
+    assert pos["sell_reason"] == "atr_trailing_stop_hit"
@@ -1,5 +1,20 @@
-from app.db import get_conn, init_db, insert_trade
-from app.jobs import create_scheduler, run_broad_job, run_reserve_job
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from app.db import (
+    get_conn,
+    get_hysteresis_state,
+    init_db,
+    insert_trade,
+    reset_hysteresis_cache,
+    upsert_hysteresis_state,
+)
+from app.intraday import intraday_cache
+from app.jobs import _leader_only, create_scheduler, run_broad_job, run_reserve_job
+from app.leader import LeaderLease
+from app.market_data import reset_market_data_cache
 
 
 def _reset() -> None:
@@ -7,11 +22,26 @@ def _reset() -> None:
     conn = get_conn()
     try:
         conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
         conn.execute("DELETE FROM audit_log")
         conn.execute("DELETE FROM hysteresis_state")
+        conn.execute("DELETE FROM leases")
         conn.commit()
     finally:
         conn.close()
+    reset_hysteresis_cache()
+    reset_market_data_cache()
+    intraday_cache.clear()
+
+
+def _daily_frame(tickers: list[str], close: float, days: int = 40) -> pd.DataFrame:
+    index = pd.date_range("2025-01-01", periods=days, freq="B")
+    columns = pd.MultiIndex.from_product([tickers, ["Close", "Volume"]])
+    data = {(t, "Close"): [close] * days for t in tickers}
+    data.update({(t, "Volume"): [1_000_000.0] * days for t in tickers})
+    return pd.DataFrame(data, index=index, columns=columns)
 
 
 def _stub_analyzer(ticker: str, _router, _ttl: int):
@@ -38,7 +68,7 @@ def test_scheduler_jobs_write_audit_rows() -> None:
     insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
 
     scheduler = create_scheduler()
-    assert len(scheduler.get_jobs()) == 2
+    assert len(scheduler.get_jobs()) == 4
 
     run_reserve_job(router=None, analyzer=_stub_analyzer)
     run_broad_job(router=None, analyzer=_stub_analyzer)
@@ -52,3 +82,89 @@ def test_scheduler_jobs_write_audit_rows() -> None:
     assert len(rows) >= 2
     job_rows = [r for r in rows if r["event_type"] == "JOB"]
     assert len(job_rows) >= 2
+
+
+def test_reserve_job_evaluates_exits_for_holdings() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+    # Real closes of 100 against a peak of 1000 put the trailing stop over the current price.
+    upsert_hysteresis_state("AAPL", peak_price=1_000.0)
+
+    with patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _daily_frame(list(tickers), 100.0)):
+        payload = run_reserve_job(router=None, analyzer=_stub_analyzer)
+
+    assert payload["exit_triggers"] == [
+        {"ticker": "AAPL", "action": "SELL_ALL", "frac": 1.0, "reason": "atr_trailing_stop_hit"}
+    ]
+    assert payload["exits_skipped_no_market_data"] == []
+
+
+def test_reserve_job_runs_the_exit_policy_on_intraday_prices() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 1, 100, 0, "eh", "dh")
+    upsert_hysteresis_state("AAPL", peak_price=100.0)
+    upsert_hysteresis_state("MSFT", peak_price=100.0)
+    # Daily closes of 100 give an ATR of 2, so the stop sits at 100 - 3 * 2 = 94.
+    intraday_cache.update(
+        {
+            "AAPL": (np.array([0]), np.array([[93.0, 93.0, 93.0, 93.0, 1.0]])),
+            "MSFT": (np.array([0]), np.array([[100.5, 100.5, 100.5, 100.5, 1.0]])),
+        }
+    )
+
+    with patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _daily_frame(list(tickers), 100.0)):
+        payload = run_reserve_job(router=None, analyzer=_stub_analyzer)
+
+    assert payload["exit_triggers"] == [
+        {"ticker": "AAPL", "action": "SELL_ALL", "frac": 1.0, "reason": "atr_trailing_stop_hit"}
+    ]
+    # The same pass advances the peak from the intraday price.
+    assert get_hysteresis_state("MSFT")["peak_price"] == 100.5
+
+
+def test_reserve_job_skips_exits_on_stub_bars_and_keeps_the_real_peak() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 1, 20, 0, "eh", "dh")
+    upsert_hysteresis_state("AAPL", peak_price=20.0)
+
+    with patch("app.market_data.yf.download", side_effect=RuntimeError("offline")), patch(
+        "app.resilience.time.sleep"
+    ):
+        payload = run_reserve_job(router=None, analyzer=_stub_analyzer)
+
+    assert payload["exit_triggers"] == []
+    assert payload["exits_skipped_no_market_data"] == ["AAPL"]
+    assert get_hysteresis_state("AAPL")["peak_price"] == 20.0
+
+
+def test_leader_lease_single_holder_and_takeover_after_expiry() -> None:
+    _reset()
+    worker_a = LeaderLease("scheduler", ttl_seconds=30, holder="worker-a")
+    worker_b = LeaderLease("scheduler", ttl_seconds=30, holder="worker-b")
+
+    assert worker_a.heartbeat(now=1000.0) is True
+    assert worker_b.heartbeat(now=1010.0) is False
+    assert worker_a.heartbeat(now=1020.0) is True
+    # worker-a stops heart-beating; worker-b takes over once the lease has expired.
+    assert worker_b.heartbeat(now=1049.0) is False
+    assert worker_b.heartbeat(now=1051.0) is True
+    assert worker_a.heartbeat(now=1052.0) is False
+
+    worker_b.release()
+    assert worker_a.heartbeat(now=1053.0) is True
+
+
+def test_scheduled_jobs_run_only_on_leader() -> None:
+    _reset()
+    runs: list[str] = []
+    leader = LeaderLease("scheduler", ttl_seconds=30, holder="leader")
+    follower = LeaderLease("scheduler", ttl_seconds=30, holder="follower")
+    assert leader.heartbeat()
+
+    _leader_only(lambda: runs.append("leader"), leader)()
+    _leader_only(lambda: runs.append("follower"), follower)()
+    assert runs == ["leader"]
+
+    scheduler = create_scheduler(lease=leader)
+    assert {job.id for job in scheduler.get_jobs()} == {"reserve_job", "broad_job", "intraday_poll", "premarket_warmup", "leader_heartbeat"}
@@ -1,15 +1,56 @@
+from collections import deque
 from datetime import date, timedelta
+from typing import Any
 
 from app.config import settings
-from app.db import get_conn, init_db, insert_trade
+from app.db import get_conn, init_db, insert_trade, list_trades, reset_hysteresis_cache
+from app.downsample import lttb, ohlc_buckets
 from app.metrics import (
     METRICS_LOOKBACK_DAYS,
     PriceProvider,
     compute_metrics,
-    _compute_win_rate_fifo,
-    _replay_trades_through_date,
-    _parse_ts_date,
+    parse_ts_date,
 )
+from app.trading_calendar import is_trading_day, trading_days
+
+
+def _compute_win_rate_fifo(trades: list[dict[str, Any]]) -> float:
+    # Ledger-replay reference for the persisted lots/realizations tables.
+    # FIFO per ticker: deque of (qty, price, fees) for buys; match sells to them
+    buys: dict[str, deque[tuple[float, float, float]]] = {}
+    wins = 0
+    total_closed = 0
+    for t in trades:
+        ticker = t["ticker"]
+        qty = float(t["qty"])
+        price = float(t["price"])
+        fees = float(t["fees"])
+        side = t["side"]
+        if side == "BUY":
+            buys.setdefault(ticker, deque()).append((qty, price, fees))
+        else:
+            remaining = qty
+            sell_price = price
+            sell_fees = fees
+            buy_cost = 0.0
+            buy_fees = 0.0
+            while remaining > 0 and ticker in buys and buys[ticker]:
+                bq, bp, bf = buys[ticker][0]
+                take = min(remaining, bq)
+                buy_cost += take * bp
+                buy_fees += bf * (take / bq) if bq else 0
+                remaining -= take
+                if bq <= take:
+                    buys[ticker].popleft()
+                else:
+                    buys[ticker][0] = (bq - take, bp, bf * (1 - take / bq))
+            if remaining < qty:
+                realized_qty = qty - remaining
+                pnl = realized_qty * sell_price - buy_cost - sell_fees - buy_fees
+                total_closed += 1
+                if pnl > 0:
+                    wins += 1
+    return (wins / total_closed) if total_closed else 0.0
 
 
 def _reset() -> None:
@@ -17,11 +58,15 @@ def _reset() -> None:
     conn = get_conn()
     try:
         conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
         conn.execute("DELETE FROM audit_log")
         conn.execute("DELETE FROM hysteresis_state")
         conn.commit()
     finally:
         conn.close()
+    reset_hysteresis_cache()
 
 
 def _stub_provider(constant: float = 100.0) -> PriceProvider:
@@ -63,22 +108,9 @@ def test_metrics_no_trades_returns_single_point() -> None:
     assert result["win_rate"] == 0.0
 
 
-def test_replay_trades_through_date() -> None:
-    trades = [
-        {"ticker": "AAPL", "side": "BUY", "qty": 10, "price": 100, "fees": 0, "ts_utc": "2025-01-01T12:00:00Z"},
-        {"ticker": "AAPL", "side": "SELL", "qty": 5, "price": 110, "fees": 0, "ts_utc": "2025-01-02T12:00:00Z"},
-    ]
-    cash, pos = _replay_trades_through_date(trades, "2025-01-01", 100_000.0)
-    assert cash == 100_000.0 - 10 * 100 - 0
-    assert pos.get("AAPL") == 10
-    cash2, pos2 = _replay_trades_through_date(trades, "2025-01-02", 100_000.0)
-    assert pos2.get("AAPL") == 5
-    assert cash2 == 100_000.0 - 1000 + 5 * 110
-
-
 def test_parse_ts_date() -> None:
-    assert _parse_ts_date("2025-02-01T14:30:00Z") == "2025-02-01"
-    assert _parse_ts_date("2025-02-01") == "2025-02-01"
+    assert parse_ts_date("2025-02-01T14:30:00Z") == "2025-02-01"
+    assert parse_ts_date("2025-02-01") == "2025-02-01"
 
 
 def test_win_rate_fifo() -> None:
@@ -105,3 +137,82 @@ def test_win_rate_fifo() -> None:
 
 def test_metrics_lookback_config() -> None:
     assert METRICS_LOOKBACK_DAYS == 90
+
+
+def test_metrics_win_rate_from_persisted_realizations_matches_ledger_replay() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 10, 100, 0, "eh", "dh")
+    insert_trade("AAPL", "SELL", 4, 110, 0, "eh", "dh")
+    insert_trade("AAPL", "SELL", 6, 90, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 2, 300, 0, "eh", "dh")
+    insert_trade("MSFT", "SELL", 2, 330, 0, "eh", "dh")
+    result = compute_metrics(price_provider=_stub_provider(100.0))
+    assert result["win_rate"] == round(_compute_win_rate_fifo(list_trades()), 4)
+    assert abs(result["win_rate"] - 2 / 3) < 1e-3
+    assert result["avg_win"] == 50.0
+    assert result["avg_loss"] == -60.0
+    assert result["realized_pnl_by_ticker"] == {"AAPL": -20.0, "MSFT": 60.0}
+
+
+def test_metrics_realizations_are_limited_to_the_window() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 10, 100, 0, "eh", "dh")
+    insert_trade("AAPL", "SELL", 10, 110, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 2, 300, 0, "eh", "dh")
+    insert_trade("MSFT", "SELL", 2, 270, 0, "eh", "dh")
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE realizations SET ts_utc='2025-03-03T15:00:00Z' WHERE ticker='AAPL'")
+        conn.execute("UPDATE realizations SET ts_utc='2025-03-10T15:00:00Z' WHERE ticker='MSFT'")
+        conn.commit()
+    finally:
+        conn.close()
+    early = compute_metrics(price_provider=_stub_provider(), start=date(2025, 3, 1), end=date(2025, 3, 3))
+    assert early["realized_pnl_by_ticker"] == {"AAPL": 100.0}
+    assert early["win_rate"] == 1.0
+    late = compute_metrics(price_provider=_stub_provider(), start=date(2025, 3, 4), end=date(2025, 3, 31))
+    assert late["realized_pnl_by_ticker"] == {"MSFT": -60.0}
+    assert late["win_rate"] == 0.0
+    assert late["avg_loss"] == -60.0
+
+
+def test_trading_calendar_skips_weekends_and_nyse_holidays() -> None:
+    days = trading_days(date(2025, 4, 14), date(2025, 4, 21))
+    assert date(2025, 4, 18) not in days  # Good Friday
+    assert date(2025, 4, 19) not in days and date(2025, 4, 20) not in days
+    assert len(days) == 5
+    assert not is_trading_day(date(2025, 11, 27))  # Thanksgiving
+    assert not is_trading_day(date(2026, 7, 3))  # Independence Day observed
+    assert is_trading_day(date(2022, 12, 30))  # New Year's Day 2022 fell on a Saturday
+    assert len(trading_days(date(2024, 1, 1), date(2024, 12, 31))) == 252
+
+
+def test_downsampling_bounds_points_and_keeps_endpoints() -> None:
+    curve = [{"date": f"d{i}", "value": float((i * 37) % 101)} for i in range(2000)]
+    sampled = lttb(curve, 100)
+    assert len(sampled) == 100
+    assert sampled[0] is curve[0] and sampled[-1] is curve[-1]
+    buckets = ohlc_buckets(curve, 50)
+    assert len(buckets) == 50
+    assert buckets[0]["open"] == curve[0]["value"]
+    assert buckets[-1]["close"] == curve[-1]["value"]
+    assert all(b["low"] <= b["close"] <= b["high"] for b in buckets)
+
+
+def test_metrics_long_window_is_downsampled() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 10, 100, 0, "eh", "dh")
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE trades SET ts_utc='2016-01-04T15:00:00Z'")
+        conn.commit()
+    finally:
+        conn.close()
+    start, end = date(2016, 1, 1), date(2025, 12, 31)
+    result = compute_metrics(price_provider=_stub_provider(120.0), start=start, end=end, max_points=200)
+    assert len(result["equity_curve"]) == 200
+    assert result["equity_curve"][0]["date"] == "2016-01-04"
+    assert result["equity_curve"][-1]["value"] == settings.paper_portfolio_usd + 200.0
+    assert (result["start"], result["end"], result["resolution"]) == ("2016-01-01", "2025-12-31", "lttb")
+    ohlc = compute_metrics(price_provider=_stub_provider(120.0), start=start, end=end, resolution="ohlc", max_points=200)
+    assert len(ohlc["equity_curve"]) == 200
@@ -0,0 +1,109 @@
+import dataclasses
+from datetime import datetime, timedelta, timezone
+
+from app.config import settings
+
+from app.db import get_conn, init_db
+from app.news_counters import news_counters
+from app.news_index import index_articles, prune_news_index, top_news
+from app.shock import compute_shock_score
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM news_articles")
+        conn.execute("DELETE FROM news_hourly_counts")
+        conn.commit()
+    finally:
+        conn.close()
+    news_counters.reload()
+
+
+def _item(source: str, headline: str, published: datetime) -> dict[str, str]:
+    return {"source": source, "headline": headline, "summary": "", "published_utc": published.isoformat()}
+
+
+def test_syndicated_story_counts_once_and_top_news_is_deduplicated() -> None:
+    _reset()
+    now = datetime.now(timezone.utc)
+    wire = "Apple shares jump after record iPhone sales beat estimates"
+    items = [
+        _item("gdelt", wire, now - timedelta(hours=1)),
+        _item("gnews", f"{wire} - Reuters", now - timedelta(hours=1)),
+        _item("guardian", "Apple shares jumped after record iPhone sales beat estimates", now - timedelta(hours=2)),
+        _item("newsdata", "Microsoft cloud growth slows as AI spending rises", now - timedelta(hours=3)),
+    ]
+    assert index_articles("AAPL", items, now=now) == 2
+    # Re-fetching the same articles from a provider adds nothing.
+    assert index_articles("AAPL", items, now=now) == 0
+
+    top = top_news("AAPL", limit=5)
+    assert [t["headline"] for t in top] == [wire, "Microsoft cloud growth slows as AI spending rises"]
+    assert top[0]["duplicates"] == 2
+
+    today_hits, baseline_7d = news_counters.counts("AAPL", now=now)
+    assert today_hits == 2
+    assert baseline_7d == 3.0
+    assert compute_shock_score(today_hits, baseline_7d, macro_relevance=0.4) <= 0.7
+
+
+def test_baseline_uses_prior_week_and_retention_prunes_clusters() -> None:
+    _reset()
+    now = datetime.now(timezone.utc)
+    history = [
+        _item("gdelt", f"headline{i} alpha{i} beta{i} gamma{i}", now - timedelta(days=2, hours=i)) for i in range(35)
+    ]
+    index_articles("NVDA", history, now=now)
+    today_hits, baseline_7d = news_counters.counts("NVDA", now=now)
+    assert today_hits == 0
+    assert abs(baseline_7d - 5.0) < 1e-9
+
+    assert prune_news_index(retention_days=1, now=now) == 35
+    assert top_news("NVDA") == []
+
+
+def test_counters_survive_reload_and_score_universe_at_once() -> None:
+    _reset()
+    now = datetime.now(timezone.utc)
+    index_articles("AAPL", [_item("gdelt", f"apple a{i} b{i} c{i}", now - timedelta(hours=i)) for i in range(6)], now=now)
+    index_articles("MSFT", [_item("gdelt", "microsoft x y z", now - timedelta(days=3))], now=now)
+
+    news_counters.reload(now=now)
+    counts = news_counters.counts_many(["AAPL", "MSFT", "TSLA"], now=now)
+    assert counts["AAPL"] == (6, 3.0)
+    assert counts["MSFT"] == (0, 3.0)
+    assert counts["TSLA"] == (0, 3.0)
+
+    # Eight days later the ring has rolled past every bucket.
+    assert news_counters.counts("AAPL", now=now + timedelta(days=8)) == (0, 3.0)
+    # Asking about a later hour does not move the ring for everyone else.
+    assert news_counters.counts("AAPL", now=now) == (6, 3.0)
+
+
+def test_counts_pick_up_hits_recorded_by_another_worker(monkeypatch) -> None:
+    _reset()
+    monkeypatch.setattr("app.news_counters.settings", dataclasses.replace(settings, news_counter_sync_seconds=0.0))
+    now = datetime.now(timezone.utc)
+    index_articles("AMD", [_item("gdelt", "amd p q r", now - timedelta(hours=1))], now=now)
+    assert news_counters.counts("AMD", now=now)[0] == 1
+    hour = int(now.timestamp()) // 3600
+    conn = get_conn()
+    try:
+        conn.execute("UPDATE news_hourly_counts SET hits = hits + 2 WHERE ticker='AMD'")
+        conn.execute("INSERT INTO news_hourly_counts(ticker, bucket_hour, hits) VALUES ('AMD', ?, 4)", (hour,))
+        conn.commit()
+    finally:
+        conn.close()
+    assert news_counters.counts("AMD", now=now)[0] == 7
+
+
+def test_macro_relevance_scales_with_macro_headline_volume() -> None:
+    _reset()
+    now = datetime.now(timezone.utc)
+    assert news_counters.macro_relevance(now=now) == 0.4
+    index_articles(
+        "MACRO", [_item("gdelt", f"fed m{i} n{i} o{i}", now - timedelta(hours=i)) for i in range(6)], now=now
+    )
+    assert news_counters.macro_relevance(now=now) == 0.8
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.optimizer import optimize_portfolio, solve_mean_variance
+
+
+def _bars(n_names: int, days: int = 30, seed: int = 7) -> dict[str, list[dict[str, float]]]:
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, days)
+    out = {}
+    for i in range(n_names):
+        rets = 0.8 * market + rng.normal(0, 0.01, days)
+        closes = 100.0 * np.exp(np.cumsum(rets))
+        out[f"T{i}"] = [{"Close": float(c), "Volume": 1e6} for c in closes]
+    return out
+
+
+def _candidates(n_names: int) -> list[dict[str, object]]:
+    sectors = ["Tech", "Health", "Energy", "Financials"]
+    return [
+        {
+            "ticker": f"T{i}",
+            "sector": sectors[i % len(sectors)] if i >= 10 else "Tech",
+            "prob_outperform_90d": 0.55 + (i % 9) * 0.05,
+            "vol_20d": 0.01,
+            "velocity": 0.02,
+            "corr_penalty": 0.0,
+        }
+        for i in range(n_names)
+    ]
+
+
+def test_optimizer_respects_name_sector_and_gross_caps() -> None:
+    result = optimize_portfolio(_candidates(80), _bars(80))
+    weights = result["weights"]
+    assert len(weights) == 80
+    assert max(weights.values()) <= settings.default_max_alloc_pct + 1e-9
+    assert min(weights.values()) >= 0.0
+    assert all(w <= settings.sector_cap_pct + 1e-6 for w in result["sector_weights"].values())
+    assert result["gross"] <= settings.optimizer_max_gross + 1e-6
+    # Tech is over-represented, so its sector cap binds.
+    assert result["sector_weights"]["Tech"] == pytest.approx(settings.sector_cap_pct, abs=1e-4)
+
+    moderate = optimize_portfolio(_candidates(80), _bars(80), risk_mode="moderate")
+    assert max(moderate["weights"].values()) <= settings.paper_max_alloc_pct + 1e-9
+
+
+def test_solver_prefers_diversifying_asset() -> None:
+    # Two highly correlated names and one independent one with equal edge: the
+    # independent name should get at least as much weight as either correlated one.
+    cov = np.array([[0.09, 0.085, 0.0], [0.085, 0.09, 0.0], [0.0, 0.0, 0.09]])
+    w = solve_mean_variance(
+        expected=np.array([0.2, 0.2, 0.2]),
+        cov=cov,
+        caps=np.array([1.0, 1.0, 1.0]),
+        sector_ids=np.array([0, 0, 1]),
+        sector_cap=1.0,
+        budget=1.0,
+        risk_aversion=3.0,
+    )
+    assert w[2] > w[0] and w[2] > w[1]
+    assert w.sum() <= 1.0 + 1e-9
+
+
+def test_optimizer_leaves_out_names_priced_from_stub_bars() -> None:
+    candidates, bars = _candidates(12), _bars(12)
+    bars["T3"] = [{"Close": 100.0, "Volume": 0.0}] * 30
+    result = optimize_portfolio(candidates, bars, bar_status={"T3": "stub", "T4": "stale"})
+    assert result["excluded"] == ["T3"]
+    assert "T3" not in result["weights"]
+    assert len(result["weights"]) == 11
+
+    only_stub = optimize_portfolio(candidates[3:4], bars, bar_status={"T3": "stub"})
+    assert only_stub == {"weights": {}, "sector_weights": {}, "gross": 0.0, "excluded": ["T3"]}
@@ -0,0 +1,199 @@
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.db import (
+    derive_active_positions,
+    get_conn,
+    init_db,
+    insert_trade,
+    get_hysteresis_state,
+    list_trades,
+    paper_cash_balance,
+    reset_hysteresis_cache,
+    upsert_hysteresis_state,
+)
+from app.exposure import exposure_index
+from app.intraday import intraday_cache
+from app.main import app
+from app.market_data import reset_market_data_cache
+from app.orders import NoMarketPrice, OrderSpec, OrderValidationError, execute_orders
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.execute("DELETE FROM fundamentals")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+    reset_market_data_cache()
+    intraday_cache.clear()
+    exposure_index.rebuild()
+
+
+def _frame(tickers: list[str], days: int = 40) -> pd.DataFrame:
+    index = pd.date_range("2025-01-01", periods=days, freq="B")
+    columns = pd.MultiIndex.from_product([tickers, ["Close", "Volume"]])
+    data = {(t, "Close"): [100.0] * days for t in tickers}
+    data.update({(t, "Volume"): [1_000_000.0] * days for t in tickers})
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _buy_decisions(packets: list[dict]) -> list[dict]:
+    return [
+        {"rec": "BUY", "signal_score": 0.75, "prob_outperform_90d": 0.6, "key_risks": []} for _ in packets
+    ]
+
+
+def _audit_types() -> list[str]:
+    conn = get_conn()
+    try:
+        return [r["event_type"] for r in conn.execute("SELECT event_type FROM audit_log ORDER BY id").fetchall()]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def market():
+    with patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers))), patch(
+        "app.market_data._fetch_info", return_value={"marketCap": 10e9}
+    ), patch("app.orders.llm_decide_batch", side_effect=_buy_decisions), patch(
+        "app.orders.walk_forward_ok", return_value=True
+    ):
+        yield
+
+
+def test_rebalance_books_buys_and_sells_in_one_transaction(market) -> None:
+    _reset()
+    insert_trade("MSFT", "BUY", 10, 90, 0, "eh", "dh")
+    for ticker in ("AAPL", "NVDA", "TSLA"):
+        upsert_hysteresis_state(ticker, consecutive_ok=1)
+
+    result = execute_orders(
+        [OrderSpec("AAPL", "BUY"), OrderSpec("NVDA", "BUY"), OrderSpec("TSLA", "BUY"), OrderSpec("MSFT", "SELL")]
+    )
+
+    assert [o["status"] for o in result["orders"]] == ["ok", "ok", "ok", "ok"]
+    assert result["scale"] == 1.0
+    assert result["orders"][3]["realized_pnl"] == 100.0
+    assert {p["ticker"] for p in derive_active_positions()} == {"AAPL", "NVDA", "TSLA"}
+    assert len(list_trades()) == 5
+    assert _audit_types().count("DECISION") == 3
+    assert _audit_types().count("BUY") == 3 and _audit_types().count("SELL") == 1
+    assert result["cash_after"] == round(paper_cash_balance(), 2)
+
+
+def test_joint_sizing_scales_auto_buys_to_available_cash(market) -> None:
+    _reset()
+    upsert_hysteresis_state("AAPL", consecutive_ok=1)
+    upsert_hysteresis_state("NVDA", consecutive_ok=1)
+
+    result = execute_orders([OrderSpec("AAPL", "BUY", qty_optional=995), OrderSpec("NVDA", "BUY")])
+
+    aapl, nvda = result["orders"]
+    assert aapl["qty"] == 995
+    assert 0 < result["scale"] < 1
+    assert nvda["qty"] == pytest.approx(500 / 100.0)
+    assert paper_cash_balance() == pytest.approx(0.0, abs=1e-6)
+
+
+def test_failed_batch_rolls_back_every_write(market) -> None:
+    _reset()
+    upsert_hysteresis_state("AAPL", consecutive_ok=1)
+    upsert_hysteresis_state("NVDA", consecutive_ok=1)
+    real_insert = insert_trade
+    calls = {"n": 0}
+
+    def flaky_insert(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise RuntimeError("disk full")
+        return real_insert(*args, **kwargs)
+
+    with patch("app.orders.insert_trade", side_effect=flaky_insert), pytest.raises(RuntimeError):
+        execute_orders([OrderSpec("AAPL", "BUY"), OrderSpec("NVDA", "BUY")])
+    assert list_trades() == []
+    assert derive_active_positions() == []
+    assert _audit_types() == []
+    # The entry gate's hysteresis step is only written once the batch commits.
+    assert get_hysteresis_state("AAPL")["consecutive_ok"] == 1
+    assert get_hysteresis_state("NVDA")["consecutive_ok"] == 1
+
+
+def test_batch_with_an_unpriced_sell_books_nothing(market) -> None:
+    _reset()
+    insert_trade("MSFT", "BUY", 10, 90, 0, "eh", "dh")
+    upsert_hysteresis_state("AAPL", consecutive_ok=1)
+
+    with patch("app.market_data.yf.download", side_effect=RuntimeError("offline")), patch(
+        "app.resilience.time.sleep"
+    ), pytest.raises(NoMarketPrice):
+        execute_orders([OrderSpec("AAPL", "BUY"), OrderSpec("MSFT", "SELL")])
+    assert len(list_trades()) == 1
+    assert get_hysteresis_state("AAPL")["consecutive_ok"] == 1
+
+
+def test_buy_built_on_stub_bars_is_rejected_alone(market) -> None:
+    _reset()
+    upsert_hysteresis_state("AAPL", consecutive_ok=1)
+    upsert_hysteresis_state("GONE", consecutive_ok=1)
+
+    with patch(
+        "app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame([t for t in tickers if t != "GONE"])
+    ):
+        result = execute_orders([OrderSpec("AAPL", "BUY"), OrderSpec("GONE", "BUY")])
+
+    aapl, gone = result["orders"]
+    assert aapl["status"] == "ok"
+    assert gone == {"ticker": "GONE", "side": "BUY", "status": "error", "error": "No market price available for GONE"}
+    assert [t["ticker"] for t in list_trades()] == ["AAPL"]
+    assert get_hysteresis_state("GONE")["consecutive_ok"] == 1
+
+
+def test_sell_quantity_is_rechecked_inside_the_transaction(market) -> None:
+    _reset()
+    insert_trade("MSFT", "BUY", 10, 90, 0, "eh", "dh")
+
+    def concurrent_sell(tickers):
+        # Another worker sells the position after validation but before the batch commits.
+        insert_trade("MSFT", "SELL", 10, 100, 0, "eh", "dh")
+        return {"MSFT": 100.0}, set()
+
+    with patch("app.orders.current_prices", side_effect=concurrent_sell), pytest.raises(OrderValidationError):
+        execute_orders([OrderSpec("MSFT", "SELL")])
+    assert len(list_trades()) == 2
+    assert derive_active_positions() == []
+
+
+def test_orders_endpoint_rejects_invalid_batches() -> None:
+    with TestClient(app) as client:
+        _reset()
+        no_position = client.post("/api/portfolio/orders", json={"orders": [{"ticker": "AAPL", "side": "SELL"}]})
+        duplicate = client.post(
+            "/api/portfolio/orders",
+            json={"orders": [{"ticker": "AAPL", "side": "BUY"}, {"ticker": "aapl", "side": "BUY"}]},
+        )
+    assert no_position.status_code == 400
+    assert duplicate.status_code == 400
+    assert list_trades() == []
+
+
+def test_single_buy_on_stub_bars_returns_503() -> None:
+    _reset()
+    with TestClient(app) as client, patch("app.market_data.yf.download", side_effect=RuntimeError("offline")), patch(
+        "app.resilience.time.sleep"
+    ):
+        r = client.post("/api/portfolio/buy", json={"ticker": "AAPL", "fees": 0})
+    assert r.status_code == 503
+    assert list_trades() == []
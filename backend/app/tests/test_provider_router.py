@@ -0,0 +1,222 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+
+from app.db import get_conn, init_db, provider_quota_used
+from app.news_providers import close_http_clients, get_http_client, make_http_news_provider
+from app.provider_router import ProviderRouter
+
+
+def _serve(delay_seconds: float, status: int = 200) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            time.sleep(delay_seconds)
+            body = json.dumps(
+                {"articles": [{"title": f"headline after {delay_seconds}s", "description": "d", "publishedAt": "x"}]}
+            ).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args: object) -> None:
+            return
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def servers() -> Iterator[dict[str, ThreadingHTTPServer]]:
+    started = {"slow": _serve(1.0), "fast": _serve(0.0), "broken": _serve(0.0, status=500)}
+    yield started
+    for server in started.values():
+        server.shutdown()
+        server.server_close()
+    close_http_clients()
+
+
+def _url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_hedged_call_returns_fast_provider_and_reorders(servers: dict[str, ThreadingHTTPServer]) -> None:
+    router = ProviderRouter(
+        providers={
+            "gdelt": make_http_news_provider("gdelt", _url(servers["slow"])),
+            "newsdata": make_http_news_provider("newsdata", _url(servers["fast"])),
+        },
+        quotas={"gdelt": 10, "newsdata": 10},
+        hedge_after_seconds=0.1,
+    )
+    try:
+        started = time.monotonic()
+        items = router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)
+        elapsed = time.monotonic() - started
+        assert items[0]["source"] == "newsdata"
+        assert elapsed < 0.9
+        assert router.quotas == {"gdelt": 9, "newsdata": 9}
+        assert router.ordering.index("newsdata") < router.ordering.index("gdelt")
+
+        # The next uncached call goes to the fast provider first and needs no hedge.
+        router.call(cache_key="news:MSFT", ticker="MSFT", limit=5)
+        assert router.quotas["newsdata"] == 8
+    finally:
+        router.close()
+
+
+def test_hedged_call_fails_over_immediately_on_error(servers: dict[str, ThreadingHTTPServer]) -> None:
+    router = ProviderRouter(
+        providers={
+            "gdelt": make_http_news_provider("gdelt", _url(servers["broken"])),
+            "newsdata": make_http_news_provider("newsdata", _url(servers["fast"])),
+        },
+        quotas={"gdelt": 10, "newsdata": 10},
+        hedge_after_seconds=5.0,
+    )
+    try:
+        started = time.monotonic()
+        items = router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)
+        assert items[0]["source"] == "newsdata"
+        assert time.monotonic() - started < 2.0
+        assert router.latency_ewma["gdelt"] > router.latency_ewma["newsdata"]
+    finally:
+        router.close()
+
+
+def test_hedged_call_raises_when_all_providers_fail(servers: dict[str, ThreadingHTTPServer]) -> None:
+    router = ProviderRouter(
+        providers={"gdelt": make_http_news_provider("gdelt", _url(servers["broken"]))},
+        quotas={"gdelt": 1},
+        hedge_after_seconds=0.1,
+    )
+    try:
+        with pytest.raises(RuntimeError):
+            router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)
+        with pytest.raises(RuntimeError, match="remaining quota"):
+            router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)
+    finally:
+        router.close()
+
+
+def test_hedged_failure_launches_the_next_provider_while_another_is_in_flight() -> None:
+    release = threading.Event()
+    launched: dict[str, float] = {}
+
+    def provider(name: str, behaviour: str):
+        def call(ticker: str, limit: int = 5) -> list[dict[str, str]]:
+            launched[name] = time.monotonic()
+            if behaviour == "hang":
+                release.wait(5.0)
+            elif behaviour == "fail":
+                raise RuntimeError("boom")
+            return [{"source": name}]
+
+        return call
+
+    router = ProviderRouter(
+        providers={
+            "gdelt": provider("gdelt", "hang"),
+            "newsdata": provider("newsdata", "fail"),
+            "gnews": provider("gnews", "ok"),
+        },
+        quotas={"gdelt": 10, "newsdata": 10, "gnews": 10},
+        hedge_after_seconds=0.5,
+    )
+    try:
+        items = router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)
+        assert items == [{"source": "gnews"}]
+        # gnews follows the newsdata failure at once rather than one more hedge delay later.
+        assert launched["gnews"] - launched["newsdata"] < 0.25
+    finally:
+        release.set()
+        router.close()
+
+
+def test_hedged_call_records_one_latency_sample_for_the_loser() -> None:
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow(ticker: str, limit: int = 5) -> list[dict[str, str]]:
+        release.wait(5.0)
+        finished.set()
+        return [{"source": "gdelt"}]
+
+    router = ProviderRouter(
+        providers={"gdelt": slow, "newsdata": lambda ticker, limit=5: [{"source": "newsdata"}]},
+        quotas={"gdelt": 10, "newsdata": 10},
+        hedge_after_seconds=0.05,
+    )
+    samples: list[str] = []
+    record = router._record_latency
+    router._record_latency = lambda name, seconds: (samples.append(name), record(name, seconds))
+    try:
+        assert router.call(cache_key="news:AAPL", ticker="AAPL", limit=5)[0]["source"] == "newsdata"
+        lower_bound = router.latency_ewma["gdelt"]
+        release.set()
+        assert finished.wait(5.0)
+        time.sleep(0.05)
+        assert sorted(samples) == ["gdelt", "newsdata"]
+        assert router.latency_ewma["gdelt"] == lower_bound
+    finally:
+        router.close()
+
+
+def test_http_clients_are_pooled_per_base_url(servers: dict[str, ThreadingHTTPServer]) -> None:
+    first = get_http_client(_url(servers["fast"]))
+    second = get_http_client(_url(servers["fast"]))
+    assert first is second
+    assert get_http_client(_url(servers["slow"])) is not first
+
+
+def _reset_provider_state() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM provider_quota")
+        conn.execute("DELETE FROM news_cache")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _counting_provider(calls: list[str], name: str):
+    def provider(ticker: str, limit: int = 5) -> list[dict[str, str]]:
+        calls.append(name)
+        return [{"source": name, "headline": f"{ticker} from {name}"}]
+
+    return provider
+
+
+def test_shared_routers_draw_from_one_daily_ledger() -> None:
+    _reset_provider_state()
+    calls: list[str] = []
+    providers = {"gdelt": _counting_provider(calls, "gdelt"), "newsdata": _counting_provider(calls, "newsdata")}
+    first = ProviderRouter(providers=providers, quotas={"gdelt": 2, "newsdata": 1}, shared_state=True)
+    second = ProviderRouter(providers=providers, quotas={"gdelt": 2, "newsdata": 1}, shared_state=True)
+
+    first.call(cache_key="news:A", ticker="A")
+    second.call(cache_key="news:B", ticker="B")
+    second.call(cache_key="news:C", ticker="C")
+    assert calls == ["gdelt", "gdelt", "newsdata"]
+    assert provider_quota_used("gdelt") == 2
+    with pytest.raises(RuntimeError, match="remaining quota"):
+        first.call(cache_key="news:D", ticker="D")
+
+
+def test_shared_cache_survives_router_restart() -> None:
+    _reset_provider_state()
+    calls: list[str] = []
+    providers = {"gdelt": _counting_provider(calls, "gdelt")}
+    before_restart = ProviderRouter(providers=providers, quotas={"gdelt": 5}, ttl_seconds=60, shared_state=True)
+    value = before_restart.call(cache_key="news:AAPL", ticker="AAPL")
+
+    after_restart = ProviderRouter(providers=providers, quotas={"gdelt": 5}, ttl_seconds=60, shared_state=True)
+    assert after_restart.call(cache_key="news:AAPL", ticker="AAPL") == value
+    assert calls == ["gdelt"]
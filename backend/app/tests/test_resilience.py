@@ -0,0 +1,157 @@
+import time
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from app.config import settings
+from app.db import get_conn, init_db
+from app.market_data import fetch_bars_with_status, market_data_status, reset_market_data_cache
+from app.metrics import _yfinance_closes
+from app.resilience import CircuitBreaker, RetryBudget, UpstreamUnavailable, breaker, reset_resilience, resilient_call
+
+
+def _frame(tickers: list[str], close: float, days: int = 40) -> pd.DataFrame:
+    index = pd.date_range("2025-01-01", periods=days, freq="B")
+    columns = pd.MultiIndex.from_product([tickers, ["Close", "Volume"]])
+    data = {(t, "Close"): [close] * days for t in tickers}
+    data.update({(t, "Volume"): [1_000_000.0] * days for t in tickers})
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _circuit_rows() -> list[str]:
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            "SELECT payload_json FROM audit_log WHERE event_type='ERROR' AND payload_json LIKE '%circuit_open%'"
+        ).fetchall()
+        return [r["payload_json"] for r in rows]
+    finally:
+        conn.close()
+
+
+@pytest.fixture(autouse=True)
+def _no_sleep():
+    with patch("app.resilience.time.sleep"):
+        yield
+    reset_resilience()
+
+
+def test_breaker_opens_then_admits_one_half_open_trial() -> None:
+    circuit = CircuitBreaker("t", failure_threshold=2, reset_seconds=10.0)
+    with patch("app.resilience.time.monotonic", return_value=100.0):
+        assert circuit.record_failure() is False
+        assert circuit.record_failure() is True
+        assert circuit.state == "open" and not circuit.allow()
+    with patch("app.resilience.time.monotonic", return_value=111.0):
+        assert circuit.allow() is True
+        assert circuit.allow() is False
+        # A failed trial re-opens without counting as a new opening.
+        assert circuit.record_failure() is False
+        assert circuit.state == "open"
+    with patch("app.resilience.time.monotonic", return_value=122.0):
+        assert circuit.allow() is True
+        circuit.record_success()
+        assert circuit.state == "closed"
+
+
+def test_retry_budget_caps_retries_to_a_fraction_of_calls() -> None:
+    budget = RetryBudget(ratio=0.5, max_tokens=2.0)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw() and not budget.withdraw()
+
+
+def test_resilient_call_retries_then_fails_fast_and_audits_once() -> None:
+    init_db()
+    before = len(_circuit_rows())
+    calls = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 2:
+            raise ValueError("boom")
+        return "ok"
+
+    assert resilient_call("test_source", flaky) == "ok"
+    assert len(calls) == 2
+
+    def failing() -> None:
+        raise ValueError("down")
+
+    for _ in range(settings.market_data_breaker_failures):
+        with pytest.raises(UpstreamUnavailable):
+            resilient_call("test_source_down", failing)
+    assert breaker("test_source_down").state == "open"
+    with patch("app.resilience.RetryBudget.deposit") as deposit:
+        with pytest.raises(UpstreamUnavailable, match="circuit open"):
+            resilient_call("test_source_down", failing)
+    deposit.assert_not_called()
+    assert len(_circuit_rows()) == before + 1
+
+
+def test_fetch_bars_serves_stale_bars_and_revalidates_in_background() -> None:
+    reset_market_data_cache()
+    with patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers), 10.0)):
+        bars, status = fetch_bars_with_status(["AAA"])
+    assert status == {"AAA": "fresh"} and bars["AAA"][-1]["Close"] == 10.0
+
+    aged = time.time() + settings.market_data_ttl_seconds + 1
+    with patch("app.market_data.time.time", return_value=aged), patch(
+        "app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers), 20.0)
+    ) as download, patch("app.market_data.threading.Thread") as thread:
+        bars, status = fetch_bars_with_status(["AAA"])
+        # The caller got the last good bars without waiting on the download.
+        assert status == {"AAA": "stale"} and bars["AAA"][-1]["Close"] == 10.0
+        assert download.call_count == 0
+        thread.call_args.kwargs["target"]()
+    assert download.call_count == 1
+    assert market_data_status("AAA") == "fresh"
+    assert fetch_bars_with_status(["AAA"])[0]["AAA"][-1]["Close"] == 20.0
+
+
+def test_fetch_bars_flags_stub_when_no_good_data_exists() -> None:
+    reset_market_data_cache()
+    with patch("app.market_data.yf.download", side_effect=RuntimeError("offline")):
+        _bars, status = fetch_bars_with_status(["NOPE"])
+    assert status == {"NOPE": "stub"}
+
+
+def test_metrics_closes_fall_back_to_last_good_and_flag_stale() -> None:
+    init_db()
+    good = pd.DataFrame({"Close": [10.0, 11.0]}, index=pd.to_datetime(["2025-01-02", "2025-01-03"]))
+    with patch("app.metrics.yf.download", return_value=good):
+        assert _yfinance_closes("LGC", "2025-01-01", "2025-01-03", []) == {"2025-01-02": 10.0, "2025-01-03": 11.0}
+    stale: set[str] = set()
+    with patch("app.metrics.yf.download", side_effect=RuntimeError("offline")):
+        closes = _yfinance_closes("LGC", "2025-01-03", "2025-01-06", [], stale)
+    assert closes == {"2025-01-03": 11.0}
+    assert stale == {"LGC"}
+
+
+def test_a_retried_call_counts_as_one_breaker_failure() -> None:
+    calls = []
+
+    def failing() -> None:
+        calls.append(1)
+        raise ValueError("down")
+
+    with pytest.raises(UpstreamUnavailable):
+        resilient_call("test_source_once", failing)
+    assert len(calls) == settings.market_data_retry_attempts
+    assert breaker("test_source_once").snapshot()["consecutive_failures"] == 1
+
+
+def test_empty_result_for_one_symbol_is_a_miss_not_an_outage() -> None:
+    reset_market_data_cache()
+    empty = pd.DataFrame()
+    with patch("app.market_data.yf.download", return_value=empty) as download:
+        for _ in range(settings.market_data_breaker_failures + 1):
+            _bars, status = fetch_bars_with_status(["DELISTED"])
+            assert status == {"DELISTED": "stub"}
+    # Not retried, and the circuit stays closed for every other ticker.
+    assert download.call_count == settings.market_data_breaker_failures + 1
+    assert breaker("yfinance_bars").state == "closed"
+    assert breaker("yfinance_bars").snapshot()["consecutive_failures"] == 0
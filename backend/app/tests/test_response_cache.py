@@ -0,0 +1,90 @@
+import gzip
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.db import get_conn, init_db, insert_trade, reset_hysteresis_cache
+from app.main import app
+from app.response_cache import response_cache
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+    response_cache.clear()
+
+
+def _fake_metrics(**kwargs: object) -> dict[str, object]:
+    return {"equity_curve": [{"date": "2025-01-02", "value": 100_000.0 + i} for i in range(200)], "sharpe": 0.0}
+
+
+def test_metrics_etag_304_and_invalidation_on_new_trade() -> None:
+    with TestClient(app) as client, patch("app.main.compute_metrics", side_effect=_fake_metrics) as compute:
+        _reset()
+        first = client.get("/api/metrics")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+        assert etag.startswith('"') and first.headers["cache-control"] == "no-cache"
+
+        again = client.get("/api/metrics", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert compute.call_count == 1
+
+        # Different query strings are cached separately.
+        client.get("/api/metrics", params={"resolution": "ohlc"})
+        assert compute.call_count == 2
+
+        insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+        # The ledger moved, so the payload is recomputed; the stub returns the same body,
+        # so the strong ETag still matches.
+        after_trade = client.get("/api/metrics", headers={"If-None-Match": etag})
+        assert after_trade.status_code == 304
+        assert compute.call_count == 3
+
+
+def test_cached_response_is_compressed_when_accepted() -> None:
+    with TestClient(app) as client, patch("app.main.compute_metrics", side_effect=_fake_metrics):
+        _reset()
+        plain = client.get("/api/metrics", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+        r = client.get("/api/metrics", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in r.headers["vary"]
+        assert r.json() == plain.json()
+        # Each encoding is its own representation with its own strong validator.
+        assert r.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+        gzip_etag, plain_etag = r.headers["etag"], plain.headers["etag"]
+        gzip_headers = {"Accept-Encoding": "gzip"}
+        assert client.get("/api/metrics", headers={**gzip_headers, "If-None-Match": gzip_etag}).status_code == 304
+        assert client.get("/api/metrics", headers={**gzip_headers, "If-None-Match": plain_etag}).status_code == 200
+        cached = next(iter(response_cache._entries.values()))
+        assert gzip.decompress(cached.encoded["gzip"]) == plain.content
+        assert len(cached.encoded["gzip"]) < len(plain.content)
+
+
+def test_active_positions_hits_cache_after_recording_decision() -> None:
+    packet = {"ticker": "AAPL", "current_price": 101.0}
+    decision = {"rec": "HOLD", "signal_score": 0.5, "prob_outperform_90d": 0.5, "key_risks": []}
+    with TestClient(app) as client:
+        _reset()
+        insert_trade("AAPL", "BUY", 1, 100, 0, "eh", "dh")
+        with patch("app.main.analyze", return_value=(packet, decision)), patch(
+            "app.main.current_prices", return_value=({"AAPL": 101.0}, set())
+        ), patch("app.main.fetch_bars_with_status", return_value=({}, {"AAPL": "stub"})):
+            first = client.get("/api/portfolio/active")
+        with patch("app.main.analyze", side_effect=AssertionError("should be cached")):
+            second = client.get("/api/portfolio/active", headers={"If-None-Match": first.headers["etag"]})
+    assert first.status_code == 200
+    assert second.status_code == 304
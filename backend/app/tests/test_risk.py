@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.config import settings
+from app.db import get_conn, init_db, insert_trade, list_trades, reset_hysteresis_cache
+from app.metrics import PriceProvider, compute_metrics
+from app.risk import ROLLING_VOL_WINDOW, build_equity_matrix, compute_risk_metrics, risk_metrics_from_arrays
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM trades")
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM lots")
+        conn.execute("DELETE FROM realizations")
+        conn.execute("DELETE FROM audit_log")
+        conn.execute("DELETE FROM hysteresis_state")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_hysteresis_cache()
+
+
+def _trending_provider() -> PriceProvider:
+    def provider(ticker: str, start_iso: str, end_iso: str) -> dict[str, float]:
+        out = {}
+        start = date.fromisoformat(start_iso)
+        end = date.fromisoformat(end_iso)
+        d = start
+        i = 0
+        while d <= end:
+            base = 100.0 if ticker != "SPY" else 400.0
+            out[d.isoformat()] = base * (1.0 + 0.002 * i + 0.01 * ((-1) ** i))
+            d += timedelta(days=1)
+            i += 1
+        return out
+
+    return provider
+
+
+def test_risk_metrics_agree_with_metrics_endpoint() -> None:
+    _reset()
+    insert_trade("AAPL", "BUY", 100, 100, 0, "eh", "dh")
+    insert_trade("MSFT", "BUY", 50, 100, 0, "eh", "dh")
+    conn = get_conn()
+    try:
+        backdated = (date.today() - timedelta(days=60)).isoformat()
+        conn.execute("UPDATE trades SET ts_utc=?", (f"{backdated}T15:00:00+00:00",))
+        conn.commit()
+    finally:
+        conn.close()
+    provider = _trending_provider()
+    basic = compute_metrics(price_provider=provider)
+    risk = compute_risk_metrics(price_provider=provider)
+
+    assert risk["benchmark"] == "SPY"
+    assert abs(risk["sharpe"] - basic["sharpe"]) < 1e-3
+    assert abs(risk["max_drawdown"] - basic["max_drawdown"]) < 1e-3
+    assert risk["sortino"] > 0
+    assert risk["beta"] > 0
+    assert set(risk["position_contribution"]) == {"AAPL", "MSFT"}
+    assert risk["position_contribution"]["AAPL"] > risk["position_contribution"]["MSFT"] > 0
+    assert len(risk["rolling_vol_30d"]) > 0
+
+
+def test_equity_matrix_replay_and_drawdown_duration() -> None:
+    trades = [
+        {"ticker": "A", "side": "BUY", "qty": 10, "price": 100, "fees": 1, "ts_utc": "2025-01-02T10:00:00Z"},
+        {"ticker": "A", "side": "SELL", "qty": 10, "price": 80, "fees": 0, "ts_utc": "2025-01-04T10:00:00Z"},
+    ]
+    dates = ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04", "2025-01-05"]
+    closes = np.array([[100.0, 100.0, 90.0, 80.0, 120.0]])
+    equity, _values, held = build_equity_matrix(trades, dates, ["A"], closes, 10_000.0)
+    assert equity.tolist() == [10_000.0, 9_999.0, 9_899.0, 9_799.0, 9_799.0]
+    assert held[0].tolist() == [0.0, 10.0, 10.0, 0.0, 0.0]
+
+    metrics = risk_metrics_from_arrays(dates, equity, held, closes, ["A"])
+    assert metrics["max_drawdown_duration_days"] == 4
+    assert metrics["current_drawdown_duration_days"] == 4
+    assert metrics["calmar"] < 0
+
+
+def test_risk_metrics_five_year_window_covers_every_name() -> None:
+    rng = np.random.default_rng(7)
+    n_days, n_tickers, n_trades = 5 * 365, 80, 20_000
+    start = date(2020, 1, 1)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
+    tickers = [f"T{i:02d}" for i in range(n_tickers)]
+    closes = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(n_tickers, n_days)), axis=1))
+    bench = 400.0 * np.exp(np.cumsum(rng.normal(0, 0.01, size=n_days)))
+    trades = [
+        {
+            "ticker": tickers[int(rng.integers(n_tickers))],
+            "side": "BUY" if rng.random() < 0.6 else "SELL",
+            "qty": float(rng.integers(1, 20)),
+            "price": 100.0,
+            "fees": 0.0,
+            "ts_utc": f"{dates[int(rng.integers(n_days))]}T15:00:00Z",
+        }
+        for _ in range(n_trades)
+    ]
+
+    equity, _values, held = build_equity_matrix(trades, dates, tickers, closes, settings.paper_portfolio_usd)
+    metrics = risk_metrics_from_arrays(dates, equity, held, closes, tickers, benchmark_closes=bench)
+
+    assert len(metrics["position_contribution"]) == n_tickers
+    assert len(metrics["rolling_vol_30d"]) == n_days - ROLLING_VOL_WINDOW
+
+
+def test_risk_metrics_without_trades() -> None:
+    _reset()
+    assert list_trades() == []
+    risk = compute_risk_metrics(price_provider=_trending_provider())
+    assert risk["sharpe"] == 0.0
+    assert risk["position_contribution"] == {}
@@ -1,12 +1,16 @@
+import pytest
 from fastapi.testclient import TestClient
 
-from app.config import settings
+from app.config import Settings
 from app.main import app
 
 
-def test_db_path_default_stable() -> None:
-    assert settings.db_path == "stocks.db"
-    assert "backend/" not in settings.db_path
+def test_db_path_default_stable(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("DB_PATH", raising=False)
+    assert Settings().db_path == "stocks.db"
+    assert "backend/" not in Settings().db_path
+    monkeypatch.setenv("DB_PATH", "/tmp/other.db")
+    assert Settings().db_path == "/tmp/other.db"
 
 
 def test_news_router_reused_across_requests() -> None:
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+# Loaded on first use only; none of them may come in with `import app.main`.
+LAZY_MODULES = ("yfinance", "pandas", "jsonschema", "apscheduler", "httpx")
+# Cumulative `python -X importtime` for app.main (FastAPI itself is most of it). Generous
+# enough for a loaded CI box; pulling yfinance + pandas back in eagerly roughly doubles it.
+IMPORT_BUDGET_MS = float(os.environ.get("APP_IMPORT_BUDGET_MS", "750"))
+
+
+def _run(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120, check=True
+    )
+
+
+def test_import_app_main_stays_within_budget_without_heavy_modules() -> None:
+    result = _run("-X", "importtime", "-c", "import app.main")
+    cumulative_us: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _self, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            cumulative_us[name.strip()] = int(cumulative)
+    loaded = sorted(m for m in LAZY_MODULES if m in cumulative_us)
+    assert loaded == [], f"imported eagerly: {loaded}"
+    assert cumulative_us["app.main"] / 1000 <= IMPORT_BUDGET_MS
+
+
+def test_health_answers_after_fresh_start_before_market_data_loads() -> None:
+    script = (
+        "import sys\n"
+        "from fastapi.testclient import TestClient\n"
+        "from app.main import app\n"
+        "with TestClient(app) as client:\n"
+        "    assert client.get('/health').json() == {'status': 'ok'}\n"
+        "print(','.join(m for m in ('yfinance', 'pandas') if m in sys.modules))\n"
+    )
+    result = _run("-c", script)
+    assert result.stdout.strip() == ""
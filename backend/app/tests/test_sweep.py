@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.models import DEFAULT_POLICY
+from app.sizing import compute_alloc_pct
+from app.sweep import DEFAULT_SPACE, closes_matrix, grid, random_search, run_sweep
+
+
+def _closes(n_tickers: int, n_days: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    drifts = np.linspace(-0.002, 0.004, n_tickers)[:, None]
+    return 100.0 * np.exp(np.cumsum(rng.normal(drifts, 0.015, (n_tickers, n_days)), axis=1))
+
+
+def test_default_params_match_hardcoded_policy() -> None:
+    assert compute_alloc_pct(0.7, 0.02, 0.05, 0.1) == compute_alloc_pct(0.7, 0.02, 0.05, 0.1, params=DEFAULT_POLICY)
+    assert DEFAULT_POLICY in grid(DEFAULT_SPACE)
+    assert not any(name.startswith("strong_buy_") for name in DEFAULT_SPACE)
+
+
+def test_grid_and_random_search_draw_from_space() -> None:
+    space = {"buy_signal": (0.65, 0.70), "trail_atr_mult": (2.0, 3.0, 4.0)}
+    full = grid(space)
+    assert len(full) == 6 and len(set(full)) == 6
+    sampled = random_search(space, n=4, seed=1)
+    assert len(set(sampled)) == 4 and set(sampled) <= set(full)
+    assert random_search(space, n=4, seed=1) == sampled
+    assert len(random_search(space, n=50)) == 6
+
+
+def test_closes_matrix_aligns_on_latest_bar() -> None:
+    tickers, matrix = closes_matrix({"B": [{"Close": 3.0}], "A": [{"Close": 1.0}, {"Close": 2.0}]})
+    assert tickers == ["A", "B"]
+    assert matrix[0].tolist() == [1.0, 2.0]
+    assert np.isnan(matrix[1, 0]) and matrix[1, 1] == 3.0
+
+
+def test_pool_over_shared_memory_matches_inline_ranking() -> None:
+    closes = _closes(6, 300, seed=3)
+    params_list = grid({"buy_signal": (0.65, 0.75), "trail_atr_mult": (2.0, 4.0)})
+    inline = run_sweep(params_list, closes, workers=1)
+    pooled = run_sweep(params_list, closes, workers=2)
+    assert pooled == inline
+    assert [r["rank"] for r in pooled] == [1, 2, 3, 4]
+    sharpes = [r["sharpe"] for r in pooled]
+    assert sharpes == sorted(sharpes, reverse=True)
+    assert all(r["max_drawdown"] <= 0 for r in pooled)
+    assert any(r["trades"] > 0 for r in pooled)
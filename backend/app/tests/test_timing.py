@@ -0,0 +1,95 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.db import init_db
+from app.evidence import build_evidence_packet
+from app.main import app
+from app.market_data import stub_bars
+from app.profiler import collapsed, sample_stacks
+from app.provider_router import ProviderRouter
+from app.timing import registry, render_prometheus, set_enabled, span, timed
+
+
+def _router() -> ProviderRouter:
+    return ProviderRouter(providers={"gdelt": lambda ticker, limit: []}, quotas={"gdelt": 100}, hedge_after_seconds=None)
+
+
+def test_spans_fill_cumulative_histogram_buckets() -> None:
+    registry.clear()
+
+    @timed("test.fn")
+    def work() -> int:
+        return 7
+
+    assert work() == 7
+    with span("test.block"):
+        pass
+    registry.observe("test.block", 0.3)
+    text = render_prometheus()
+    assert "# TYPE app_stage_duration_seconds histogram" in text
+    assert 'app_stage_duration_seconds_count{stage="test.fn"} 1' in text
+    assert 'app_stage_duration_seconds_bucket{stage="test.block",le="0.25"} 1' in text
+    assert 'app_stage_duration_seconds_bucket{stage="test.block",le="0.5"} 2' in text
+    assert 'app_stage_duration_seconds_bucket{stage="test.block",le="+Inf"} 2' in text
+
+
+def test_disabled_spans_record_nothing() -> None:
+    registry.clear()
+    set_enabled(False)
+    try:
+        with span("test.off"):
+            pass
+        timed("test.off")(lambda: None)()
+    finally:
+        set_enabled(True)
+    assert registry.snapshot() == {}
+
+
+def test_evidence_stages_show_up_at_metrics_prom() -> None:
+    init_db()
+    registry.clear()
+    router = _router()
+    build_evidence_packet("AAPL", news_router=router, bars=stub_bars(), info={"marketCap": 1e11})
+    router.close()
+    with TestClient(app) as client:
+        response = client.get("/metrics/prom")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    for stage in ("evidence.features", "evidence.news"):
+        assert f'app_stage_duration_seconds_count{{stage="{stage}"}} 1' in response.text
+    # Prefetched bars and info skip the download stages.
+    assert "evidence.history" not in response.text and "evidence.fundamentals" not in response.text
+
+
+def test_sampling_profiler_returns_collapsed_stacks_of_busy_threads() -> None:
+    stop = threading.Event()
+
+    def spin_for_profiler() -> None:
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=spin_for_profiler, name="spinner")
+    worker.start()
+    try:
+        text = collapsed(sample_stacks(0.2, 0.005))
+    finally:
+        stop.set()
+        worker.join()
+    lines = [line for line in text.splitlines() if line.startswith("spinner;")]
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("spin_for_profiler" in line for line in lines)
+
+
+def test_profile_endpoint_caps_duration_and_rejects_overlap() -> None:
+    with TestClient(app) as client:
+        assert client.get("/api/debug/profile", params={"seconds": 3600}).status_code == 400
+        background = threading.Thread(target=lambda: sample_stacks(0.5))
+        background.start()
+        time.sleep(0.05)
+        try:
+            assert client.get("/api/debug/profile", params={"seconds": 0.1}).status_code == 409
+        finally:
+            background.join()
+        response = client.get("/api/debug/profile", params={"seconds": 0.1})
+    assert response.status_code == 200 and response.text.strip()
@@ -0,0 +1,77 @@
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+from app.db import get_conn, get_walk_forward, init_db
+from app.evidence import build_evidence_packet
+from app.walk_forward import evaluate_ticker, refresh_walk_forward, rolling_features, walk_forward_ok
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        conn.execute("DELETE FROM walk_forward")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _series(n: int, drift: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(drift, 0.01, n)))
+
+
+def _history(closes: np.ndarray) -> list[dict[str, float]]:
+    return [{"Close": float(c), "Volume": 1e6} for c in closes]
+
+
+def test_rolling_features_match_live_evidence() -> None:
+    closes = _series(30, 0.002, seed=1)
+    momentum, vol = rolling_features(closes)
+    packet = build_evidence_packet("WFX", bars=_history(closes), info={"marketCap": 1e10})
+    assert abs(momentum[-1] - packet["price_momentum_20d"]) < 1e-12
+    assert abs(vol[-1] - packet["vol_20d"]) < 1e-12
+
+
+def test_evaluate_ticker_reports_out_of_sample_stats() -> None:
+    short = evaluate_ticker("S", _series(100, 0.0, 2), 252, 21, 20, 5, 0.5)
+    assert short["passed"] is False and short["reason"] == "insufficient_history"
+
+    result = evaluate_ticker("T", _series(500, 0.003, 3), 252, 21, 20, 5, 0.5)
+    assert result["windows"] > 0
+    assert result["oos_trades"] >= 5
+    assert result["passed"] == (result["oos_mean_return"] > 0 and result["oos_hit_rate"] >= 0.5)
+
+    falling = evaluate_ticker("F", _series(500, -0.003, 4), 252, 21, 20, 5, 0.5)
+    assert falling["passed"] is False
+
+
+def test_refresh_runs_in_process_pool_and_gate_only_looks_up() -> None:
+    _reset()
+    history = {
+        "UP": _history(_series(500, 0.003, 5)),
+        "DOWN": _history(_series(500, -0.003, 6)),
+        "FLAT": _history(_series(500, 0.0, 7)),
+    }
+    with patch("app.walk_forward.fetch_history", return_value=history):
+        results = refresh_walk_forward(["UP", "DOWN", "FLAT", "GONE"], max_workers=2, now=time.time())
+    by_ticker = {r["ticker"]: r for r in results}
+    assert set(by_ticker) == {"UP", "DOWN", "FLAT", "GONE"}
+    assert by_ticker["GONE"]["reason"] == "no_history"
+    assert walk_forward_ok("UP") == by_ticker["UP"]["passed"]
+    assert walk_forward_ok("DOWN") is False
+    assert walk_forward_ok("GONE") is False
+    # A failed history download is not stored, so the next run evaluates GONE again.
+    assert get_walk_forward("GONE") is None
+    # Results expire; an expired pass is treated as not validated.
+    assert walk_forward_ok("UP", now=time.time() + 30 * 24 * 3600) is False
+
+
+def test_full_universe_evaluation_is_fast() -> None:
+    series = [_series(500, 0.001, seed) for seed in range(80)]
+    start = time.perf_counter()
+    for i, closes in enumerate(series):
+        evaluate_ticker(f"T{i}", closes, 252, 21, 20, 5, 0.5)
+    assert time.perf_counter() - start < 2.0
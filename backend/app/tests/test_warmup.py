@@ -0,0 +1,127 @@
+import dataclasses
+import threading
+import time
+from unittest.mock import patch
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.db import get_conn, init_db, insert_trade
+from app.main import app
+from app.market_data import reset_market_data_cache
+from app.provider_router import ProviderRouter
+from app.warmup import fill_level, live_requests, progress, run_warmup, start_warmup
+
+
+def _reset() -> None:
+    init_db()
+    conn = get_conn()
+    try:
+        for table in ("trades", "positions", "lots", "realizations", "fundamentals"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+    finally:
+        conn.close()
+    reset_market_data_cache()
+    progress.reset()
+
+
+def _frame(tickers: list[str], days: int = 40) -> pd.DataFrame:
+    index = pd.date_range("2025-01-01", periods=days, freq="B")
+    columns = pd.MultiIndex.from_product([tickers, ["Close", "Volume"]])
+    data = {(t, "Close"): [50.0] * days for t in tickers}
+    data.update({(t, "Volume"): [1_000_000.0] * days for t in tickers})
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _router(calls: list[str]) -> ProviderRouter:
+    def gdelt(ticker: str, limit: int) -> list[dict[str, str]]:
+        calls.append(ticker)
+        return [{"title": f"{ticker} headline", "description": "d", "publishedAt": "2025-01-01T00:00:00Z"}]
+
+    return ProviderRouter(providers={"gdelt": gdelt}, quotas={"gdelt": 100}, hedge_after_seconds=None)
+
+
+def _patched_upstreams():
+    return (
+        patch("app.market_data.yf.download", side_effect=lambda tickers, **kw: _frame(list(tickers))),
+        patch("app.market_data._fetch_info", return_value={"marketCap": 1e11, "sector": "Technology"}),
+        patch("app.intraday._download_intraday", return_value={}),
+    )
+
+
+def test_warmup_fills_bars_fundamentals_and_news_for_holdings_and_watchlist() -> None:
+    _reset()
+    insert_trade("ZZZ", "BUY", 1, 100, 0, "eh", "dh")
+    calls: list[str] = []
+    router = _router(calls)
+    bars, info, intraday = _patched_upstreams()
+    with bars as download, info, intraday as poll:
+        snapshot = run_warmup(router, tickers=["ZZZ", "AAPL", "MSFT"])
+    assert snapshot["status"] == "ready" and snapshot["ready"] is True
+    assert snapshot["done"] == snapshot["total"] and snapshot["errors"] == []
+    # One bulk download for the chunk, one intraday poll for the holdings.
+    assert download.call_count == 1 and poll.call_args.args[0] == ["ZZZ"]
+    assert sorted(calls) == ["AAPL", "MSFT", "ZZZ"]
+
+    assert fill_level(["ZZZ", "AAPL", "MSFT"], router) == {
+        "tickers": 3,
+        "bars_fresh": 1.0,
+        "bars_stale": 0.0,
+        "fundamentals": 1.0,
+        "news": 1.0,
+    }
+    router.close()
+
+
+def test_warmup_waits_for_live_requests_before_each_chunk() -> None:
+    _reset()
+    bars, info, intraday = _patched_upstreams()
+    live_requests.enter()
+    with bars as download, info, intraday:
+        worker = threading.Thread(target=run_warmup, kwargs={"tickers": ["AAPL"]})
+        worker.start()
+        time.sleep(0.2)
+        assert download.call_count == 0 and progress.snapshot()["status"] == "running"
+        live_requests.exit()
+        worker.join(timeout=10)
+    assert download.call_count == 1
+    assert progress.snapshot()["status"] == "ready"
+
+
+def test_warmup_is_off_for_test_clients() -> None:
+    assert settings.warmup_on_startup is False
+
+
+def test_failed_warmup_retries_with_backoff_then_reports_degraded(monkeypatch) -> None:
+    _reset()
+    monkeypatch.setattr("app.warmup.settings", dataclasses.replace(settings, warmup_retry_base_seconds=0.0))
+    with patch("app.warmup.run_warmup", side_effect=[RuntimeError("db locked"), {}]) as run:
+        start_warmup(delay_seconds=0.0).join(timeout=10)
+    assert run.call_count == 2
+
+    _reset()
+    with patch("app.warmup.run_warmup", side_effect=RuntimeError("db locked")) as run:
+        start_warmup(delay_seconds=0.0).join(timeout=10)
+    assert run.call_count == settings.warmup_retry_attempts
+    snapshot = progress.snapshot()
+    assert snapshot["status"] == "degraded" and snapshot["ready"] is True
+
+
+def test_ready_endpoint_reports_503_until_first_warmup_completes(monkeypatch) -> None:
+    monkeypatch.setattr("app.main.settings", dataclasses.replace(settings, warmup_on_startup=True))
+    with patch("app.main.start_warmup") as start, TestClient(app) as client:
+        start.assert_called_once()
+        _reset()
+        response = client.get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["warmup"]["status"] == "idle"
+
+        bars, info, intraday = _patched_upstreams()
+        with bars, info, intraday:
+            run_warmup(tickers=["AAPL"])
+        response = client.get("/api/ready")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["ready"] is True and body["fill"]["bars_fresh"] == 1.0
@@ -0,0 +1,142 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, TypeVar
+
+from app.config import settings
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Upper bounds in seconds, Prometheus-style; +Inf is implied.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC = "app_stage_duration_seconds"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        # Per-bucket (not cumulative) counts; the last slot is the +Inf overflow.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        out, running = [], 0
+        for n in self.counts:
+            running += n
+            out.append(running)
+        return out
+
+
+class _Registry:
+    def __init__(self) -> None:
+        self.enabled = settings.timing_spans_enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[str, Histogram] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self) -> dict[str, Histogram]:
+        with self._lock:
+            copies: dict[str, Histogram] = {}
+            for stage, histogram in self._histograms.items():
+                copy = copies[stage] = Histogram(histogram.buckets)
+                copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+            return copies
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+registry = _Registry()
+
+
+class _Span:
+    __slots__ = ("stage", "_start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self._start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        registry.observe(self.stage, time.perf_counter() - self._start)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        return None
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage: str) -> _Span | _NoopSpan:
+    """Time a block into the stage's histogram; a shared no-op while spans are disabled."""
+    if not registry.enabled:
+        return _NOOP
+    return _Span(stage)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Decorator form of span for whole functions."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                registry.observe(stage, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def set_enabled(enabled: bool) -> None:
+    registry.enabled = enabled
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """All stage histograms in the Prometheus text exposition format (version 0.0.4)."""
+    lines = [
+        f"# HELP {METRIC} Wall time spent in instrumented hot-path stages.",
+        f"# TYPE {METRIC} histogram",
+    ]
+    for stage, histogram in sorted(registry.snapshot().items()):
+        label = _label(stage)
+        cumulative = histogram.cumulative()
+        for bound, count in zip(histogram.buckets, cumulative):
+            lines.append(f'{METRIC}_bucket{{stage="{label}",le="{bound:g}"}} {count}')
+        lines.append(f'{METRIC}_bucket{{stage="{label}",le="+Inf"}} {cumulative[-1]}')
+        lines.append(f'{METRIC}_sum{{stage="{label}"}} {histogram.sum:.6f}')
+        lines.append(f'{METRIC}_count{{stage="{label}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,86 @@
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+# Regular session; half-day early closes are treated as full days.
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def _easter_sunday(year: int) -> date:
+    # Anonymous Gregorian algorithm.
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d: date) -> date:
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=64)
+def us_market_holidays(year: int) -> frozenset[date]:
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Presidents' Day
+        _easter_sunday(year) - timedelta(days=2),  # Good Friday
+        _last_weekday(year, 5, 0),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # NYSE does not move New Year's Day back into the previous year when it falls on a Saturday.
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in us_market_holidays(d.year)
+
+
+def trading_days(start: date, end: date) -> list[date]:
+    days: list[date] = []
+    d = start
+    while d <= end:
+        if is_trading_day(d):
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def is_market_open(at: datetime | None = None, grace: timedelta = timedelta(0)) -> bool:
+    """Whether the regular US session is under way at `at` (default now), or ended less than grace ago."""
+    local = (at or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    if not is_trading_day(local.date()):
+        return False
+    opens = datetime.combine(local.date(), MARKET_OPEN, tzinfo=MARKET_TZ)
+    closes = datetime.combine(local.date(), MARKET_CLOSE, tzinfo=MARKET_TZ)
+    return opens <= local < closes + grace
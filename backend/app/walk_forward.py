@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from app.config import settings
+from app.db import get_walk_forward, put_walk_forward_results
+from app.llm_router import score_features
+from app.market_data import fetch_history
+
+# Train windows pick the entry threshold from this grid; the test window that follows is
+# scored with it out of sample.
+SIGNAL_THRESHOLDS = (0.70, 0.75, 0.80)
+PROB_THRESHOLD = 0.55
+# The evidence packet has no historical sentiment, so backtests use the live stub value.
+NEWS_SENTIMENT_PRIOR = 0.2
+FEATURE_WINDOW = 20
+
+
+def rolling_features(closes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """price_momentum_20d and vol_20d for every bar, computed like build_evidence_packet."""
+    n = len(closes)
+    momentum = np.full(n, np.nan)
+    vol = np.full(n, np.nan)
+    if n <= FEATURE_WINDOW:
+        return momentum, vol
+    # Evidence uses closes[-1] / closes[-20] - 1, i.e. a 19-bar lag.
+    momentum[FEATURE_WINDOW - 1 :] = closes[FEATURE_WINDOW - 1 :] / closes[: n - FEATURE_WINDOW + 1] - 1.0
+    returns = closes[1:] / closes[:-1] - 1.0
+    windows = np.lib.stride_tricks.sliding_window_view(returns, FEATURE_WINDOW)
+    vol[FEATURE_WINDOW:] = windows.std(axis=1, ddof=1)
+    return momentum, vol
+
+
+def evaluate_ticker(
+    ticker: str,
+    closes: np.ndarray,
+    train_days: int,
+    test_days: int,
+    horizon_days: int,
+    min_trades: int,
+    min_hit_rate: float,
+) -> dict[str, Any]:
+    closes = np.asarray(closes, dtype=float)
+    n = len(closes)
+    base = {"ticker": ticker, "bars": n}
+    if n < FEATURE_WINDOW + train_days + test_days + horizon_days:
+        return {**base, "passed": False, "reason": "insufficient_history", "windows": 0, "oos_trades": 0}
+
+    momentum, vol = rolling_features(closes)
+    signal, prob = score_features(momentum, vol, NEWS_SENTIMENT_PRIOR)
+    forward = np.full(n, np.nan)
+    forward[: n - horizon_days] = closes[horizon_days:] / closes[: n - horizon_days] - 1.0
+    usable = ~np.isnan(signal) & ~np.isnan(forward)
+    prob_ok = prob >= PROB_THRESHOLD
+
+    first = int(np.argmax(usable))
+    oos_returns: list[np.ndarray] = []
+    oos_edges: list[float] = []
+    windows = 0
+    for test_start in range(first + train_days, n - horizon_days, test_days):
+        # Purge the last horizon_days of the train window: their labels overlap the test window.
+        train = slice(test_start - train_days, test_start - horizon_days)
+        test = slice(test_start, min(test_start + test_days, n - horizon_days))
+        best_threshold, best_mean = None, -np.inf
+        for threshold in SIGNAL_THRESHOLDS:
+            picks = usable[train] & prob_ok[train] & (signal[train] >= threshold)
+            if picks.sum() >= 3:
+                mean = float(forward[train][picks].mean())
+                if mean > best_mean:
+                    best_threshold, best_mean = threshold, mean
+        if best_threshold is None:
+            continue
+        windows += 1
+        picks = usable[test] & prob_ok[test] & (signal[test] >= best_threshold)
+        if picks.any():
+            oos_returns.append(forward[test][picks])
+            oos_edges.append(float(forward[test][picks].mean() - forward[test][usable[test]].mean()))
+
+    trades = np.concatenate(oos_returns) if oos_returns else np.empty(0)
+    mean_return = float(trades.mean()) if len(trades) else 0.0
+    hit_rate = float((trades > 0).mean()) if len(trades) else 0.0
+    passed = len(trades) >= min_trades and mean_return > 0.0 and hit_rate >= min_hit_rate
+    return {
+        **base,
+        "passed": bool(passed),
+        "reason": "ok" if passed else ("too_few_trades" if len(trades) < min_trades else "oos_underperformed"),
+        "windows": windows,
+        "oos_trades": int(len(trades)),
+        "oos_mean_return": round(mean_return, 6),
+        "oos_mean_edge": round(float(np.mean(oos_edges)), 6) if oos_edges else 0.0,
+        "oos_hit_rate": round(hit_rate, 4),
+    }
+
+
+def _evaluate_job(job: tuple[str, np.ndarray]) -> dict[str, Any]:
+    ticker, closes = job
+    return evaluate_ticker(
+        ticker,
+        closes,
+        train_days=settings.walk_forward_train_days,
+        test_days=settings.walk_forward_test_days,
+        horizon_days=settings.walk_forward_horizon_days,
+        min_trades=settings.walk_forward_min_trades,
+        min_hit_rate=settings.walk_forward_min_hit_rate,
+    )
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    # Never fork the multi-threaded API/scheduler process; forkserver children start clean.
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def refresh_walk_forward(tickers: list[str], max_workers: int | None = None, now: float | None = None) -> list[dict[str, Any]]:
+    """Re-run walk-forward for tickers in a process pool and store pass/fail with an expiry.
+
+    Tickers without history are returned as failed but not stored.
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if not tickers:
+        return []
+    history = fetch_history(tickers, settings.walk_forward_history_days)
+    jobs = [(t, np.array([r["Close"] for r in history[t]], dtype=float)) for t in tickers if t in history]
+    results = [
+        {"ticker": t, "passed": False, "reason": "no_history", "bars": 0, "windows": 0, "oos_trades": 0}
+        for t in tickers
+        if t not in history
+    ]
+    workers = max_workers or settings.walk_forward_workers or os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        results.extend(_evaluate_job(job) for job in jobs)
+    elif jobs:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_process_context()) as pool:
+            results.extend(pool.map(_evaluate_job, jobs, chunksize=chunksize))
+    # no_history is usually a download failure, not a verdict: storing it would block the
+    # ticker for a whole TTL (or overwrite a still-valid pass), so the next run tries again.
+    put_walk_forward_results(
+        [r for r in results if r.get("reason") != "no_history"],
+        ttl_seconds=settings.walk_forward_ttl_hours * 3600,
+        now=now,
+    )
+    return results
+
+
+def walk_forward_ok(ticker: str, now: float | None = None) -> bool:
+    # Missing or expired results count as not validated.
+    result = get_walk_forward(ticker, now=now)
+    return bool(result and result["passed"])
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from app.config import settings
+from app.db import derive_active_positions, insert_audit_log
+from app.evidence import build_evidence_packets
+from app.intraday import poll_intraday
+from app.market_data import cache_fill, fetch_bars, fetch_fundamentals
+from app.provider_router import ProviderRouter
+
+STAGES = ("bars", "fundamentals", "intraday", "evidence")
+# Probes, scrapes, the profiler and the long-lived SSE stream are not live work the warm-up
+# should wait behind.
+UNTRACKED_PATHS = frozenset({"/health", "/api/ready", "/api/stream", "/metrics/prom", "/api/debug/profile"})
+
+
+class LiveRequests:
+    """Count of in-flight API requests, so background work can wait for a quiet moment."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._active = 0
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return self._active
+
+    def enter(self) -> None:
+        with self._cond:
+            self._active += 1
+
+    def exit(self) -> None:
+        with self._cond:
+            self._active = max(0, self._active - 1)
+            if not self._active:
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._active == 0, timeout=timeout)
+
+
+live_requests = LiveRequests()
+
+
+class LiveRequestMiddleware:
+    """Tracks in-flight HTTP requests in live_requests."""
+
+    def __init__(self, app: Callable[..., Any]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http" or scope.get("path") in UNTRACKED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        live_requests.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            live_requests.exit()
+
+
+class WarmupProgress:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.status = "idle"
+            self.stage: str | None = None
+            self.done = 0
+            self.total = 0
+            self.tickers: list[str] = []
+            self.errors: list[dict[str, str]] = []
+            self.started_at: str | None = None
+            self.finished_at: str | None = None
+            # Set by the first completed run (or by disabling warm-up, or by giving up after
+            # retries) and kept through later runs, so the pre-market refresh does not flip
+            # readiness back off.
+            self.ready = False
+
+    def start(self, tickers: list[str]) -> None:
+        with self._lock:
+            self.status = "running"
+            self.stage = None
+            self.tickers = tickers
+            # Every stage but intraday touches every ticker; intraday is a single download.
+            self.done, self.total = 0, len(tickers) * (len(STAGES) - 1) + 1
+            self.errors = []
+            self.started_at = datetime.now(timezone.utc).isoformat()
+            self.finished_at = None
+
+    def advance(self, stage: str, count: int) -> None:
+        with self._lock:
+            self.stage = stage
+            self.done = min(self.total, self.done + count)
+
+    def error(self, stage: str, message: str) -> None:
+        with self._lock:
+            self.errors.append({"stage": stage, "error": message})
+
+    def finish(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            self.stage = None
+            self.ready = self.ready or status in ("ready", "disabled", "degraded")
+            self.finished_at = datetime.now(timezone.utc).isoformat()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "status": self.status,
+                "ready": self.ready,
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "tickers": list(self.tickers),
+                "errors": list(self.errors),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+progress = WarmupProgress()
+_run_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def warmup_tickers() -> list[str]:
+    holdings = [p["ticker"] for p in derive_active_positions()]
+    return list(dict.fromkeys(t.upper() for t in holdings + list(settings.watchlist)))
+
+
+def _lower_thread_priority() -> None:
+    # Linux applies nice values per thread; elsewhere warm-up just relies on yielding.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.warmup_thread_nice)
+    except (AttributeError, OSError):
+        pass
+
+
+def _chunks(tickers: list[str]) -> list[list[str]]:
+    size = max(1, settings.warmup_chunk_size)
+    return [tickers[i : i + size] for i in range(0, len(tickers), size)]
+
+
+def run_warmup(
+    router: ProviderRouter | None = None,
+    tickers: list[str] | None = None,
+    stop: threading.Event | None = None,
+) -> dict[str, Any]:
+    """Preload bars, fundamentals, intraday bars and news for holdings plus the watchlist.
+
+    Work goes in chunks of warmup_chunk_size, each started only once no live request is in
+    flight (or after warmup_max_yield_seconds). Evidence packets are built so the news cache
+    and cluster index fill up; the packets themselves are not kept. A run already in progress
+    makes this a no-op.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return {**progress.snapshot(), "skipped": True}
+    try:
+        tickers = warmup_tickers() if tickers is None else list(dict.fromkeys(t.upper() for t in tickers))
+        progress.start(tickers)
+        stages: list[tuple[str, Callable[[list[str]], Any], list[list[str]]]] = [
+            ("bars", fetch_bars, _chunks(tickers)),
+            ("fundamentals", fetch_fundamentals, _chunks(tickers)),
+            # The intraday buffers always track exactly the current holdings.
+            ("intraday", lambda _chunk: poll_intraday(), [[]]),
+            ("evidence", lambda chunk: build_evidence_packets(chunk, news_router=router), _chunks(tickers)),
+        ]
+        for stage, load, chunks in stages:
+            for chunk in chunks:
+                if stop is not None and stop.is_set():
+                    progress.finish("stopped")
+                    return progress.snapshot()
+                live_requests.wait_idle(settings.warmup_max_yield_seconds)
+                try:
+                    result = load(chunk)
+                    if stage == "evidence":
+                        for ticker, packet in result.items():
+                            if isinstance(packet, Exception):
+                                progress.error(stage, f"{ticker}: {packet}")
+                except Exception as exc:
+                    progress.error(stage, str(exc))
+                progress.advance(stage, 1 if stage == "intraday" else len(chunk))
+        progress.finish("ready")
+        snapshot = progress.snapshot()
+        insert_audit_log(
+            event_type="JOB",
+            ticker=None,
+            payload={
+                "job_name": "premarket_warmup",
+                "tickers": tickers,
+                "errors": snapshot["errors"],
+                "fill": fill_level(tickers, router),
+            },
+        )
+        return snapshot
+    except Exception as exc:
+        progress.error("warmup", str(exc))
+        progress.finish("failed")
+        insert_audit_log(event_type="ERROR", ticker=None, payload={"job_name": "premarket_warmup", "error": str(exc)})
+        raise
+    finally:
+        _run_lock.release()
+
+
+def start_warmup(router: ProviderRouter | None = None, delay_seconds: float | None = None) -> threading.Thread:
+    """Run the warm-up on a low-priority daemon thread; stop_warmup() ends it between chunks.
+
+    A failed run is retried with exponential backoff (warmup_retry_attempts). If every attempt
+    fails the worker is marked "degraded": ready to serve, with whatever the caches hold.
+    """
+    _stop.clear()
+    delay = settings.warmup_startup_delay_seconds if delay_seconds is None else delay_seconds
+
+    def target() -> None:
+        # The delay lets the server start accepting requests before warm-up competes with them.
+        if _stop.wait(delay):
+            return
+        _lower_thread_priority()
+        attempts = max(1, settings.warmup_retry_attempts)
+        for attempt in range(attempts):
+            try:
+                run_warmup(router, stop=_stop)
+                return
+            except Exception:
+                pass  # recorded in progress and the audit log
+            if attempt + 1 < attempts and _stop.wait(settings.warmup_retry_base_seconds * 2**attempt):
+                return
+        progress.finish("degraded")
+
+    thread = threading.Thread(target=target, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_warmup() -> None:
+    _stop.set()
+
+
+def fill_level(tickers: list[str] | None = None, router: ProviderRouter | None = None) -> dict[str, Any]:
+    """Fraction of the warm-up universe currently held fresh in each in-process cache."""
+    tickers = warmup_tickers() if tickers is None else [t.upper() for t in tickers]
+    total = len(tickers)
+    counts = cache_fill(tickers)
+    if router is not None:
+        now = time.time()
+        counts["news"] = sum(router.is_cached(f"news:{t}", now) for t in tickers)
+    return {
+        "tickers": total,
+        **{name: round(count / total, 4) if total else 1.0 for name, count in counts.items()},
+    }
+
+
+def readiness(router: ProviderRouter | None = None) -> dict[str, Any]:
+    snapshot = progress.snapshot()
+    return {
+        "ready": snapshot["ready"],
+        "warmup": snapshot,
+        "fill": fill_level(snapshot["tickers"] or None, router),
+    }
+
+
+def mark_disabled() -> None:
+    progress.finish("disabled")
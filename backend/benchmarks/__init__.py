@@ -0,0 +1 @@
+"""Performance benchmarks for the stock bot backend (run with `python -m benchmarks`)."""
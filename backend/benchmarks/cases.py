@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from app.config import settings
+from app.db import derive_active_positions, insert_audit_log, put_walk_forward_results
+from app.evidence import build_evidence_packets
+from app.jobs import run_broad_job
+from app.market_data import fetch_bars, reset_market_data_cache
+from app.metrics import compute_metrics
+from app.optimizer import optimize_portfolio
+from app.risk import compute_risk_metrics
+from benchmarks.fixtures import FixtureMarketData, isolated_db, news_router, seed_ledger, universe
+
+# Ledgers are spread over this many tickers; the universe cases vary the ticker count instead.
+LEDGER_TICKERS = 80
+AUDIT_BATCH = 200
+# The risk window case: a ledger and price history spanning this many years, queried in full.
+RISK_WINDOW_YEARS = 5
+
+
+@dataclass(frozen=True)
+class Case:
+    """One timed operation. setup() runs untimed before every round and its result is passed to run()."""
+
+    name: str
+    group: str
+    size: int
+    items: int
+    run: Callable[[Any], Any]
+    setup: Callable[[], Any] = lambda: None
+
+
+def _log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def _ledger_cases(n_trades: int, market: FixtureMarketData) -> list[Case]:
+    def audit_batch(_state: Any) -> None:
+        for i in range(AUDIT_BATCH):
+            insert_audit_log(event_type="JOB", ticker=None, payload={"job_name": "bench", "i": i})
+
+    return [
+        Case(
+            f"compute_metrics[ledger={n_trades}]",
+            "ledger",
+            n_trades,
+            n_trades,
+            lambda _state: compute_metrics(price_provider=market.closes),
+        ),
+        Case(
+            f"compute_risk_metrics[ledger={n_trades}]",
+            "ledger",
+            n_trades,
+            n_trades,
+            lambda _state: compute_risk_metrics(price_provider=market.closes),
+        ),
+        Case(
+            f"derive_active_positions[ledger={n_trades}]",
+            "ledger",
+            n_trades,
+            LEDGER_TICKERS,
+            lambda _state: derive_active_positions(),
+        ),
+        Case(f"insert_audit_log[ledger={n_trades}]", "ledger", n_trades, AUDIT_BATCH, audit_batch),
+    ]
+
+
+def _risk_window_case(n_trades: int, market: FixtureMarketData) -> Case:
+    def risk(_state: Any) -> None:
+        end = date.today()
+        compute_risk_metrics(price_provider=market.closes, start=end - timedelta(days=365 * RISK_WINDOW_YEARS), end=end)
+
+    return Case(f"compute_risk_metrics_{RISK_WINDOW_YEARS}y[ledger={n_trades}]", "ledger", n_trades, n_trades, risk)
+
+
+def _optimizer_inputs(tickers: list[str], market: FixtureMarketData) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+    candidates = [
+        {
+            "ticker": t,
+            "sector": market.info(t)["sector"],
+            "prob_outperform_90d": 0.55 + (i % 9) * 0.05,
+            "vol_20d": 0.01,
+            "velocity": 0.02,
+            "corr_penalty": 0.0,
+        }
+        for i, t in enumerate(tickers)
+    ]
+    return candidates, fetch_bars(tickers)
+
+
+def _universe_cases(size: int, tickers: list[str], market: FixtureMarketData) -> list[Case]:
+    def cold() -> Any:
+        # Every round starts from empty bar/fundamental caches and a fresh news router, so
+        # it pays for the (fixture) downloads the way a restarted worker would.
+        reset_market_data_cache()
+        return news_router()
+
+    def evidence(router: Any) -> None:
+        try:
+            build_evidence_packets(tickers, news_router=router)
+        finally:
+            router.close()
+
+    def broad_job(router: Any) -> None:
+        try:
+            run_broad_job(router=router)
+        finally:
+            router.close()
+
+    return [
+        Case(f"build_evidence_packets[universe={size}]", "universe", size, size, evidence, cold),
+        # Only BROAD_MAX_QUERIES tickers are analysed per run, but holdings, walk-forward
+        # staleness and the optimizer scale with the universe.
+        Case(f"run_broad_job[universe={size}]", "universe", size, size, broad_job, cold),
+        # The joint sizing solve on its own, with bars and candidates already in hand.
+        Case(
+            f"optimize_portfolio[universe={size}]",
+            "universe",
+            size,
+            size,
+            lambda inputs: optimize_portfolio(*inputs),
+            lambda: _optimizer_inputs(tickers, market),
+        ),
+    ]
+
+
+def iter_cases(ledgers: tuple[int, ...], universes: tuple[int, ...], workdir: Path) -> Iterator[Case]:
+    """Yield cases with their database seeded and the fixture market data installed.
+
+    Each size gets its own SQLite file under workdir. The environment stays active while the
+    caller measures a yielded case, and is torn down before the next size is seeded.
+    """
+    market = FixtureMarketData()
+    for n_trades in ledgers:
+        with isolated_db(workdir / f"ledger_{n_trades}.db"), market.installed():
+            _log(f"seeding ledger of {n_trades} trades")
+            seed_ledger(n_trades, universe(LEDGER_TICKERS), market)
+            yield from _ledger_cases(n_trades, market)
+    # Enough fixture history to cover every trading day of the window.
+    long_market = FixtureMarketData(days=RISK_WINDOW_YEARS * 260)
+    for n_trades in ledgers:
+        with isolated_db(workdir / f"risk_{n_trades}.db"), long_market.installed():
+            _log(f"seeding {RISK_WINDOW_YEARS}-year ledger of {n_trades} trades")
+            seed_ledger(n_trades, universe(LEDGER_TICKERS), long_market, span_days=365 * RISK_WINDOW_YEARS)
+            yield _risk_window_case(n_trades, long_market)
+    for size in universes:
+        with isolated_db(workdir / f"universe_{size}.db"), market.installed():
+            _log(f"seeding universe of {size} tickers")
+            tickers = universe(size)
+            # One open BUY per ticker: the whole universe is held.
+            seed_ledger(size, tickers, market)
+            # Fresh walk-forward results, as after a previous broad run; the process-pool
+            # refresh is out of scope here.
+            put_walk_forward_results(
+                [{"ticker": t, "passed": True} for t in tickers], ttl_seconds=settings.walk_forward_ttl_hours * 3600
+            )
+            yield from _universe_cases(size, tickers, market)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import dataclasses
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterator
+from unittest.mock import patch
+
+import numpy as np
+
+from app import db
+from app.events import ledger_fanout
+from app.exposure import exposure_index
+from app.market_data import Bars, reset_market_data_cache
+from app.news_counters import news_counters
+from app.news_providers import gdelt_news
+from app.provider_router import ProviderRouter
+from app.trading_calendar import trading_days
+
+SECTORS = ("Technology", "Healthcare", "Financials", "Energy", "Industrials", "Consumer", "Utilities")
+HISTORY_DAYS = 500
+
+
+def universe(size: int) -> list[str]:
+    return [f"T{i:04d}" for i in range(size)]
+
+
+class FixtureMarketData:
+    """Deterministic stand-in for yfinance: a seeded random walk and static info per ticker."""
+
+    def __init__(self, seed: int = 0, days: int = HISTORY_DAYS) -> None:
+        self.seed = seed
+        self.days = days
+        self._series: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    def _ticker_seed(self, ticker: str) -> int:
+        return zlib.crc32(ticker.encode()) ^ self.seed
+
+    def series(self, ticker: str) -> tuple[np.ndarray, np.ndarray]:
+        found = self._series.get(ticker)
+        if found is None:
+            rng = np.random.default_rng(self._ticker_seed(ticker))
+            closes = 50.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, self.days)))
+            volumes = rng.uniform(5e5, 5e6, self.days)
+            found = self._series[ticker] = (closes, volumes)
+        return found
+
+    def download(self, tickers: list[str], lookback_days: int, limit: int) -> dict[str, Bars]:
+        # Same signature and shape as market_data._yf_download.
+        out: dict[str, Bars] = {}
+        for ticker in tickers:
+            closes, volumes = self.series(ticker)
+            n = min(limit, lookback_days, self.days)
+            out[ticker] = [{"Close": float(c), "Volume": float(v)} for c, v in zip(closes[-n:], volumes[-n:])]
+        return out
+
+    def info(self, ticker: str) -> dict[str, Any]:
+        h = self._ticker_seed(ticker)
+        sector = SECTORS[h % len(SECTORS)]
+        return {
+            "marketCap": float(2e9 + (h % 500) * 1e9),
+            "sector": sector,
+            "industry": f"{sector} {h % 5}",
+        }
+
+    def closes(self, ticker: str, start_iso: str, end_iso: str) -> dict[str, float]:
+        # A metrics.PriceProvider: the series' tail laid over the window's trading days.
+        days = trading_days(date.fromisoformat(start_iso[:10]), date.fromisoformat(end_iso[:10]))
+        series = self.series(ticker)[0]
+        tail = series[-len(days) :] if days else series[:0]
+        return {d.isoformat(): float(c) for d, c in zip(days[-len(tail) :], tail)}
+
+    @contextmanager
+    def installed(self) -> Iterator[FixtureMarketData]:
+        reset_market_data_cache()
+        with patch("app.market_data._yf_download", side_effect=self.download), patch(
+            "app.market_data._fetch_info", side_effect=self.info
+        ):
+            try:
+                yield self
+            finally:
+                reset_market_data_cache()
+
+
+def news_router() -> ProviderRouter:
+    # The mock GDELT provider with a quota no universe can exhaust; no SQLite-shared budget.
+    return ProviderRouter(providers={"gdelt": gdelt_news}, quotas={"gdelt": 10**9}, hedge_after_seconds=None)
+
+
+@contextmanager
+def isolated_db(path: Path) -> Iterator[Path]:
+    """Point every app.db connection at path for the duration, with in-process caches reset."""
+    original = db.settings
+    db.settings = dataclasses.replace(original, db_path=str(path))
+    try:
+        db.init_db()
+        db.reset_hysteresis_cache()
+        exposure_index.rebuild()
+        news_counters.reload()
+        ledger_fanout.reset()
+        yield path
+    finally:
+        db.settings = original
+        db.reset_hysteresis_cache()
+        exposure_index.rebuild()
+        news_counters.reload()
+        ledger_fanout.reset()
+
+
+def seed_ledger(
+    n_trades: int, tickers: list[str], market: FixtureMarketData, seed: int = 0, span_days: int = 365
+) -> None:
+    """Write n_trades BUY/SELL round trips spread over the last span_days, then derive lots and positions.
+
+    Trades go in with one executemany and the lot/position books are rebuilt from them, which
+    is the same code path as rebuild_positions and far faster than n_trades insert_trade calls.
+    Each ticker ends with one open BUY, so every ticker in the ledger is a holding.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime.now(timezone.utc) - timedelta(days=span_days)
+    step = timedelta(days=span_days) / max(1, n_trades)
+
+    def rows() -> Iterator[tuple[Any, ...]]:
+        # Generated lazily so a 1M-trade ledger never sits in memory as a list.
+        for i in range(n_trades):
+            ticker = tickers[i % len(tickers)]
+            # Round trips of 10 shares per ticker; a ticker's last trade is always a BUY.
+            k = i // len(tickers)
+            side = "BUY" if k % 2 == 0 or i + len(tickers) >= n_trades else "SELL"
+            closes = market.series(ticker)[0]
+            yield (
+                (start + step * i).isoformat(),
+                ticker,
+                side,
+                10.0,
+                round(float(closes[k % len(closes)]), 4),
+                round(float(rng.uniform(0.0, 1.0)), 2),
+                "bench",
+                f"ev{i}",
+                f"de{i}",
+            )
+
+    conn = db.get_conn()
+    try:
+        conn.executemany(
+            """
+            INSERT INTO trades(ts_utc, ticker, side, qty, price, fees, strategy_id, evidence_hash, decision_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows(),
+        )
+        db._rebuild_positions(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    db.put_fundamentals({t: market.info(t) for t in tickers})
+    exposure_index.rebuild()
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from benchmarks.cases import Case, iter_cases
+
+# (ledger sizes in trades, universe sizes in tickers)
+PROFILES: dict[str, tuple[tuple[int, ...], tuple[int, ...]]] = {
+    "small": ((1_000,), (80,)),
+    "medium": ((100_000,), (500,)),
+    "large": ((1_000, 100_000, 1_000_000), (80, 500, 5_000)),
+}
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+# Every SQLite commit syncs to disk; on tmpfs the timings reflect this code rather than the disk.
+DEFAULT_WORKDIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def measure(case: Case, repeat: int) -> dict[str, Any]:
+    """Median/min wall time over `repeat` rounds after one warm-up, then one traced round for peak memory.
+
+    Timing rounds run without tracemalloc, which slows allocation-heavy code several-fold.
+    The peak counts Python-level allocations only (NumPy buffers included, SQLite's own not).
+    """
+    case.run(case.setup())
+    timings: list[float] = []
+    for _ in range(max(1, repeat)):
+        state = case.setup()
+        start = time.perf_counter()
+        case.run(state)
+        timings.append(time.perf_counter() - start)
+    state = case.setup()
+    tracemalloc.start()
+    try:
+        case.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    median = statistics.median(timings)
+    return {
+        "group": case.group,
+        "size": case.size,
+        "rounds": len(timings),
+        "median_s": median,
+        "min_s": min(timings),
+        "items_per_s": case.items / median if median > 0 else None,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_suite(
+    ledgers: tuple[int, ...],
+    universes: tuple[int, ...],
+    repeat: int,
+    only: str | None = None,
+    workdir_parent: str | None = DEFAULT_WORKDIR,
+) -> dict[str, Any]:
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="stockbot-bench-", dir=workdir_parent) as workdir:
+        for case in iter_cases(ledgers, universes, Path(workdir)):
+            if only and only not in case.name:
+                continue
+            results[case.name] = measure(case, repeat)
+            r = results[case.name]
+            print(f"{case.name}: median {r['median_s'] * 1000:.2f} ms, peak {r['peak_kib']:.0f} KiB", flush=True)
+    return {
+        "meta": {
+            "created_utc": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "workdir": workdir_parent or tempfile.gettempdir(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], max_regression: float) -> list[dict[str, Any]]:
+    """Per-case time and peak-memory ratios against the baseline, and absolute time budgets.
+
+    A case regresses when either ratio exceeds 1 + max_regression, and counts as improved
+    when its time ratio is below 1 / (1 + max_regression). A case listed under the
+    baseline's "budgets" (seconds of median time) is OVER_BUDGET when it exceeds that
+    budget, whatever the ratios say; budgets hold on every machine, ratios only locally.
+    """
+    rows: list[dict[str, Any]] = []
+    base = baseline.get("results", {})
+    budgets = baseline.get("budgets", {})
+    for name, result in current["results"].items():
+        budget = budgets.get(name)
+        old = base.get(name)
+        if old is None:
+            time_ratio = mem_ratio = None
+            status = "new"
+        else:
+            time_ratio = result["median_s"] / old["median_s"] if old["median_s"] > 0 else 1.0
+            mem_ratio = result["peak_kib"] / old["peak_kib"] if old["peak_kib"] > 0 else 1.0
+            if time_ratio > 1 + max_regression or mem_ratio > 1 + max_regression:
+                status = "REGRESSED"
+            elif time_ratio < 1 / (1 + max_regression):
+                status = "improved"
+            else:
+                status = "ok"
+        if budget is not None and result["median_s"] > budget:
+            status = "OVER_BUDGET"
+        rows.append(
+            {"case": name, "status": status, "time_ratio": time_ratio, "mem_ratio": mem_ratio, "budget_s": budget, **result}
+        )
+    return rows
+
+
+FAILING_STATUSES = ("REGRESSED", "OVER_BUDGET")
+
+
+def format_report(rows: list[dict[str, Any]]) -> str:
+    if not rows:
+        return "no results"
+    header = ["case", "median_ms", "budget_ms", "items/s", "peak_KiB", "time_x", "mem_x", "status"]
+
+    def ratio(value: float | None) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    table = [
+        [
+            r["case"],
+            f"{r['median_s'] * 1000:.2f}",
+            "-" if r.get("budget_s") is None else f"{r['budget_s'] * 1000:.0f}",
+            "-" if r["items_per_s"] is None else f"{r['items_per_s']:.0f}",
+            f"{r['peak_kib']:.0f}",
+            ratio(r["time_ratio"]),
+            ratio(r["mem_ratio"]),
+            r["status"],
+        ]
+        for r in rows
+    ]
+    widths = [max(len(h), *(len(row[i]) for row in table)) for i, h in enumerate(header)]
+    lines = ["  ".join(h.ljust(w) if i == 0 else h.rjust(w) for i, (h, w) in enumerate(zip(header, widths)))]
+    lines.extend(
+        "  ".join(c.ljust(w) if i == 0 else c.rjust(w) for i, (c, w) in enumerate(zip(row, widths))) for row in table
+    )
+    return "\n".join(lines)
+
+
+def _sizes(value: str) -> tuple[int, ...]:
+    return tuple(int(v) for v in value.split(",") if v.strip())
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time evidence, metrics, db and job hot paths on synthetic data.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--ledgers", type=_sizes, default=None, help="comma-separated trade counts (overrides profile)")
+    parser.add_argument("--universes", type=_sizes, default=None, help="comma-separated ticker counts (overrides profile)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default=None, help="run cases whose name contains this")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where the scratch SQLite files go")
+    parser.add_argument("--save", default=None, help="write results JSON here (e.g. benchmarks/baseline.json)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown/growth, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    ledgers, universes = PROFILES[args.profile]
+    current = run_suite(
+        args.ledgers if args.ledgers is not None else ledgers,
+        args.universes if args.universes is not None else universes,
+        args.repeat,
+        args.only,
+        args.workdir,
+    )
+    if args.save:
+        # Budgets are set by hand, not measured; a refreshed baseline keeps the ones it had.
+        if os.path.exists(args.save):
+            with open(args.save, encoding="utf-8") as fh:
+                budgets = json.load(fh).get("budgets")
+            if budgets:
+                current["budgets"] = budgets
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(current, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+    baseline: dict[str, Any] = {}
+    if args.baseline and os.path.exists(args.baseline) and os.path.abspath(args.baseline) != os.path.abspath(args.save or ""):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    rows = compare(current, baseline, args.max_regression)
+    print(format_report(rows))
+    return 1 if any(r["status"] in FAILING_STATUSES for r in rows) else 0
@@ -3,6 +3,8 @@ export type ActivePosition = {
   net_qty: number;
   avg_cost: number;
   current_price: number;
+  // True when the price is last good (cached) data or the average cost, not a live quote.
+  price_stale?: boolean;
   unrealized_pnl_pct: number;
   last_decision?: {
     rec?: string;
@@ -30,10 +32,18 @@ export type AnalyzeResponse = {
 };
 
 export type MetricsResponse = {
-  equity_curve: Array<{ date: string; value: number }>;
+  equity_curve: Array<{ date: string; value: number; end_date?: string; open?: number; high?: number; low?: number; close?: number }>;
   sharpe: number;
   max_drawdown: number;
   win_rate: number;
+  avg_win: number;
+  avg_loss: number;
+  realized_pnl_by_ticker: Record<string, number>;
+  start: string;
+  end: string;
+  resolution: "lttb" | "ohlc";
+  // Tickers valued from last good closes because the price source was unavailable.
+  stale_tickers?: string[];
 };
 
 const DEFAULT_BACKEND_URL = "http://localhost:8000";
@@ -44,7 +54,7 @@ export function getBackendUrl(): string {
 
 export async function fetchJson<T>(path: string): Promise<T> {
   const base = getBackendUrl();
-  const res = await fetch(`${base}${path}`, { cache: "no-store" });
+  const res = await fetch(`${base}${path}`, { cache: "no-cache" });
   if (!res.ok) {
     const message = await safeErrorMessage(res);
     throw new Error(message || `Request failed: ${res.status}`);
@@ -74,3 +84,58 @@ async function safeErrorMessage(res: Response): Promise<string> {
     return "";
   }
 }
+
+export type StreamPriceUpdate = {
+  as_of_utc: string;
+  positions: Array<Pick<ActivePosition, "ticker" | "net_qty" | "avg_cost" | "current_price" | "price_stale" | "unrealized_pnl_pct">>;
+};
+
+export type StreamHandlers = {
+  prices?: (update: StreamPriceUpdate) => void;
+  trade?: (trade: { id: number; ticker: string; side: string; qty: number; price: number }) => void;
+  decision?: (decision: { ticker: string; rec?: string; signal_score?: number }) => void;
+  exit_trigger?: (trigger: { ticker: string; action: string; reason: string }) => void;
+  job?: (job: Record<string, unknown>) => void;
+};
+
+// One EventSource per tab; the backend fans a single computation out to every viewer.
+export function subscribeStream(handlers: StreamHandlers): () => void {
+  const source = new EventSource(`${getBackendUrl()}/api/stream`);
+  for (const [name, handler] of Object.entries(handlers)) {
+    if (!handler) continue;
+    source.addEventListener(name, (ev) => handler(JSON.parse((ev as MessageEvent<string>).data)));
+  }
+  return () => source.close();
+}
+
+export type AnalyzeBatchLine =
+  | ({ ticker: string; status: "ok" } & AnalyzeResponse)
+  | { ticker: string; status: "error"; stage: "evidence" | "decision"; error: string }
+  | { status: "done"; requested: number; ok: number; failed: number };
+
+// Streams NDJSON from POST /api/analyze/batch, calling onLine as each ticker finishes.
+export async function streamAnalyzeBatch(tickers: string[], onLine: (line: AnalyzeBatchLine) => void): Promise<void> {
+  const res = await fetch(`${getBackendUrl()}/api/analyze/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ tickers }),
+  });
+  if (!res.ok || !res.body) {
+    const message = await safeErrorMessage(res);
+    throw new Error(message || `Request failed: ${res.status}`);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffered += decoder.decode(value, { stream: !done });
+    const lines = buffered.split("\n");
+    buffered = lines.pop() ?? "";
+    for (const line of lines) {
+      if (line.trim()) onLine(JSON.parse(line) as AnalyzeBatchLine);
+    }
+    if (done) break;
+  }
+  if (buffered.trim()) onLine(JSON.parse(buffered) as AnalyzeBatchLine);
+}
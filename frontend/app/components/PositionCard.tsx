@@ -25,7 +25,10 @@ export default function PositionCard({ position, onSell }: PositionCardProps) {
         <Stack spacing={0.5} mt={1.5}>
           <Typography variant="body2">Net Qty: {position.net_qty.toFixed(4)}</Typography>
           <Typography variant="body2">Avg Cost: ${position.avg_cost.toFixed(2)}</Typography>
-          <Typography variant="body2">Current Price: ${position.current_price.toFixed(2)}</Typography>
+          <Typography variant="body2">
+            Current Price: ${position.current_price.toFixed(2)}
+            {position.price_stale ? " (stale)" : ""}
+          </Typography>
           <Typography variant="body2">Unrealized PnL: {pnlPct}%</Typography>
           <Typography variant="body2">Last Rec: {rec}</Typography>
           <Typography variant="body2">Signal Score: {score !== undefined ? score.toFixed(3) : "N/A"}</Typography>
@@ -1,11 +1,11 @@
 "use client";
 
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import useSWR, { mutate } from "swr";
 import { Alert, CircularProgress, Stack, Typography } from "@mui/material";
 import PositionCard from "../components/PositionCard";
 import SellModal from "../components/SellModal";
-import { ActivePosition, fetchJson, getBackendUrl, postJson } from "../apiClient";
+import { ActivePosition, fetchJson, getBackendUrl, postJson, subscribeStream } from "../apiClient";
 
 const holdingsKey = `${getBackendUrl()}/api/portfolio/active`;
 
@@ -16,8 +16,26 @@ export default function HoldingsPage() {
 
   const { data, error, isLoading } = useSWR<ActivePosition[]>(
     holdingsKey,
-    () => fetchJson<ActivePosition[]>("/api/portfolio/active"),
-    { refreshInterval: 15000 }
+    () => fetchJson<ActivePosition[]>("/api/portfolio/active")
+  );
+
+  useEffect(
+    () =>
+      subscribeStream({
+        prices: (update) => {
+          const byTicker = new Map(update.positions.map((p) => [p.ticker, p]));
+          mutate(
+            holdingsKey,
+            (current?: ActivePosition[]) =>
+              current?.map((pos) => ({ ...pos, ...(byTicker.get(pos.ticker) ?? {}) })),
+            { revalidate: false }
+          );
+        },
+        trade: () => mutate(holdingsKey),
+        decision: () => mutate(holdingsKey),
+        exit_trigger: () => mutate(holdingsKey),
+      }),
+    []
   );
 
   const handleSell = async (payload: { ticker: string; qty_optional: number | null; fees: number }) => {
@@ -1,16 +1,27 @@
 "use client";
 
-import useSWR from "swr";
+import { useEffect } from "react";
+import useSWR, { mutate } from "swr";
 import { Alert, CircularProgress, Stack, Typography } from "@mui/material";
-import { MetricsResponse, fetchJson, getBackendUrl } from "../apiClient";
+import { MetricsResponse, fetchJson, getBackendUrl, subscribeStream } from "../apiClient";
 import MetricCards from "../components/MetricCards";
 import EquityChart from "../components/EquityChart";
 
+const metricsKey = `${getBackendUrl()}/api/metrics`;
+
 export default function MetricsPage() {
-  const { data, error, isLoading } = useSWR<MetricsResponse>(
-    `${getBackendUrl()}/api/metrics`,
-    () => fetchJson<MetricsResponse>("/api/metrics"),
-    { refreshInterval: 30000 }
+  const { data, error, isLoading } = useSWR<MetricsResponse>(metricsKey, () =>
+    fetchJson<MetricsResponse>("/api/metrics")
+  );
+
+  // Revalidate on ledger changes and job completions; unchanged data comes back as a 304.
+  useEffect(
+    () =>
+      subscribeStream({
+        trade: () => mutate(metricsKey),
+        job: () => mutate(metricsKey),
+      }),
+    []
   );
 
   return (